@@ -1,9 +1,8 @@
 from common.db import get_connection
+from common.migrations import migrate
 
+# 表结构变更统一由 common/migrations.py 管理，此脚本只把现有数据库升级到最新版本
 conn = get_connection()
-cursor = conn.cursor()
-
-cursor.execute("ALTER TABLE tasks ADD COLUMN last_error TEXT;")
-
-conn.commit()
-conn.close()
\ No newline at end of file
+version = migrate(conn)
+conn.close()
+print(f"数据库表结构版本: {version}")
@@ -1,27 +1,38 @@
 from fastapi import FastAPI
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import List
 from common.models import Task
-from common.db import create_task, list_tasks, init_db, search_tasks, get_task_by_id, update_task
+from common.db import create_task, init_db, get_task_by_id, update_task
 import threading
-from scheduler.scheduler import run_scheduler
+from scheduler.scheduler import run_scheduler, execution_pool
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, Response
-from common.db import get_connection, create_execution, get_execution, list_executions_by_task
+from common.db import get_connection, list_executions_by_task, count_executions, TASK_FIELDS, BulkCreateError
+from common.db import get_retention_policy, set_retention_policy
+from scheduler.retention import retention_service, trim_task
+from common import adb
+from common.task_cache import task_cache
+from common.writer import execution_writer
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
 import sqlite3
 from fastapi import Form
 from fastapi.responses import RedirectResponse
 import os
-from common.utils import next_run_times
-from fastapi.responses import JSONResponse
-from config import logger
+import json
+import hashlib
+import asyncio
+from common.utils import next_run_times, preview_cache_stats
+from common.cron import compile_cron, cron_cache_stats
+from common.events import notify_tasks_changed, subscribe_execution, unsubscribe_execution
+from fastapi.responses import JSONResponse, StreamingResponse
+from config import logger, BULK_CREATE_MAX_TASKS, BULK_CREATE_MAX_BYTES, LIVE_STREAM_POLL_INTERVAL
 from common.auth import (
     authenticate_user,
     create_access_token,
     get_current_user_from_bearer,
     verify_token,
+    auth_cache_stats,
     create_user,
     Token,
     User,
@@ -175,13 +186,188 @@ class TaskCreateRequest(BaseModel):
 
 
 @app.post("/tasks")
-def create_new_task(task: TaskCreateRequest):
-    created_task = create_task(task.name, task.cron, task.command)
+async def create_new_task(task: TaskCreateRequest):
+    created_task = await adb.create_task(task.name, task.cron, task.command)
     return created_task
 
+
+# 批量创建请求中最多返回的校验错误条数
+MAX_BULK_ERRORS = 100
+
+
+async def _read_bulk_body(request: Request):
+    """逐块读取请求体；Content-Length 或已接收字节数超过 BULK_CREATE_MAX_BYTES 时立即返回 413，不继续缓冲"""
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        declared = 0
+    if declared > BULK_CREATE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request body too large (max {BULK_CREATE_MAX_BYTES} bytes)")
+
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > BULK_CREATE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Request body too large (max {BULK_CREATE_MAX_BYTES} bytes)")
+        yield chunk
+
+
+async def _read_bulk_items(request: Request) -> list:
+    """
+    读取批量创建请求体：NDJSON（每行一个对象，边接收边解析）或 JSON 数组
+    请求体超过字节上限、或 NDJSON 行数超过 BULK_CREATE_MAX_TASKS 时停止读取并返回 413
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" not in content_type and "jsonl" not in content_type:
+        items = json.loads(b"".join([chunk async for chunk in _read_bulk_body(request)]))
+        if not isinstance(items, list):
+            raise ValueError("request body must be a JSON array")
+        return items
+
+    items, buffer = [], b""
+    async for chunk in _read_bulk_body(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        items.extend(json.loads(line) for line in lines if line.strip())
+        if len(items) > BULK_CREATE_MAX_TASKS:
+            raise HTTPException(status_code=413, detail=f"Too many tasks (max {BULK_CREATE_MAX_TASKS})")
+    if buffer.strip():
+        items.append(json.loads(buffer))
+    return items
+
+
+@app.post("/tasks/bulk")
+async def bulk_create_tasks(request: Request):
+    """
+    批量创建任务：请求体为 JSON 数组或 NDJSON（Content-Type: application/x-ndjson），每项 {name, cron, command}。
+    先校验全部条目与 cron 表达式，任一条无效则不创建任何任务；通过后分批事务插入，返回按输入顺序分配的 ID
+    """
+    try:
+        items = await _read_bulk_items(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+    if len(items) > BULK_CREATE_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"Too many tasks (max {BULK_CREATE_MAX_TASKS})")
+
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            task = TaskCreateRequest(**item)
+            compile_cron(task.cron)
+        except (ValidationError, ValueError, TypeError) as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        rows.append((task.name, task.cron, task.command))
+
+    if errors:
+        return JSONResponse(status_code=400, content={
+            "error": f"{len(errors)} invalid task(s), nothing created",
+            "errors": errors[:MAX_BULK_ERRORS],
+        })
+
+    try:
+        ids = await adb.create_tasks(rows)
+    except BulkCreateError as e:
+        logger.error(f"批量创建任务中途失败: 已创建 {len(e.ids)}/{len(rows)} 个, error={e.__cause__}")
+        return JSONResponse(status_code=500, content={
+            "error": f"bulk create failed after {len(e.ids)} of {len(rows)} task(s): {e.__cause__}",
+            "created": len(e.ids),
+            "ids": e.ids,
+        })
+    logger.info(f"批量创建任务: {len(ids)} 个")
+    return {"created": len(ids), "ids": ids}
+
+# JSON 任务列表单页上限
+MAX_PAGE_SIZE = 1000
+
+# NDJSON 导出每批读取的任务数（每批一次短查询，内存占用与任务总数无关）
+EXPORT_BATCH_SIZE = 1000
+
+# 已结束的执行记录不再变化，允许客户端长期缓存
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# 会变化的资源：可以缓存，但每次使用前必须用 ETag 重新验证
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """由数据版本与请求参数生成强 ETag"""
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:24] + '"'
+
+
+def not_modified(request: Request, etag: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response | None:
+    """If-None-Match 命中时返回 304 响应（不查询、不序列化结果集），否则返回 None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+
+async def stream_task_rows(columns: tuple[str, ...], status: str, after: int | None, limit: int | None):
+    """按 id 升序分批读取任务并逐行输出 NDJSON"""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        batch_size = EXPORT_BATCH_SIZE if remaining is None else min(EXPORT_BATCH_SIZE, remaining)
+        rows = await adb.list_task_rows(columns, status=status, after=after, limit=batch_size)
+        if not rows:
+            return
+        yield "".join(
+            json.dumps(dict(zip(columns, row[1:])), ensure_ascii=False) + "\n" for row in rows
+        ).encode()
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
 @app.get("/tasks", response_model=List[Task])
-def get_all_tasks():
-    tasks = list_tasks()
+async def get_all_tasks(request: Request, response: Response, limit: int | None = None, cursor: int | None = None,
+                        status: str = "", format: str = "", fields: str = ""):
+    """
+    不带参数时返回全部任务（读取进程内任务缓存）；带 limit/cursor/status 时按 id 升序键集分页，
+    下一页游标在 X-Next-Cursor 响应头中（没有更多时不返回），总数在 X-Total-Count 中
+    format=ndjson 或 Accept: application/x-ndjson 时流式导出（每行一个任务，fields 指定输出的列，
+    cursor/limit/status 同样适用且 limit 不设上限）
+    ETag 由任务数据版本与查询参数生成，If-None-Match 命中时返回 304
+    """
+    ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    columns = TASK_FIELDS
+    if fields:
+        if not ndjson:
+            raise HTTPException(status_code=400, detail="fields requires format=ndjson")
+        columns = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in columns if name not in TASK_FIELDS]
+        if unknown or not columns:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    cached = not ndjson and limit is None and cursor is None and not status
+    # 先读版本再读数据：数据只会比 ETag 新，客户端不会把旧数据当作最新
+    version = await adb.run_db(task_cache.version) if cached else await adb.get_tasks_version()
+    etag = make_etag("tasks", "ndjson" if ndjson else "json", version, request.url.query)
+    if (hit := not_modified(request, etag)) is not None:
+        return hit
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL, "Vary": "Accept"}
+
+    if ndjson:
+        return StreamingResponse(
+            stream_task_rows(columns, status, cursor, limit),
+            media_type="application/x-ndjson",
+            headers=headers
+        )
+
+    response.headers.update(headers)
+
+    if cached:
+        return await adb.run_db(task_cache.list_tasks)
+
+    limit = max(1, min(limit or 100, MAX_PAGE_SIZE))
+    tasks, has_more = await adb.list_tasks_page(status=status, after=cursor, limit=limit, descending=False)
+    if has_more:
+        response.headers["X-Next-Cursor"] = str(tasks[-1].id)
+    response.headers["X-Total-Count"] = str(await adb.count_tasks(status))
     return tasks
 
 
@@ -252,19 +438,8 @@ async def bulk_delete_tasks(request: Request):
             {"request": request, "action": "delete", "success": False, "error": f"未选择任务 - body: {raw}"}
         )
 
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(f"SELECT id, name FROM tasks WHERE id IN ({','.join(['?']*len(ids))})", tuple(ids))
-        found = {row['id']: row['name'] for row in cursor.fetchall()}
-
-        cursor.execute(f"DELETE FROM executions WHERE task_id IN ({','.join(['?']*len(ids))})", tuple(ids))
-        deleted_exec_count = cursor.rowcount
-
-        cursor.execute(f"DELETE FROM tasks WHERE id IN ({','.join(['?']*len(ids))})", tuple(ids))
-        deleted_task_count = cursor.rowcount
-
-        conn.commit()
+        found, deleted_task_count, deleted_exec_count = await adb.delete_tasks(ids)
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -279,16 +454,10 @@ async def bulk_delete_tasks(request: Request):
             }
         )
     except Exception as e:
-        try:
-            conn.rollback()
-        except:
-            pass
         return templates.TemplateResponse(
             "bulk_action_result.html",
             {"request": request, "action": "delete", "success": False, "error": str(e)}
         )
-    finally:
-        conn.close()
 
 
 @app.post("/tasks/bulk/pause")
@@ -315,12 +484,8 @@ async def bulk_pause_tasks(request: Request):
             {"request": request, "action": "pause", "success": False, "error": "未选择任务"}
         )
 
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(f"UPDATE tasks SET status = 'PAUSED' WHERE id IN ({','.join(['?']*len(ids))})", tuple(ids))
-        updated_count = cursor.rowcount
-        conn.commit()
+        updated_count = await adb.pause_tasks(ids)
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -333,16 +498,10 @@ async def bulk_pause_tasks(request: Request):
             }
         )
     except Exception as e:
-        try:
-            conn.rollback()
-        except:
-            pass
         return templates.TemplateResponse(
             "bulk_action_result.html",
             {"request": request, "action": "pause", "success": False, "error": str(e)}
         )
-    finally:
-        conn.close()
 
 
 @app.post("/tasks/bulk/force_run")
@@ -370,12 +529,8 @@ async def bulk_force_run_tasks(request: Request):
         )
 
     now = datetime.utcnow().isoformat()
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(f"UPDATE tasks SET force_run_at = ? WHERE id IN ({','.join(['?']*len(ids))})", (now, *ids))
-        updated_count = cursor.rowcount
-        conn.commit()
+        updated_count = await adb.force_run_tasks(ids, now)
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -389,18 +544,10 @@ async def bulk_force_run_tasks(request: Request):
             }
         )
     except Exception as e:
-        try:
-            conn.rollback()
-        except:
-            pass
         return templates.TemplateResponse(
             "bulk_action_result.html",
             {"request": request, "action": "force_run", "success": False, "error": str(e)}
         )
-    finally:
-        conn.close()
-
-
 
 
 @app.post("/tasks/{task_id}/run")
@@ -445,6 +592,7 @@ def force_run_task(task_id: int, request: Request):
             )
 
         conn.commit()
+        notify_tasks_changed([task_id])
 
         return templates.TemplateResponse(
             "run_task_result.html",
@@ -471,8 +619,8 @@ def force_run_task(task_id: int, request: Request):
 
 
 @app.get("/executions/{execution_id}")
-def get_execution_detail(execution_id: int):
-    execution = get_execution(execution_id)
+async def get_execution_detail(execution_id: int):
+    execution = await adb.get_execution(execution_id)
 
     if execution is None:
         raise HTTPException(status_code=404, detail="Execution not found")
@@ -496,30 +644,209 @@ def api_cron_next(cron: str, n: int = 5):
         return JSONResponse(status_code=400, content={"error": str(e)})
 
 
+# 批量 cron 预览单次请求的表达式数上限
+CRON_BATCH_MAX = 10000
+
+
+class CronPreviewItem(BaseModel):
+    cron: str
+    start: datetime | None = None
+
+
+class CronBatchRequest(BaseModel):
+    expressions: List[str | CronPreviewItem]
+    count: int = 5
+    start: datetime | None = None
+
+
+@app.post('/api/cron/next/batch')
+def api_cron_next_batch(body: CronBatchRequest):
+    """
+    批量校验并展开 cron 表达式：expressions 中每项为表达式字符串或 {cron, start}，
+    未指定 start 的使用请求级 start（默认当前时间）；按输入顺序返回每项的结果，无效表达式返回 error
+    结果按（表达式, 对齐到分钟的起始时间, 次数）缓存，重复的表达式只计算一次
+    """
+    if body.count <= 0 or body.count > 100:
+        return JSONResponse(status_code=400, content={"error": "count must be 1..100"})
+    if len(body.expressions) > CRON_BATCH_MAX:
+        return JSONResponse(status_code=400, content={"error": f"Too many expressions (max {CRON_BATCH_MAX})"})
+
+    default_start = body.start or datetime.utcnow()
+    results = []
+    invalid = 0
+    for item in body.expressions:
+        if isinstance(item, str):
+            item = CronPreviewItem(cron=item)
+        try:
+            results.append({"cron": item.cron, "valid": True,
+                            "next_runs": next_run_times(item.cron, body.count, item.start or default_start)})
+        except ValueError as e:
+            invalid += 1
+            results.append({"cron": item.cron, "valid": False, "error": str(e)})
+
+    return {"results": results, "invalid": invalid}
+
+
+
+@app.get('/api/stats')
+def api_stats():
+    """运行时统计：cron 编译与预览缓存命中率、执行池队列深度与利用率、保留策略最近一次清理结果、任务缓存命中情况、执行记录组提交批量、认证缓存命中情况"""
+    return {
+        "cron_cache": cron_cache_stats(),
+        "cron_preview_cache": preview_cache_stats(),
+        "executor": execution_pool.stats(),
+        "retention": retention_service.stats(),
+        "task_cache": task_cache.stats(),
+        "execution_writer": execution_writer.stats(),
+        "auth_cache": auth_cache_stats(),
+    }
+
+
 
 # Deepseek generation API removed (feature deprecated)
 
 
 @app.get("/api/executions/{execution_id}")
-def api_execution_detail(execution_id: int):
-    execution = get_execution(execution_id)
+async def api_execution_detail(execution_id: int, request: Request, response: Response):
+    """执行记录详情；ETag 由状态列生成，已结束的执行记录不再变化，响应可长期缓存"""
+    state = await adb.get_execution_state(execution_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+
+    etag = make_etag("execution", execution_id, *state.values())
+    finished = state["status"] in ("SUCCESS", "FAILED")
+    cache_control = IMMUTABLE_CACHE_CONTROL if finished else REVALIDATE_CACHE_CONTROL
+    if (hit := not_modified(request, etag, cache_control)) is not None:
+        return hit
 
+    execution = await adb.get_execution(execution_id)
     if execution is None:
         raise HTTPException(status_code=404, detail="Execution not found")
 
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
     return execution
 
 
+# 单个实时日志连接最多缓冲的未发送事件数，客户端跟不上时丢弃新的输出行
+LIVE_STREAM_QUEUE_SIZE = 10000
+FINISHED_STATUSES = ("SUCCESS", "FAILED")
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/api/executions/{execution_id}/stream")
+async def api_execution_stream(execution_id: int, request: Request):
+    """
+    实时日志（Server-Sent Events）：推送执行的状态变化（status）与输出行（output），结束时推送 end
+    在本进程执行的记录由进程内事件推送，先回放最近的积压事件，不访问数据库；
+    在其他进程执行时每隔 LIVE_STREAM_POLL_INTERVAL 秒检查一次状态，结束后从数据库补发输出
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_STREAM_QUEUE_SIZE)
+
+    def offer(event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass  # 丢弃的 end 事件由状态检查兜底
+
+    def on_event(event: dict):
+        # 事件在执行线程中发布，转交给事件循环
+        loop.call_soon_threadsafe(offer, event)
+
+    # 先订阅再读状态：读取状态之后产生的事件不会丢失
+    backlog = subscribe_execution(execution_id, on_event)
+    try:
+        state = await adb.get_execution_state(execution_id)
+    except Exception:
+        unsubscribe_execution(execution_id, on_event)
+        raise
+    if state is None:
+        unsubscribe_execution(execution_id, on_event)
+        raise HTTPException(status_code=404, detail="Execution not found")
+
+    async def events():
+        try:
+            status = state["status"]
+            live = False
+            yield sse_event("status", {"type": "status", "status": status})
+            for event in backlog:
+                live = live or event["type"] == "output"
+                yield sse_event(event["type"], event)
+
+            while status not in FINISHED_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), LIVE_STREAM_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    current = await adb.get_execution_state(execution_id)
+                    if current is None:
+                        break
+                    if current["status"] != status:
+                        status = current["status"]
+                        yield sse_event("status", {"type": "status", "status": status})
+                    else:
+                        yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "end":
+                    break
+                if event["type"] == "status":
+                    status = event["status"]
+                live = live or event["type"] == "output"
+                yield sse_event(event["type"], event)
+
+            # 结束：没有收到实时输出（在其他进程执行或订阅前已结束）时从数据库补发完整输出
+            execution = await adb.get_execution(execution_id)
+            if execution is None:
+                yield sse_event("end", {"type": "end", "status": None})
+                return
+            if not live:
+                for stream in ("stdout", "stderr"):
+                    for line in (execution[stream] or "").splitlines():
+                        yield sse_event("output", {"type": "output", "stream": stream, "line": line})
+            yield sse_event("end", {"type": "end", "status": execution["status"]})
+        finally:
+            unsubscribe_execution(execution_id, on_event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/ui/tasks")
-def ui_tasks(request: Request, q: str = "", status: str = "", page: int = 1):
-    """任务列表页面，支持搜索和分页"""
+async def ui_tasks(request: Request, q: str = "", status: str = "", page: int = 1,
+             after: int | None = None, before: int | None = None):
+    """
+    任务列表页面，支持搜索和分页
+    浏览时按 id 倒序键集分页（after/before 游标），总数读取按状态计数；
+    搜索结果按相关度排序，仍按页码分页
+    """
     limit = 20
-    offset = (page - 1) * limit
-    
-    tasks, total = search_tasks(query=q, status=status, limit=limit, offset=offset)
-    total_pages = (total + limit - 1) // limit
-    
-    logger.info(f"查询任务列表: q={q}, status={status}, page={page}, 找到 {len(tasks)} 个任务")
+    prev_cursor = next_cursor = None
+
+    etag = make_etag("ui-tasks", await adb.get_tasks_version(), getattr(request.state, "user", ""), request.url.query)
+    if (hit := not_modified(request, etag)) is not None:
+        return hit
+
+    if q:
+        offset = (page - 1) * limit
+        tasks, total = await adb.search_tasks(query=q, status=status, limit=limit, offset=offset)
+        total_pages = (total + limit - 1) // limit
+    else:
+        tasks, has_more = await adb.list_tasks_page(status=status, after=after, before=before, limit=limit)
+        total = await adb.count_tasks(status)
+        total_pages = None
+        if tasks:
+            has_prev = has_more if before is not None else after is not None
+            has_next = has_more if before is None else True
+            prev_cursor = tasks[0].id if has_prev else None
+            next_cursor = tasks[-1].id if has_next else None
+
+    logger.info(f"查询任务列表: q={q}, status={status}, page={page}, after={after}, before={before}, 找到 {len(tasks)} 个任务")
     
     return templates.TemplateResponse(
         "tasks.html",
@@ -530,8 +857,12 @@ def ui_tasks(request: Request, q: str = "", status: str = "", page: int = 1):
             "status_filter": status,
             "page": page,
             "total_pages": total_pages,
-            "total": total
-        }
+            "total": total,
+            "prev_cursor": prev_cursor,
+            "next_cursor": next_cursor,
+            "paged": after is not None or before is not None
+        },
+        headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
     )
 
 
@@ -583,14 +914,10 @@ def ui_task_detail(task_id: int, request: Request):
     # 转换为字典
     task = dict(task_row)
     
-    # 获取执行记录
-    cursor.execute(
-        "SELECT * FROM executions WHERE task_id = ? ORDER BY id DESC LIMIT 20",
-        (task_id,)
-    )
-    executions = [dict(row) for row in cursor.fetchall()]
-    
     conn.close()
+
+    # 获取执行记录（输出已解压）
+    executions = list_executions_by_task(task_id)
     
     # 计算下次运行时间（如Cron表达式无效则忽略）
     next_runs = None
@@ -654,19 +981,14 @@ def update_task_from_form(
 
 
 @app.get("/ui/executions/{execution_id}")
-def ui_execution_detail(execution_id: int, request: Request):
-    execution = get_execution(execution_id)
+async def ui_execution_detail(execution_id: int, request: Request):
+    execution = await adb.get_execution(execution_id)
     
     if execution is None:
         raise HTTPException(status_code=404, detail="Execution not found")
     
     # Get task info for command display
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id = ?", (execution["task_id"],))
-    task_row = cursor.fetchone()
-    task = dict(task_row) if task_row else None
-    conn.close()
+    task = await adb.get_task_by_id(execution["task_id"])
     
     return templates.TemplateResponse(
         "execution_detail.html",
@@ -709,6 +1031,7 @@ def toggle_task_status(task_id: int, request: Request):
             (new_status, task_id)
         )
         conn.commit()
+        notify_tasks_changed([task_id])
         
         # 4. 返回结果页面
         return templates.TemplateResponse(
@@ -745,61 +1068,69 @@ def cleanup_old_executions(
     keep_last: int = 50  # 默认保留最近50条
 ):
     """
-    清理任务的旧执行记录
+    清理任务的旧执行记录（分批短事务删除，只删除已结束的记录）
     keep_last: 保留最近多少条记录
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    if keep_last < 0:
+        raise HTTPException(status_code=400, detail="keep_last must be >= 0")
+    if get_task_by_id(task_id) is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+
     try:
-        # 1. 验证任务是否存在
-        cursor.execute("SELECT id FROM tasks WHERE id = ?", (task_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-        
-        # 2. 获取清理前的记录数
-        cursor.execute("SELECT COUNT(*) as count FROM executions WHERE task_id = ?", (task_id,))
-        before_count = cursor.fetchone()["count"]
-        
-        # 3. 执行清理（保留最近keep_last条）
-        cursor.execute("""
-            DELETE FROM executions 
-            WHERE task_id = ? 
-            AND id NOT IN (
-                SELECT id FROM executions 
-                WHERE task_id = ? 
-                ORDER BY id DESC 
-                LIMIT ?
-            )
-        """, (task_id, task_id, keep_last))
-        
-        deleted_count = cursor.rowcount
-        
-        # 4. 获取清理后的记录数
-        cursor.execute("SELECT COUNT(*) as count FROM executions WHERE task_id = ?", (task_id,))
-        after_count = cursor.fetchone()["count"]
-        
-        conn.commit()
-        
-        return {
-            "task_id": task_id,
-            "deleted_count": deleted_count,
-            "before_count": before_count,
-            "after_count": after_count,
-            "keep_last": keep_last,
-            "message": f"Deleted {deleted_count} old executions, kept {after_count} recent ones"
-        }
-        
+        before_count = count_executions(task_id)
+        deleted_count = trim_task(task_id, keep_last)
+        after_count = count_executions(task_id)
     except Exception as e:
-        try:
-            conn.rollback()
-        except:
-            pass
         raise HTTPException(status_code=500, detail=f"Cleanup error: {str(e)}")
-        
-    finally:
-        if conn:
-            conn.close()
+
+    return {
+        "task_id": task_id,
+        "deleted_count": deleted_count,
+        "before_count": before_count,
+        "after_count": after_count,
+        "keep_last": keep_last,
+        "message": f"Deleted {deleted_count} old executions, kept {after_count} recent ones"
+    }
+
+
+class RetentionPolicyRequest(BaseModel):
+    keep_last: int | None = None
+    max_age_days: float | None = None
+    max_bytes: int | None = None
+
+
+@app.get("/tasks/{task_id}/retention")
+def get_task_retention(task_id: int):
+    """任务的执行记录保留策略：override 为单独设置的字段，effective 为合并全局配置后的结果"""
+    if get_task_by_id(task_id) is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    override = get_retention_policy(task_id) or {}
+    effective = {
+        "keep_last": retention_service.keep_last,
+        "max_age_days": retention_service.max_age_days,
+        "max_bytes": 0,
+    }
+    effective.update({k: v for k, v in override.items() if v is not None})
+    return {"task_id": task_id, "override": override or None, "effective": effective}
+
+
+@app.put("/tasks/{task_id}/retention")
+def put_task_retention(task_id: int, policy: RetentionPolicyRequest):
+    """设置任务的保留策略（字段为 null 表示沿用全局配置，全部为 null 时删除单独策略）"""
+    if get_task_by_id(task_id) is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    for field in ("keep_last", "max_age_days", "max_bytes"):
+        value = getattr(policy, field)
+        if value is not None and value < 0:
+            raise HTTPException(status_code=400, detail=f"{field} must be >= 0")
+    set_retention_policy(task_id, policy.keep_last, policy.max_age_days, policy.max_bytes)
+    return get_task_retention(task_id)
+
+
+@app.post("/api/retention/run")
+def run_retention():
+    """立即按保留策略清理一轮（通常由调度器后台定期执行）"""
+    return retention_service.run_once()
 
 
 @app.post("/tasks/{task_id}/delete")
@@ -835,6 +1166,7 @@ def delete_task(task_id: int, request: Request):
         cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
         
         conn.commit()
+        notify_tasks_changed([task_id])
         
         return templates.TemplateResponse(
             "delete_task_result.html",
@@ -891,6 +1223,7 @@ def bulk_delete_tasks(request: Request, task_ids: List[int] = Form(None)):
         deleted_task_count = cursor.rowcount
 
         conn.commit()
+        notify_tasks_changed(found.keys())
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -932,6 +1265,7 @@ def bulk_pause_tasks(request: Request, task_ids: List[int] = Form(None)):
         cursor.execute(f"UPDATE tasks SET status = 'PAUSED' WHERE id IN ({','.join(['?']*len(task_ids))})", tuple(task_ids))
         updated_count = cursor.rowcount
         conn.commit()
+        notify_tasks_changed(task_ids)
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -972,6 +1306,7 @@ def bulk_force_run_tasks(request: Request, task_ids: List[int] = Form(None)):
         cursor.execute(f"UPDATE tasks SET force_run_at = ? WHERE id IN ({','.join(['?']*len(task_ids))})", (now, *task_ids))
         updated_count = cursor.rowcount
         conn.commit()
+        notify_tasks_changed(task_ids)
 
         return templates.TemplateResponse(
             "bulk_action_result.html",
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from common import db
+from config import DB_EXECUTOR_WORKERS
+
+# 异步数据访问层：common/db.py 中每个数据函数的 async 版本，供 async def 路由使用。
+# 所有数据库调用在专用的 DB 线程池中执行，不阻塞事件循环，也不占用 Starlette 的通用线程池；
+# 线程数与连接池大小一致，每个 DB 线程都能复用一个空闲连接。
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+async def run_db(fn, *args, **kwargs):
+    """在 DB 线程池中执行同步数据库函数并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _async(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_db(fn, *args, **kwargs)
+    return wrapper
+
+
+init_db = _async(db.init_db)
+
+# 任务
+create_task = _async(db.create_task)
+create_tasks = _async(db.create_tasks)
+get_tasks_version = _async(db.get_tasks_version)
+list_tasks = _async(db.list_tasks)
+count_tasks = _async(db.count_tasks)
+list_tasks_page = _async(db.list_tasks_page)
+list_task_rows = _async(db.list_task_rows)
+search_tasks = _async(db.search_tasks)
+get_task_by_id = _async(db.get_task_by_id)
+get_tasks_by_ids = _async(db.get_tasks_by_ids)
+update_task = _async(db.update_task)
+update_tasks_fields = _async(db.update_tasks_fields)
+delete_tasks = _async(db.delete_tasks)
+pause_tasks = _async(db.pause_tasks)
+force_run_tasks = _async(db.force_run_tasks)
+increment_retry_count = _async(db.increment_retry_count)
+reset_retry_count = _async(db.reset_retry_count)
+get_task_retry_info = _async(db.get_task_retry_info)
+try_mark_running = _async(db.try_mark_running)
+
+# 执行记录
+claim_tasks = _async(db.claim_tasks)
+complete_execution = _async(db.complete_execution)
+create_execution = _async(db.create_execution)
+claim_execution = _async(db.claim_execution)
+renew_leases = _async(db.renew_leases)
+expire_leases = _async(db.expire_leases)
+finish_execution = _async(db.finish_execution)
+fail_execution = _async(db.fail_execution)
+get_execution = _async(db.get_execution)
+get_execution_state = _async(db.get_execution_state)
+count_executions = _async(db.count_executions)
+list_executions_by_task = _async(db.list_executions_by_task)
+compress_execution_outputs = _async(db.compress_execution_outputs)
+
+# 保留策略
+get_retention_policy = _async(db.get_retention_policy)
+list_retention_policies = _async(db.list_retention_policies)
+set_retention_policy = _async(db.set_retention_policy)
+
+# 用户
+create_user_db = _async(db.create_user_db)
+get_user_by_username = _async(db.get_user_by_username)
+authenticate_user_db = _async(db.authenticate_user_db)
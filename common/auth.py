@@ -1,5 +1,10 @@
 from common.db import create_user_db, get_user_by_username, authenticate_user_db
+from common.events import subscribe, USERS_CHANGED
+from config import AUTH_TOKEN_CACHE_SIZE, AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
@@ -40,16 +45,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
-    """验证 token 并返回用户名"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+class ExpiringCache:
+    """有界缓存：每个条目带自己的过期时间（Unix 时间戳），超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
             return None
-        return username
-    except jwt.DecodeError:
+
+    def set(self, key, value, expires_at: float):
+        if self.maxsize <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+# 已验证 token -> claims，条目在 token 过期时失效；验证失败的 token 不缓存
+_token_cache = ExpiringCache(AUTH_TOKEN_CACHE_SIZE)
+# 用户名 -> 用户记录，条目在 AUTH_USER_CACHE_TTL 或 token 过期时失效，用户变更时立即清除
+_user_cache = ExpiringCache(AUTH_USER_CACHE_SIZE)
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """验证 token 并返回 claims（带缓存）；无效或已过期返回 None"""
+    claims = _token_cache.get(token)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+    if claims.get("sub") is None:
         return None
+    _token_cache.set(token, claims, claims.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    return claims
+
+
+def verify_token(token: str) -> Optional[str]:
+    """验证 token 并返回用户名"""
+    claims = decode_token(token)
+    return claims["sub"] if claims else None
+
+
+def invalidate_users(usernames):
+    """用户变更时清除其缓存记录（订阅 USERS_CHANGED）"""
+    for username in usernames:
+        _user_cache.pop(username)
+
+
+subscribe(USERS_CHANGED, invalidate_users)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
 
 # 用户数据库（已迁移到 SQLite 数据库）
 # fake_users_db = {
@@ -93,13 +169,17 @@ def get_current_user(token: str) -> User:
         detail="无效的身份验证凭证",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = verify_token(token)
-    if username is None:
+    claims = decode_token(token)
+    if claims is None:
         raise credentials_exception
-    
-    user_data = get_user_by_username(username)
+
+    username = claims["sub"]
+    user_data = _user_cache.get(username)
     if user_data is None:
-        raise credentials_exception
+        user_data = get_user_by_username(username)
+        if user_data is None:
+            raise credentials_exception
+        _user_cache.set(username, user_data, min(claims.get("exp", float("inf")), time.time() + AUTH_USER_CACHE_TTL))
     
     return User(username=user_data["username"], is_active=not user_data.get("disabled", False))
 
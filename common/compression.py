@@ -0,0 +1,68 @@
+import zlib
+from config import logger, OUTPUT_CODEC, OUTPUT_COMPRESS_MIN_BYTES
+
+# 执行输出压缩存储：executions.output_codec 记录该行 BLOB 使用的编码（zlib / zstd），
+# 小于 OUTPUT_COMPRESS_MIN_BYTES 的输出仍按 TEXT 原样存储；读取时按值的类型判断是否需要解压。
+# output_codec 为 NULL 表示旧版本写入、尚未经过后台压缩的行。
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，只有 OUTPUT_CODEC=zstd 时需要
+    zstandard = None
+
+# zlib 压缩级别：日志类文本在 6 级已接近最高压缩比
+ZLIB_LEVEL = 6
+
+
+def _resolve_codec(name: str) -> str | None:
+    name = (name or "").lower()
+    if name in ("", "none"):
+        return None
+    if name == "zstd" and zstandard is None:
+        logger.warning("OUTPUT_CODEC=zstd 但未安装 zstandard，改用 zlib")
+        return "zlib"
+    if name not in ("zlib", "zstd"):
+        logger.warning(f"未知的 OUTPUT_CODEC={name}，改用 zlib")
+        return "zlib"
+    return name
+
+
+CODEC = _resolve_codec(OUTPUT_CODEC)
+
+
+def encode_output(text: str | None, codec: str | None = CODEC) -> str | bytes | None:
+    """压缩一段输出；未启用压缩或输出较短时原样返回"""
+    if text is None or codec is None:
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < OUTPUT_COMPRESS_MIN_BYTES:
+        return text
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decode_output(value: str | bytes | None, codec: str | None) -> str | None:
+    """还原一段输出：TEXT 原样返回，BLOB 按 codec 解压"""
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        if codec == "zlib":
+            value = zlib.decompress(value)
+        elif codec == "zstd":
+            if zstandard is None:
+                return "[输出为 zstd 压缩，需要安装 zstandard 才能查看]"
+            value = zstandard.ZstdDecompressor().decompress(value)
+    except Exception as e:
+        logger.error(f"解压执行输出失败 (codec={codec}): {e}")
+        return "[输出解压失败]"
+    return value.decode("utf-8", errors="replace")
+
+
+def decode_execution(execution: dict) -> dict:
+    """把执行记录中的 stdout/stderr 还原为文本（去掉 output_codec 字段，对外结构不变）"""
+    codec = execution.pop("output_codec", None)
+    for field in ("stdout", "stderr"):
+        if field in execution:
+            execution[field] = decode_output(execution[field], codec)
+    return execution
@@ -0,0 +1,157 @@
+import calendar
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from croniter import croniter
+from config import CRON_CACHE_SIZE
+
+# 向后查找的最大步数（月/日/时粒度），超过即认为表达式永远不会触发（如 2 月 30 日）
+MAX_SEARCH_STEPS = 5000
+
+
+def _to_mask(values, low: int, high: int) -> int:
+    """把 croniter 展开的字段值列表转换为位图；'*' 表示全部"""
+    if values == ['*']:
+        return sum(1 << v for v in range(low, high + 1))
+    mask = 0
+    for v in values:
+        mask |= 1 << int(v)
+    return mask
+
+
+def _next_table(mask: int, low: int, high: int) -> list:
+    """预计算 table[v] = 不小于 v 的第一个允许值，没有则为 None"""
+    table = [None] * (high + 2)
+    nxt = None
+    for v in range(high, low - 1, -1):
+        if mask >> v & 1:
+            nxt = v
+        table[v] = nxt
+    return table
+
+
+class CompiledCron:
+    """
+    预编译的 5 段 cron 表达式
+    各字段展开为位图和"下一个允许值"查找表，计算下次时间只需查表推进，无需重新解析
+    秒字段、L/#/W 等扩展语法回退到 croniter 计算
+    """
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        try:
+            croniter(expr)
+            fields, nth_weekday = croniter.expand(expr)
+        except Exception as e:
+            raise ValueError(f"Invalid cron expression: {e}")
+
+        self.fallback = (
+            len(fields) != 5
+            or bool(nth_weekday)
+            or any(isinstance(v, str) and v != '*' for field in fields for v in field)
+        )
+        if self.fallback:
+            return
+
+        minutes, hours, days, months, weekdays = fields
+        self.minute_mask = _to_mask(minutes, 0, 59)
+        self.hour_mask = _to_mask(hours, 0, 23)
+        self.day_mask = _to_mask(days, 1, 31)
+        self.month_mask = _to_mask(months, 1, 12)
+        self.weekday_mask = _to_mask(weekdays, 0, 6)
+
+        self.next_minute = _next_table(self.minute_mask, 0, 59)
+        self.next_hour = _next_table(self.hour_mask, 0, 23)
+        self.next_month = _next_table(self.month_mask, 1, 12)
+
+        # 与 croniter 一致：日和星期都被限定时取并集，否则只看被限定的那个
+        self.day_any = days == ['*']
+        self.weekday_any = weekdays == ['*']
+
+    def _day_matches(self, d: date) -> bool:
+        day_ok = bool(self.day_mask >> d.day & 1)
+        weekday_ok = bool(self.weekday_mask >> ((d.weekday() + 1) % 7) & 1)  # cron: 0=周日
+        if self.day_any:
+            return weekday_ok
+        if self.weekday_any:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def get_next(self, base: datetime) -> datetime:
+        """返回严格晚于 base 的下一次触发时间"""
+        if self.fallback or base.tzinfo is not None:
+            return croniter(self.expr, base).get_next(datetime)
+
+        t = base.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = t.date()
+        hour, minute = t.hour, t.minute
+
+        for _ in range(MAX_SEARCH_STEPS):
+            # 月
+            month = self.next_month[day.month]
+            if month is None:
+                day, hour, minute = date(day.year + 1, 1, 1), 0, 0
+                continue
+            if month != day.month:
+                day, hour, minute = date(day.year, month, 1), 0, 0
+
+            # 日
+            if not self._day_matches(day):
+                last_day = calendar.monthrange(day.year, day.month)[1]
+                if day.day == last_day:
+                    day = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+                else:
+                    day = day + timedelta(days=1)
+                hour, minute = 0, 0
+                continue
+
+            # 时
+            h = self.next_hour[hour]
+            if h is None:
+                day, hour, minute = day + timedelta(days=1), 0, 0
+                continue
+            if h != hour:
+                hour, minute = h, 0
+
+            # 分
+            m = self.next_minute[minute]
+            if m is None:
+                hour, minute = hour + 1, 0
+                if hour > 23:
+                    day, hour = day + timedelta(days=1), 0
+                continue
+
+            return datetime(day.year, day.month, day.day, hour, m)
+
+        raise ValueError(f"Cron expression never fires: {self.expr}")
+
+    def iter_next(self, base: datetime, count: int) -> list[datetime]:
+        """返回 base 之后的 count 个触发时间"""
+        times = []
+        for _ in range(count):
+            base = self.get_next(base)
+            times.append(base)
+        return times
+
+
+@lru_cache(maxsize=CRON_CACHE_SIZE)
+def compile_cron(expr: str) -> CompiledCron:
+    """获取预编译的 cron 表达式（有界 LRU 缓存，调度器与 API 共享）；无效表达式抛出 ValueError"""
+    return CompiledCron(expr)
+
+
+def get_next_time(expr: str, base: datetime) -> datetime:
+    """计算 base 之后的下一次触发时间"""
+    return compile_cron(expr).get_next(base)
+
+
+def cron_cache_stats() -> dict:
+    """缓存命中统计"""
+    info = compile_cron.cache_info()
+    total = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": round(info.hits / total, 4) if total else 0.0,
+    }
@@ -1,83 +1,153 @@
+import json
+import logging
+import os
+import re
 import sqlite3
+import threading
+import dataclasses
 from pathlib import Path
 from common.models import Task
+from common.events import notify_tasks_changed, notify_users_changed
+from common.migrations import migrate
+from common.compression import CODEC, encode_output, decode_execution
+from config import DB_POOL_SIZE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS, BULK_INSERT_CHUNK_SIZE
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 DB_PATH=Path("data/scheduler.db")
 
-def get_connection():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(
-        DB_PATH,
-        timeout=10,          # 👈 等待锁（秒）
-        check_same_thread=False
-    )
-    conn.row_factory = sqlite3.Row
-    return conn
+
+class ConnectionPool:
+    """
+    共享连接池：连接只在首次需要时打开并设置 WAL 等 PRAGMA，用完归还复用
+    最多保留 size 个空闲连接；并发借出超过该数量时临时新建，归还时直接关闭
+    """
+
+    def __init__(self, path: Path, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.pid = os.getpid()
+        self.closed = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,   # 👈 等待锁（秒）
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        # 只对新建的数据库生效（必须在建表与切换 WAL 之前设置），供保留策略做增量回收
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+        return conn
+
+    def acquire(self) -> "PooledConnection":
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        return PooledConnection(self, conn or self._open())
+
+    def release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()   # 未提交的写入不能带给下一个使用者
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if not self.closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """关闭所有空闲连接；已借出的连接归还时关闭"""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class PooledConnection:
+    """
+    从连接池借出的连接，用法与 sqlite3.Connection 相同
+    close() 归还到连接池（可重复调用）；with 块结束时提交或回滚后归还
+    """
+
+    def __init__(self, pool: ConnectionPool, conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._conn is not None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """当前 DB_PATH 对应的连接池；DB_PATH 变化或 fork 出子进程后重建"""
+    global _pool
+    with _pool_lock:
+        pool = _pool
+        if pool is None or pool.path != DB_PATH or pool.pid != os.getpid():
+            if pool is not None and pool.pid == os.getpid():
+                pool.close()
+            # fork 继承来的连接不能在子进程中使用或关闭，直接丢弃
+            pool = _pool = ConnectionPool(DB_PATH)
+        return pool
+
+
+def get_connection() -> PooledConnection:
+    """从连接池借出一个连接，用完调用 close() 或使用 with 块归还"""
+    return _get_pool().acquire()
+
+
+def close_connections():
+    """关闭连接池中的所有空闲连接（进程退出或切换数据库时使用）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None and pool.pid == os.getpid():
+        pool.close()
+
 
 def init_db():
     with get_connection() as conn:
+        migrate(conn)
         cursor=conn.cursor()
-        cursor.execute("""CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            cron TEXT NOT NULL,
-            command TEXT NOT NULL,
-            status TEXT NOT NULL ,
-            last_run_at TEXT,
-            created_at TEXT NOT NULL
-            
-            )
-""")
-        try:
-            cursor.execute(
-                "ALTER TABLE tasks ADD COLUMN force_run_at TEXT"
-            )
-        except sqlite3.OperationalError:
-            pass  # 字段已存在，忽略
-        
-        # 添加重试字段
-        try:
-            cursor.execute(
-                "ALTER TABLE tasks ADD COLUMN retry_count INTEGER DEFAULT 0"
-            )
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cursor.execute(
-                "ALTER TABLE tasks ADD COLUMN max_retries INTEGER DEFAULT 3"
-            )
-        except sqlite3.OperationalError:
-            pass
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS executions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            task_id INTEGER NOT NULL,
-            status TEXT NOT NULL,
-            started_at TEXT ,
-            finished_at TEXT,
-            stdout TEXT,
-            stderr TEXT,
-            error TEXT,
-            FOREIGN KEY(task_id) REFERENCES tasks(id)
-        )
-        """)
-        
-        # 创建用户表
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            email TEXT,
-            full_name TEXT,
-            disabled BOOLEAN DEFAULT FALSE,
-            created_at TEXT NOT NULL
-        )
-        """)
-        
+
         # 创建默认管理员用户（如果不存在）
         cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", ("admin",))
         if cursor.fetchone()[0] == 0:
@@ -102,6 +172,7 @@ VALUES(?,?,?,?,?,?)
                        )
         task_id=cursor.lastrowid
 
+    notify_tasks_changed([task_id])
     return Task(
         id=task_id,
         name=name,
@@ -113,6 +184,41 @@ VALUES(?,?,?,?,?,?)
     )
 
 
+class BulkCreateError(Exception):
+    """批量创建中途失败；ids 为失败前已提交（并已通知）的任务 ID"""
+
+    def __init__(self, ids: list[int], cause: Exception):
+        super().__init__(f"created {len(ids)} task(s) before failing: {cause}")
+        self.ids = ids
+
+
+def create_tasks(rows: list[tuple[str, str, str]], chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> list[int]:
+    """
+    批量创建任务（rows 为 (name, cron, command) 列表，调用方负责校验）：
+    每 chunk_size 行一个事务，用 executemany 插入，每个事务提交后立即通知；返回按输入顺序分配的任务 ID。
+    中途失败时抛出 BulkCreateError，携带已提交的任务 ID
+    """
+    ids = []
+    now = Task.now()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO tasks (name, cron, command, status, last_run_at, created_at) VALUES (?, ?, ?, 'PENDING', NULL, ?)",
+                    [(name, cron, command, now) for name, cron, command in chunk]
+                )
+                # 同一写事务内没有其他写入者，自增 ID 连续分配；触发器中的插入不影响 last_insert_rowid
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        except Exception as e:
+            raise BulkCreateError(ids, e) from e
+        chunk_ids = list(range(last_id - len(chunk) + 1, last_id + 1))
+        ids.extend(chunk_ids)
+        notify_tasks_changed(chunk_ids)
+
+    return ids
+
+
 def list_tasks()->list[Task]:
     with get_connection() as conn:
         cursor=conn.cursor()
@@ -122,18 +228,156 @@ def list_tasks()->list[Task]:
         return [Task(**dict(row))for row in rows]
 
 
+def get_tasks_version() -> int:
+    """任务数据版本：任何任务的插入/更新/删除都会使其递增（含其他进程的写入）"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'").fetchone()
+    return row["seq"] if row else 0
+
+
+def list_task_changes(after_version: int) -> tuple[int | None, list[int]]:
+    """
+    版本 after_version 之后变化过的任务 ID
+    返回 (变更日志中保留的最早版本, 任务 ID 列表)；最早版本为 None 表示日志为空
+    """
+    with get_connection() as conn:
+        oldest = conn.execute("SELECT MIN(seq) FROM task_changes").fetchone()[0]
+        rows = conn.execute(
+            "SELECT DISTINCT task_id FROM task_changes WHERE seq > ?", (after_version,)
+        ).fetchall()
+    return oldest, [row["task_id"] for row in rows]
+
+
+def prune_task_changes(keep: int) -> int:
+    """只保留最近 keep 条任务变更日志，返回删除条数"""
+    with get_connection() as conn:
+        return conn.execute(
+            "DELETE FROM task_changes WHERE seq <= (SELECT MAX(seq) FROM task_changes) - ?", (keep,)
+        ).rowcount
+
+
+def count_tasks(status: str = "") -> int:
+    """任务总数（读取触发器维护的按状态计数，不扫描 tasks 表）"""
+    with get_connection() as conn:
+        if status:
+            row = conn.execute("SELECT count FROM task_counts WHERE status = ?", (status,)).fetchone()
+            return row["count"] if row else 0
+        return conn.execute("SELECT COALESCE(SUM(count), 0) AS cnt FROM task_counts").fetchone()["cnt"]
+
+
+def list_tasks_page(status: str = "", after: int | None = None, before: int | None = None,
+                    limit: int = 20, descending: bool = True) -> tuple[list[Task], bool]:
+    """
+    按 id 键集分页，每页开销与翻页深度无关
+    after：排序方向上位于该 id 之后的一页；before：位于该 id 之前的一页（用于上一页）
+    返回 (按排序方向排列的任务, 该翻页方向上是否还有更多)
+    """
+    backward = before is not None
+    cursor_id = before if backward else after
+    # 向前翻页时反向查询再翻转，保证取到紧邻 before 的一页
+    ascending = descending == backward
+
+    conditions = []
+    params = []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if cursor_id is not None:
+        conditions.append("id > ?" if ascending else "id < ?")
+        params.append(cursor_id)
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM tasks WHERE {where_clause} ORDER BY id {'ASC' if ascending else 'DESC'} LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+    has_more = len(rows) > limit
+    tasks = [Task(**dict(row)) for row in rows[:limit]]
+    if backward:
+        tasks.reverse()
+    return tasks, has_more
+
+
+# tasks 表中与 Task 字段一一对应的列
+TASK_FIELDS = tuple(field.name for field in dataclasses.fields(Task))
+
+
+def list_task_rows(columns: tuple[str, ...] = TASK_FIELDS, status: str = "", after: int | None = None,
+                   limit: int = 1000) -> list[tuple]:
+    """
+    导出用：按 id 升序读取 after 之后的一批任务，只查询指定列，不构造 Task
+    返回 (id, *columns) 元组列表；columns 必须是 TASK_FIELDS 的子集（由调用方校验）
+    """
+    unknown = set(columns) - set(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown task fields: {', '.join(sorted(unknown))}")
+
+    conditions = ["id > ?"]
+    params = [after if after is not None else 0]
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM tasks WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+            params + [limit]
+        ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+# trigram 分词器按三字符切分，更短的关键词无法走索引
+TRIGRAM_MIN_CHARS = 3
+
+
+def search_terms(query: str) -> list[str]:
+    """按空白拆分关键词，丢弃没有可索引字符（如只有标点）的词"""
+    return [word for word in query.split() if re.search(r"\w", word)]
+
+
+def fts_query(query: str, trigram: bool = False) -> str | None:
+    """
+    把用户输入转换为 FTS5 查询：每个词作为一个短语，多个词之间为 AND
+    trigram 索引按子串匹配；unicode61 索引按词前缀匹配
+    没有可索引的词，或 trigram 索引下有词短于三个字符时返回 None（改用 LIKE）
+    """
+    terms = search_terms(query)
+    if not terms or (trigram and min(len(word) for word in terms) < TRIGRAM_MIN_CHARS):
+        return None
+    suffix = "" if trigram else "*"
+    return " ".join('"' + word.replace('"', '""') + '"' + suffix for word in terms)
+
+
+def _search_index_is_trigram(cursor) -> bool:
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+    return row is not None and "trigram" in row[0]
+
+
 def search_tasks(query: str = "", status: str = "", limit: int = 20, offset: int = 0) -> tuple[list[Task], int]:
-    """搜索任务，返回 (任务列表, 总数)"""
+    """
+    搜索任务，返回 (任务列表, 总数)
+    有关键词时走 tasks_fts 全文索引（trigram 分词，中文等任意位置子串均可命中），按 bm25 排序（名称命中权重高于命令）；
+    关键词过短、无可索引字符或 FTS5 不可用时回退到 LIKE（每个关键词在名称或命令中出现，多个词为 AND）
+    """
     with get_connection() as conn:
         cursor = conn.cursor()
-        
+
+        match = fts_query(query, _search_index_is_trigram(cursor)) if query else None
+        if match:
+            try:
+                return _search_tasks_fts(cursor, match, status, limit, offset)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"全文搜索失败，回退到 LIKE: {e}")
+
         # 构建查询条件
         conditions = []
         params = []
         
-        if query:
+        for word in search_terms(query) or ([query] if query else []):
             conditions.append("(name LIKE ? OR command LIKE ?)")
-            params.extend([f"%{query}%", f"%{query}%"])
+            params.extend([f"%{word}%", f"%{word}%"])
         
         if status:
             conditions.append("status = ?")
@@ -154,6 +398,36 @@ def search_tasks(query: str = "", status: str = "", limit: int = 20, offset: int
         return [Task(**dict(row)) for row in rows], total
 
 
+def _search_tasks_fts(cursor, match: str, status: str, limit: int, offset: int) -> tuple[list[Task], int]:
+    params = [match]
+    status_clause = ""
+    if status:
+        status_clause = "AND t.status = ?"
+        params.append(status)
+
+    cursor.execute(
+        f"""
+        SELECT COUNT(*) AS cnt
+        FROM tasks_fts f JOIN tasks t ON t.id = f.rowid
+        WHERE tasks_fts MATCH ? {status_clause}
+        """,
+        params
+    )
+    total = cursor.fetchone()["cnt"]
+
+    cursor.execute(
+        f"""
+        SELECT t.*
+        FROM tasks_fts f JOIN tasks t ON t.id = f.rowid
+        WHERE tasks_fts MATCH ? {status_clause}
+        ORDER BY bm25(tasks_fts, 10.0, 1.0), t.id DESC
+        LIMIT ? OFFSET ?
+        """,
+        params + [limit, offset]
+    )
+    return [Task(**dict(row)) for row in cursor.fetchall()], total
+
+
 def get_task_by_id(task_id: int) -> Task | None:
     """根据 ID 获取任务"""
     with get_connection() as conn:
@@ -166,6 +440,21 @@ def get_task_by_id(task_id: int) -> Task | None:
         return None
 
 
+def get_tasks_by_ids(task_ids: list[int]) -> list[Task]:
+    """根据 ID 列表批量获取任务（不存在的 ID 直接忽略）"""
+    if not task_ids:
+        return []
+    tasks = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # 分批查询，避免超过 SQLite 单条语句的参数个数上限
+        for start in range(0, len(task_ids), 500):
+            chunk = tuple(task_ids[start:start + 500])
+            cursor.execute(f"SELECT * FROM tasks WHERE id IN ({','.join(['?'] * len(chunk))})", chunk)
+            tasks.extend(Task(**dict(row)) for row in cursor.fetchall())
+    return tasks
+
+
 def update_task(task_id: int, name: str = None, cron: str = None, command: str = None) -> bool:
     """更新任务信息"""
     with get_connection() as conn:
@@ -193,8 +482,41 @@ def update_task(task_id: int, name: str = None, cron: str = None, command: str =
         update_str = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
         cursor.execute(update_str, params)
         conn.commit()
-        
-        return cursor.rowcount > 0 
+        updated = cursor.rowcount > 0
+
+    if updated:
+        notify_tasks_changed([task_id])
+    return updated
+
+
+# 允许通过 update_tasks_fields 批量写入的任务字段
+TASK_STATE_FIELDS = ("status", "last_run_at", "last_error", "force_run_at", "retry_count")
+
+
+def update_tasks_fields(updates: dict[int, dict]):
+    """
+    在一个事务中批量更新多个任务，每个任务只执行一条 UPDATE
+    updates: {task_id: {字段: 值}}，值为 None 表示写入 NULL
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for task_id, fields in updates.items():
+            unknown = set(fields) - set(TASK_STATE_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown task fields: {sorted(unknown)}")
+            if not fields:
+                continue
+            cursor.execute(
+                f"UPDATE tasks SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                (*fields.values(), task_id)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 
 def increment_retry_count(task_id: int) -> int:
@@ -275,16 +597,174 @@ def try_mark_running(task_id: int, start_time: str) -> bool:
     return success
 
         
-def create_execution(task_id: int, started_at: str | None, status: str) -> int:
+def claim_tasks(
+    task_ids: list[int],
+    started_at: str,
+    lease_owner: str | None = None,
+    lease_expires_at: str | None = None
+) -> dict[int, int]:
+    """
+    在一个事务中批量抢占任务并创建 QUEUED 执行记录
+    抢占用一条 UPDATE 完成（已在 RUNNING 的任务跳过）；ID 列表以一个 JSON 参数绑定，不受 SQLite 参数个数上限限制
+    返回 {task_id: execution_id}
+    """
+    if not task_ids:
+        return {}
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        claimed = cursor.execute(
+            """
+            UPDATE tasks
+            SET status = 'RUNNING',
+                last_run_at = ?
+            WHERE id IN (SELECT value FROM json_each(?))
+            AND status != 'RUNNING'
+            RETURNING id
+            """,
+            (started_at, json.dumps([int(task_id) for task_id in task_ids]))
+        ).fetchall()
+
+        claimed_ids = [row["id"] for row in claimed]
+        executions = {}
+        if claimed_ids:
+            rows = cursor.execute(
+                """
+                INSERT INTO executions (task_id, status, started_at, worker_id, lease_expires_at)
+                SELECT value, 'QUEUED', ?, ?, ? FROM json_each(?)
+                RETURNING id, task_id
+                """,
+                (started_at, lease_owner, lease_expires_at, json.dumps(claimed_ids))
+            ).fetchall()
+            executions = {row["task_id"]: row["id"] for row in rows}
+
+        conn.commit()
+        return executions
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def complete_execution(
+    execution_id: int,
+    task_id: int,
+    success: bool,
+    finished_at: str,
+    stdout: str | None = None,
+    stderr: str | None = None,
+    error: str | None = None
+) -> dict | None:
+    """
+    在一个事务中写回执行结果并更新任务状态：
+    成功 -> ACTIVE 并重置重试计数；失败且未达重试上限 -> PENDING 并计数 +1；否则 -> FAILED
+    返回任务的新 {status, retry_count, max_retries}；任务已删除或执行记录已结束（迟到的结果被忽略）时返回 None
+    """
+    # 在事务外压缩输出，不延长写锁持有时间
+    stdout, stderr = encode_output(stdout), encode_output(stderr)
+    return write_execution_batch([
+        ("complete", (execution_id, task_id, success, finished_at, stdout, stderr, error))
+    ])[0]
+
+
+def _mark_execution_running(cursor, execution_id: int, worker_id: str | None = None) -> bool:
+    cursor.execute(
+        "UPDATE executions SET status = 'RUNNING', worker_id = COALESCE(?, worker_id) WHERE id = ? AND status = 'QUEUED'",
+        (worker_id, execution_id)
+    )
+    return cursor.rowcount == 1
+
+
+def _complete_execution(cursor, execution_id, task_id, success, finished_at, stdout, stderr, error) -> dict | None:
+    """
+    写回执行结果并按重试策略更新任务状态（输出已由调用方压缩）
+    执行记录已结束（如租约过期已被回收）时不覆盖，也不改动任务（任务可能已有新的执行在运行），返回 None
+    """
+    cursor.execute(
+        """
+        UPDATE executions
+        SET status = ?,
+            finished_at = ?,
+            stdout = ?,
+            stderr = ?,
+            error = ?,
+            output_codec = ?
+        WHERE id = ?
+        AND status IN ('QUEUED', 'RUNNING')
+        """,
+        ("SUCCESS" if success else "FAILED", finished_at, stdout, stderr, error, CODEC, execution_id)
+    )
+    if cursor.rowcount != 1:
+        logger.warning(f"执行记录 {execution_id} 已结束或不存在，忽略迟到的执行结果")
+        return None
+
+    row = cursor.execute(
+        """
+        UPDATE tasks
+        SET status = CASE
+                WHEN :success THEN 'ACTIVE'
+                WHEN retry_count < max_retries THEN 'PENDING'
+                ELSE 'FAILED'
+            END,
+            retry_count = CASE
+                WHEN :success THEN 0
+                WHEN retry_count < max_retries THEN retry_count + 1
+                ELSE retry_count
+            END,
+            force_run_at = NULL
+        WHERE id = :task_id
+        RETURNING status, retry_count, max_retries
+        """,
+        {"success": success, "task_id": task_id}
+    ).fetchone()
+    return dict(row) if row else None
+
+
+# write_execution_batch 支持的写入操作
+EXECUTION_WRITE_OPS = {
+    "running": _mark_execution_running,
+    "complete": _complete_execution,
+}
+
+
+def write_execution_batch(ops: list[tuple[str, tuple]]) -> list:
+    """
+    在一个事务中按顺序执行一批执行记录写入（组提交），ops 为 [(操作名, 参数), ...]：
+    running -> (execution_id, worker_id)，返回是否从 QUEUED 变为 RUNNING；
+    complete -> complete_execution 的参数（输出已压缩），返回任务新状态
+    任一条失败则整批回滚并抛出异常
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        results = [EXECUTION_WRITE_OPS[op](cursor, *args) for op, args in ops]
+        conn.commit()
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def create_execution(
+    task_id: int,
+    started_at: str | None,
+    status: str,
+    lease_owner: str | None = None,
+    lease_expires_at: str | None = None
+) -> int:
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
         """
-        INSERT INTO executions (task_id, status, started_at)
-        VALUES (?, ?, ?)
+        INSERT INTO executions (task_id, status, started_at, worker_id, lease_expires_at)
+        VALUES (?, ?, ?, ?, ?)
         """,
-        (task_id, status, started_at)
+        (task_id, status, started_at, lease_owner, lease_expires_at)
     )
 
     execution_id = cursor.lastrowid
@@ -293,6 +773,138 @@ def create_execution(task_id: int, started_at: str | None, status: str) -> int:
     return execution_id
 
 
+def claim_execution(worker_id: str, lease_expires_at: str | None = None) -> tuple[dict, Task] | None:
+    """
+    worker 原子领取最早的一条 QUEUED 执行记录并标记为 RUNNING，同时取得租约
+    返回 (执行记录, 任务)；没有待执行记录时返回 None
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        row = cursor.execute(
+            """
+            UPDATE executions
+            SET status = 'RUNNING',
+                worker_id = ?,
+                lease_expires_at = ?
+            WHERE id = (
+                SELECT id FROM executions
+                WHERE status = 'QUEUED'
+                ORDER BY id
+                LIMIT 1
+            )
+            AND status = 'QUEUED'
+            RETURNING *
+            """,
+            (worker_id, lease_expires_at)
+        ).fetchone()
+
+        if row is None:
+            conn.commit()
+            return None
+
+        execution = dict(row)
+        task_row = cursor.execute(
+            "SELECT * FROM tasks WHERE id = ?",
+            (execution["task_id"],)
+        ).fetchone()
+
+        if task_row is None:
+            # 任务已被删除：直接结束这条执行记录
+            cursor.execute(
+                "UPDATE executions SET status = 'FAILED', finished_at = ?, error = ? WHERE id = ?",
+                (datetime.utcnow().isoformat(), "task deleted", execution["id"])
+            )
+            conn.commit()
+            return None
+
+        conn.commit()
+        return execution, Task(**dict(task_row))
+    finally:
+        conn.close()
+
+
+def renew_leases(owner: str, lease_expires_at: str) -> int:
+    """续期某个持有者的全部未结束执行（一条语句），返回续期条数"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE executions
+        SET lease_expires_at = ?
+        WHERE worker_id = ?
+        AND status IN ('QUEUED', 'RUNNING')
+        AND lease_expires_at IS NOT NULL
+        """,
+        (lease_expires_at, owner)
+    )
+    renewed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return renewed
+
+
+def expire_leases(now: str, orphan_before: str, unleased_before: str | None = None) -> list[int]:
+    """
+    回收租约已过期的执行：执行记录与对应的 RUNNING 任务标记为 FAILED
+    指定 unleased_before 时，没有租约且开始时间早于它的未结束执行同样回收
+    同时回收没有任何未结束执行、且 last_run_at 早于 orphan_before 的 RUNNING 任务
+    返回被恢复的任务 ID 列表
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        expired = cursor.execute(
+            """
+            UPDATE executions
+            SET status = 'FAILED',
+                finished_at = :now,
+                error = CASE
+                    WHEN lease_expires_at IS NULL THEN 'no lease, not finished in time'
+                    ELSE 'lease expired (owner: ' || COALESCE(worker_id, '?') || ')'
+                END
+            WHERE status IN ('QUEUED', 'RUNNING')
+            AND (
+                lease_expires_at < :now
+                OR (lease_expires_at IS NULL AND :unleased_before IS NOT NULL
+                    AND COALESCE(started_at, '') < :unleased_before)
+            )
+            RETURNING task_id
+            """,
+            {"now": now, "unleased_before": unleased_before}
+        ).fetchall()
+        task_ids = {row["task_id"] for row in expired}
+
+        orphans = cursor.execute(
+            """
+            SELECT id FROM tasks
+            WHERE status = 'RUNNING'
+            AND (last_run_at IS NULL OR last_run_at < ?)
+            AND NOT EXISTS (
+                SELECT 1 FROM executions e
+                WHERE e.task_id = tasks.id
+                AND e.status IN ('QUEUED', 'RUNNING')
+            )
+            """,
+            (orphan_before,)
+        ).fetchall()
+        task_ids.update(row["id"] for row in orphans)
+
+        recovered = []
+        for task_id in task_ids:
+            cursor.execute(
+                "UPDATE tasks SET status = 'FAILED' WHERE id = ? AND status = 'RUNNING'",
+                (task_id,)
+            )
+            if cursor.rowcount:
+                recovered.append(task_id)
+
+        conn.commit()
+        return recovered
+    finally:
+        conn.close()
+
+
 def finish_execution(
     execution_id: int,
     status: str,
@@ -301,6 +913,7 @@ def finish_execution(
     stderr: str | None = None,
     error: str | None = None
 ):
+    stdout, stderr = encode_output(stdout), encode_output(stderr)
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -311,10 +924,11 @@ def finish_execution(
             finished_at = ?,
             stdout = ?,
             stderr = ?,
-            error = ?
+            error = ?,
+            output_codec = ?
         WHERE id = ?
         """,
-        (status, finished_at, stdout, stderr, error, execution_id)
+        (status, finished_at, stdout, stderr, error, CODEC, execution_id)
     )
 
     conn.commit()
@@ -345,7 +959,21 @@ def get_execution(execution_id: int):
     if row is None:
         return None
 
-    return dict(row)
+    return decode_execution(dict(row))
+
+
+# 执行记录中除输出外会变化的列；输出只在结束时写入一次
+EXECUTION_STATE_FIELDS = ("status", "started_at", "finished_at", "worker_id", "lease_expires_at")
+
+
+def get_execution_state(execution_id: int) -> dict | None:
+    """只读取执行记录会变化的列（不读输出），用于生成 ETag；不存在返回 None"""
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(EXECUTION_STATE_FIELDS)} FROM executions WHERE id = ?",
+            (execution_id,)
+        ).fetchone()
+    return dict(row) if row else None
 
 
 # 用户相关数据库操作
@@ -367,7 +995,8 @@ def create_user_db(username: str, password: str, email: str = None, full_name: s
             )
             
             conn.commit()
-            return True, "创建成功"
+        notify_users_changed([username])
+        return True, "创建成功"
     except Exception as e:
         return False, f"数据库错误: {str(e)}"
 
@@ -403,6 +1032,11 @@ def authenticate_user_db(username: str, password: str):
 
 
 
+def count_executions(task_id: int) -> int:
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM executions WHERE task_id = ?", (task_id,)).fetchone()[0]
+
+
 def list_executions_by_task(task_id: int):
     conn = get_connection()
     cursor = conn.cursor()
@@ -419,4 +1053,112 @@ def list_executions_by_task(task_id: int):
     ).fetchall()
 
     conn.close()
-    return [dict(row) for row in rows]
\ No newline at end of file
+    return [decode_execution(dict(row)) for row in rows]
+
+# 执行记录保留策略
+RETENTION_FIELDS = ("keep_last", "max_age_days", "max_bytes")
+
+
+def get_retention_policy(task_id: int) -> dict | None:
+    """任务单独设置的保留策略（未设置返回 None）"""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT keep_last, max_age_days, max_bytes FROM retention_policies WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def list_retention_policies() -> dict[int, dict]:
+    """所有任务单独设置的保留策略 {task_id: 策略}"""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT * FROM retention_policies").fetchall()
+    return {row["task_id"]: {f: row[f] for f in RETENTION_FIELDS} for row in rows}
+
+
+def set_retention_policy(task_id: int, keep_last: int = None, max_age_days: float = None, max_bytes: int = None):
+    """设置任务的保留策略；三个字段都为 None 时删除该任务的单独策略"""
+    with get_connection() as conn:
+        if keep_last is None and max_age_days is None and max_bytes is None:
+            conn.execute("DELETE FROM retention_policies WHERE task_id = ?", (task_id,))
+            return
+        conn.execute(
+            """
+            INSERT INTO retention_policies (task_id, keep_last, max_age_days, max_bytes)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(task_id) DO UPDATE SET
+                keep_last = excluded.keep_last,
+                max_age_days = excluded.max_age_days,
+                max_bytes = excluded.max_bytes
+            """,
+            (task_id, keep_last, max_age_days, max_bytes)
+        )
+
+
+def compress_execution_outputs(after_id: int = 0, limit: int = 200) -> tuple[int | None, int]:
+    """
+    后台压缩旧版本写入的执行输出（output_codec 为 NULL 的已结束记录），每次处理 id > after_id 的一批
+    返回 (本批最后一个 id，没有更多时为 None, 处理条数)
+    """
+    if CODEC is None:
+        return None, 0
+    with get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, stdout, stderr FROM executions
+            WHERE id > ? AND output_codec IS NULL AND status IN ('SUCCESS', 'FAILED')
+            ORDER BY id
+            LIMIT ?
+            """,
+            (after_id, limit)
+        ).fetchall()
+        if not rows:
+            return None, 0
+        # 先在事务外压缩，再一次性写回
+        params = [
+            (encode_output(row["stdout"]), encode_output(row["stderr"]), CODEC, row["id"])
+            for row in rows
+        ]
+        conn.executemany(
+            "UPDATE executions SET stdout = ?, stderr = ?, output_codec = ? WHERE id = ? AND output_codec IS NULL",
+            params
+        )
+    return rows[-1]["id"], len(rows)
+
+
+# 批量任务操作（API 批量路由使用）
+def delete_tasks(task_ids: list) -> tuple[dict[int, str], int, int]:
+    """删除任务及其执行记录，返回 (找到的 {id: name}, 删除任务数, 删除执行记录数)"""
+    ids = [int(i) for i in task_ids]
+    placeholders = ",".join(["?"] * len(ids))
+    with get_connection() as conn:
+        found = {
+            row["id"]: row["name"]
+            for row in conn.execute(f"SELECT id, name FROM tasks WHERE id IN ({placeholders})", ids)
+        }
+        deleted_exec_count = conn.execute(f"DELETE FROM executions WHERE task_id IN ({placeholders})", ids).rowcount
+        deleted_task_count = conn.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", ids).rowcount
+    notify_tasks_changed(found.keys())
+    return found, deleted_task_count, deleted_exec_count
+
+
+def pause_tasks(task_ids: list) -> int:
+    """把任务设置为 PAUSED，返回更新数"""
+    ids = [int(i) for i in task_ids]
+    with get_connection() as conn:
+        updated = conn.execute(
+            f"UPDATE tasks SET status = 'PAUSED' WHERE id IN ({','.join(['?'] * len(ids))})", ids
+        ).rowcount
+    notify_tasks_changed(ids)
+    return updated
+
+
+def force_run_tasks(task_ids: list, run_at: str) -> int:
+    """设置任务的 force_run_at，返回更新数"""
+    ids = [int(i) for i in task_ids]
+    with get_connection() as conn:
+        updated = conn.execute(
+            f"UPDATE tasks SET force_run_at = ? WHERE id IN ({','.join(['?'] * len(ids))})", [run_at] + ids
+        ).rowcount
+    notify_tasks_changed(ids)
+    return updated
@@ -0,0 +1,116 @@
+import json
+from config import REDIS_URL, REDIS_KEY_PREFIX, REDIS_VISIBILITY_TIMEOUT
+
+# Redis 分发队列（DISPATCH_BACKEND=redis）：
+# 调度器把到期执行推入 jobs 流，多台机器上的 worker 通过消费组领取；
+# worker 把开始/完成事件推入 results 流，由调度器所在节点写回 SQLite，
+# 因此跨主机的热路径上不访问 SQLite。
+# 消费组提供 ack 与可见性超时：领取后超过 visibility_timeout 未 ack 也未续期的消息会被其他消费者重新领取。
+
+
+class RedisStream:
+    """基于 Redis Stream + 消费组的可靠队列"""
+
+    def __init__(self, client, key: str, group: str, visibility_timeout: float = REDIS_VISIBILITY_TIMEOUT):
+        self.client = client
+        self.key = key
+        self.group = group
+        self.visibility_timeout_ms = int(visibility_timeout * 1000)
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def push(self, payload: dict) -> str:
+        """追加一条消息，返回消息 ID"""
+        self._ensure_group()
+        return self.client.xadd(self.key, {"payload": json.dumps(payload)})
+
+    def claim(self, consumer: str, block_ms: int = 1000) -> tuple[str, dict] | None:
+        """
+        领取一条消息：优先接管可见性超时的消息，否则阻塞等待新消息
+        返回 (消息 ID, 内容)；超时无消息返回 None
+        """
+        self._ensure_group()
+
+        reclaimed = self.client.xautoclaim(
+            self.key, self.group, consumer,
+            min_idle_time=self.visibility_timeout_ms, start_id="0-0", count=1
+        )
+        for message_id, fields in (reclaimed[1] if reclaimed else []):
+            if fields:
+                return message_id, json.loads(fields["payload"])
+
+        resp = self.client.xreadgroup(self.group, consumer, {self.key: ">"}, count=1, block=block_ms)
+        for _, messages in resp or []:
+            for message_id, fields in messages:
+                return message_id, json.loads(fields["payload"])
+        return None
+
+    def renew(self, message_id: str, consumer: str):
+        """续期：重置消息的空闲时间，防止执行中的长任务被其他消费者接管"""
+        self.client.xclaim(self.key, self.group, consumer, 0, [message_id], justid=True)
+
+    def ack(self, message_id: str):
+        """确认处理完成并删除消息"""
+        self.client.xack(self.key, self.group, message_id)
+        self.client.xdel(self.key, message_id)
+
+    def pending_count(self) -> int:
+        """已领取但尚未确认的消息数"""
+        self._ensure_group()
+        info = self.client.xpending(self.key, self.group)
+        return int(info["pending"]) if info else 0
+
+
+class RedisDispatchQueue:
+    """调度器与远程 worker 之间的分发队列：jobs 流（待执行）+ results 流（执行事件）"""
+
+    def __init__(self, client, prefix: str = REDIS_KEY_PREFIX, visibility_timeout: float = REDIS_VISIBILITY_TIMEOUT):
+        self.jobs = RedisStream(client, f"{prefix}:jobs", "workers", visibility_timeout)
+        self.results = RedisStream(client, f"{prefix}:results", "scheduler", visibility_timeout)
+
+    def push_job(self, execution_id: int, task_id: int, name: str, command: str) -> str:
+        return self.jobs.push({
+            "execution_id": execution_id,
+            "task_id": task_id,
+            "name": name,
+            "command": command,
+        })
+
+    def push_started(self, execution_id: int, worker_id: str):
+        self.results.push({"type": "started", "execution_id": execution_id, "worker_id": worker_id})
+
+    def push_finished(self, execution_id: int, task_id: int, name: str, worker_id: str, result: dict):
+        self.results.push({
+            "type": "finished",
+            "execution_id": execution_id,
+            "task_id": task_id,
+            "name": name,
+            "worker_id": worker_id,
+            "result": result,
+        })
+
+
+def connect_redis(url: str = REDIS_URL):
+    """按配置创建 Redis 客户端（仅 redis 模式需要安装并导入 redis 包）"""
+    import redis
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+_dispatch_queue = None
+
+
+def get_dispatch_queue() -> RedisDispatchQueue:
+    """进程内共享的分发队列"""
+    global _dispatch_queue
+    if _dispatch_queue is None:
+        _dispatch_queue = RedisDispatchQueue(connect_redis())
+    return _dispatch_queue
@@ -0,0 +1,103 @@
+import threading
+from collections import deque
+from config import logger, LIVE_LOG_BACKLOG
+
+# 进程内事件通知：数据变更后同步回调订阅者（调度器索引等）
+
+TASKS_CHANGED = "tasks_changed"
+USERS_CHANGED = "users_changed"
+
+# 正在本进程执行的执行记录最近的事件（输出行、状态），供中途加入的订阅者补齐上下文
+_execution_backlogs: dict[int, deque] = {}
+
+_subscribers: dict[str, list] = {}
+_lock = threading.Lock()
+
+
+def subscribe(topic: str, callback):
+    """订阅事件，回调在发布者线程中同步执行"""
+    with _lock:
+        callbacks = _subscribers.setdefault(topic, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+
+def unsubscribe(topic: str, callback):
+    """取消订阅"""
+    with _lock:
+        callbacks = _subscribers.get(topic, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+def publish(topic: str, *args):
+    """发布事件；单个订阅者异常不影响其他订阅者"""
+    with _lock:
+        callbacks = list(_subscribers.get(topic, []))
+
+    for callback in callbacks:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"事件回调异常: topic={topic}, error={e}", exc_info=True)
+
+
+def notify_tasks_changed(task_ids):
+    """通知任务被创建/修改/删除（传入任务 ID 列表）"""
+    ids = [int(x) for x in task_ids]
+    if ids:
+        publish(TASKS_CHANGED, ids)
+
+
+def notify_users_changed(usernames):
+    """通知用户被创建/修改/删除（传入用户名列表）"""
+    names = [str(x) for x in usernames]
+    if names:
+        publish(USERS_CHANGED, names)
+
+
+def execution_topic(execution_id: int) -> str:
+    """单个执行记录的实时事件主题"""
+    return f"execution:{execution_id}"
+
+
+def publish_execution_event(execution_id: int, event: dict):
+    """
+    发布执行记录的实时事件：{"type": "status"|"output"|"end", ...}
+    事件同时进入该执行的有界积压队列；end 事件表示执行结束并释放积压
+    """
+    topic = execution_topic(execution_id)
+    with _lock:
+        if event["type"] == "end":
+            _execution_backlogs.pop(execution_id, None)
+        else:
+            backlog = _execution_backlogs.get(execution_id)
+            if backlog is None:
+                backlog = _execution_backlogs[execution_id] = deque(maxlen=LIVE_LOG_BACKLOG)
+            backlog.append(event)
+        # 在同一把锁内取订阅者：订阅时拿到的积压与之后收到的事件不重不漏
+        callbacks = list(_subscribers.get(topic, []))
+
+    for callback in callbacks:
+        try:
+            callback(event)
+        except Exception as e:
+            logger.error(f"事件回调异常: topic={topic}, error={e}", exc_info=True)
+
+
+def subscribe_execution(execution_id: int, callback) -> list[dict]:
+    """订阅执行记录的实时事件，返回订阅前已积压的事件"""
+    with _lock:
+        _subscribers.setdefault(execution_topic(execution_id), []).append(callback)
+        return list(_execution_backlogs.get(execution_id, ()))
+
+
+def unsubscribe_execution(execution_id: int, callback):
+    """取消订阅；最后一个订阅者离开时删除主题"""
+    topic = execution_topic(execution_id)
+    with _lock:
+        callbacks = _subscribers.get(topic, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            _subscribers.pop(topic, None)
@@ -0,0 +1,51 @@
+import os
+import socket
+import threading
+from config import logger, SCHEDULER_ID
+
+
+def process_owner_id() -> str:
+    """当前进程的租约持有者 ID（主机名-进程号）"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def scheduler_owner_id() -> str:
+    """调度器的固定租约持有者 ID：与进程号无关，重启后不变"""
+    return SCHEDULER_ID or f"scheduler@{socket.gethostname()}"
+
+
+class Heartbeat:
+    """
+    后台心跳：每隔 interval 秒调用一次 beat()，可用 with 块包住一次执行，也可随进程常驻
+    用于续期队列消息/执行租约
+    """
+
+    def __init__(self, interval: float, beat):
+        self.interval = interval
+        self.beat = beat
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                logger.error(f"心跳续期失败: {e}", exc_info=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
@@ -0,0 +1,294 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# 版本化表结构迁移：已应用的版本号记录在 PRAGMA user_version 中，
+# 启动时只比较一次版本号，表结构已是最新时不执行任何 DDL。
+# 新的表结构变更只需在 MIGRATIONS 末尾追加一项，已发布的迁移不要修改。
+
+
+def add_column(cursor: sqlite3.Cursor, table: str, column: str, decl: str):
+    """字段不存在时才添加（兼容 user_version 为 0、但已由旧版 init_db 补齐过字段的数据库）"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _create_base_tables(cursor: sqlite3.Cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        cron TEXT NOT NULL,
+        command TEXT NOT NULL,
+        status TEXT NOT NULL,
+        last_run_at TEXT,
+        created_at TEXT NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS executions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        stdout TEXT,
+        stderr TEXT,
+        error TEXT,
+        FOREIGN KEY(task_id) REFERENCES tasks(id)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        email TEXT,
+        full_name TEXT,
+        disabled BOOLEAN DEFAULT FALSE,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+
+def _add_task_state_columns(cursor: sqlite3.Cursor):
+    add_column(cursor, "tasks", "force_run_at", "TEXT")
+    add_column(cursor, "tasks", "retry_count", "INTEGER DEFAULT 0")
+    add_column(cursor, "tasks", "max_retries", "INTEGER DEFAULT 3")
+    # 调度器记录失败原因（如无效 cron）
+    add_column(cursor, "tasks", "last_error", "TEXT")
+
+
+def _add_execution_lease_columns(cursor: sqlite3.Cursor):
+    # 领取该执行记录的 worker 与执行租约（持有者定期续期，过期才视为已失联）
+    add_column(cursor, "executions", "worker_id", "TEXT")
+    add_column(cursor, "executions", "lease_expires_at", "TEXT")
+
+
+def _create_hot_path_indexes(cursor: sqlite3.Cursor):
+    # 任务详情的执行历史：WHERE task_id = ? ORDER BY id DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_executions_task_id ON executions(task_id, id)")
+    # worker 领取最早的 QUEUED、租约回收与清理按状态/时间筛选
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_executions_status_started ON executions(status, started_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+    # 只有少数任务处于强制执行中，部分索引只收录这些行
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_force_run_at ON tasks(force_run_at) WHERE force_run_at IS NOT NULL"
+    )
+
+
+def _create_task_search_index(cursor: sqlite3.Cursor, tokenize: str = "unicode61 remove_diacritics 2") -> bool:
+    # 外部内容 FTS5 索引：只保存倒排索引，正文仍在 tasks 表；由触发器同步
+    # SQLite 未编译 FTS5（或不支持该分词器）时跳过并返回 False，search_tasks 自动回退到 LIKE
+    try:
+        cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            name, command,
+            content='tasks', content_rowid='id',
+            tokenize='{tokenize}'
+        )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 不可用（tokenize={tokenize}），任务搜索将使用 LIKE: {e}")
+        return False
+
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, name, command) VALUES (new.id, new.name, new.command);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, name, command) VALUES ('delete', old.id, old.name, old.command);
+    END
+    """)
+    # 只在 name/command 变化时更新索引，频繁的状态写入不触发
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF name, command ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, name, command) VALUES ('delete', old.id, old.name, old.command);
+        INSERT INTO tasks_fts(rowid, name, command) VALUES (new.id, new.name, new.command);
+    END
+    """)
+    cursor.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+    return True
+
+
+def _use_trigram_search_index(cursor: sqlite3.Cursor):
+    # unicode61 把连续的中文整体当作一个词，"备份" 搜不到 "每日备份"；
+    # trigram 分词器（SQLite 3.34+）按三字符切分，支持任意位置的子串匹配（不足三个字符的关键词由 LIKE 处理）
+    for trigger in ("tasks_fts_ai", "tasks_fts_ad", "tasks_fts_au"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP TABLE IF EXISTS tasks_fts")
+    if not _create_task_search_index(cursor, "trigram"):
+        _create_task_search_index(cursor)
+
+
+def _create_task_counters(cursor: sqlite3.Cursor):
+    # 按状态维护的任务计数，列表页总数直接读取，不再 COUNT(*) 全表
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS task_counts (
+        status TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_counts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_counts(status, count) VALUES (new.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_counts_ad AFTER DELETE ON tasks BEGIN
+        UPDATE task_counts SET count = count - 1 WHERE status = old.status;
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_counts_au AFTER UPDATE OF status ON tasks
+    WHEN old.status IS NOT new.status BEGIN
+        UPDATE task_counts SET count = count - 1 WHERE status = old.status;
+        INSERT INTO task_counts(status, count) VALUES (new.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    END
+    """)
+    cursor.execute("DELETE FROM task_counts")
+    cursor.execute("INSERT INTO task_counts(status, count) SELECT status, COUNT(*) FROM tasks GROUP BY status")
+
+
+def _create_retention_policies(cursor: sqlite3.Cursor):
+    # 单个任务的执行记录保留策略，字段为 NULL 表示沿用全局配置
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS retention_policies (
+        task_id INTEGER PRIMARY KEY,
+        keep_last INTEGER,
+        max_age_days REAL,
+        max_bytes INTEGER,
+        FOREIGN KEY(task_id) REFERENCES tasks(id)
+    )
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS retention_policies_ad AFTER DELETE ON tasks BEGIN
+        DELETE FROM retention_policies WHERE task_id = old.id;
+    END
+    """)
+
+
+def _add_output_codec_column(cursor: sqlite3.Cursor):
+    # stdout/stderr 压缩存储的编码；NULL 表示旧数据，由后台逐步压缩
+    add_column(cursor, "executions", "output_codec", "TEXT")
+
+
+def _create_task_change_log(cursor: sqlite3.Cursor):
+    # 任务变更日志：每次插入/更新/删除任务追加一行，seq 单调递增（AUTOINCREMENT 不复用已删除的序号），
+    # 任务缓存据此判断数据版本并只重新加载变化的任务，其他进程（worker）的写入同样可见
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS task_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_changes_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_changes(task_id) VALUES (new.id);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_changes_au AFTER UPDATE ON tasks BEGIN
+        INSERT INTO task_changes(task_id) VALUES (new.id);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS task_changes_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_changes(task_id) VALUES (old.id);
+    END
+    """)
+
+
+
+def _output_bytes(row: str) -> str:
+    return (
+        f"COALESCE(length(CAST({row}.stdout AS BLOB)), 0) + COALESCE(length(CAST({row}.stderr AS BLOB)), 0)"
+        f" + COALESCE(length(CAST({row}.error AS BLOB)), 0)"
+    )
+
+
+def _create_execution_output_bytes(cursor: sqlite3.Cursor):
+    # 按任务维护的执行输出总字节数，保留策略直接读取，不再每轮对全部执行记录求和
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS execution_output_bytes (
+        task_id INTEGER PRIMARY KEY,
+        bytes INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS execution_output_bytes_ai AFTER INSERT ON executions BEGIN
+        INSERT INTO execution_output_bytes(task_id, bytes) VALUES (new.task_id, {_output_bytes("new")})
+        ON CONFLICT(task_id) DO UPDATE SET bytes = bytes + excluded.bytes;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS execution_output_bytes_ad AFTER DELETE ON executions BEGIN
+        UPDATE execution_output_bytes SET bytes = bytes - ({_output_bytes("old")}) WHERE task_id = old.task_id;
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS execution_output_bytes_au AFTER UPDATE OF stdout, stderr, error ON executions BEGIN
+        UPDATE execution_output_bytes
+        SET bytes = bytes + ({_output_bytes("new")}) - ({_output_bytes("old")})
+        WHERE task_id = new.task_id;
+    END
+    """)
+    cursor.execute("DELETE FROM execution_output_bytes")
+    cursor.execute(f"""
+    INSERT INTO execution_output_bytes(task_id, bytes)
+    SELECT task_id, SUM({_output_bytes("executions")}) FROM executions GROUP BY task_id
+    """)
+
+# (版本号, 说明, 迁移函数)，版本号从 1 开始连续递增
+MIGRATIONS = [
+    (1, "create tasks/executions/users", _create_base_tables),
+    (2, "add task retry/force-run/last_error columns", _add_task_state_columns),
+    (3, "add execution worker lease columns", _add_execution_lease_columns),
+    (4, "add hot-path indexes", _create_hot_path_indexes),
+    (5, "add tasks_fts full-text search index", _create_task_search_index),
+    (6, "add per-status task counters", _create_task_counters),
+    (7, "add per-task retention policies", _create_retention_policies),
+    (8, "add execution output codec column", _add_output_codec_column),
+    (9, "add task change log", _create_task_change_log),
+    (10, "rebuild tasks_fts with the trigram tokenizer", _use_trigram_search_index),
+    (11, "add per-task execution output byte totals", _create_execution_output_bytes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    把数据库升级到最新版本，返回升级后的版本号
+    所有待执行的迁移与版本号在同一个写事务中提交；多个进程同时启动时只有一个执行迁移
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)   # 拿到写锁后重新读取，其他进程可能已完成迁移
+        cursor = conn.cursor()
+        for target, description, apply in MIGRATIONS:
+            if target > version:
+                logger.info(f"应用数据库迁移 {target}: {description}")
+                apply(cursor)
+                version = target
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
@@ -0,0 +1,98 @@
+import threading
+import time
+from config import TASK_CACHE_TTL
+from common.models import Task
+from common import db
+from common.db import list_tasks, get_tasks_by_ids, get_tasks_version, list_task_changes
+from common.events import subscribe, TASKS_CHANGED
+
+
+class TaskCache:
+    """
+    进程内任务快照缓存，按数据版本增量刷新：
+    - 本进程的任务变更通知（TASKS_CHANGED）把缓存标记为待检查，下一次读取立即看到变更；
+    - 没有通知时每隔 ttl 秒检查一次数据版本（一次主键查询），以发现其他进程的写入；
+    - 版本未变直接返回缓存；版本变化时只重新加载变更日志中变化过的任务，日志已被清理则全量加载。
+    """
+
+    def __init__(self, ttl: float = TASK_CACHE_TTL):
+        self.ttl = ttl
+        self._tasks: dict[int, Task] = {}
+        self._list: list[Task] | None = None
+        self._version: int | None = None
+        self._path = None
+        self._checked_at = 0.0
+        self._dirty = True
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reloads = 0
+        self.incremental = 0
+
+    def invalidate(self, task_ids=None):
+        """标记缓存待检查（订阅 TASKS_CHANGED）"""
+        self._dirty = True
+
+    def _refresh(self):
+        if self._path != db.DB_PATH:
+            # 切换了数据库文件（测试中常见），旧快照作废
+            self._path = db.DB_PATH
+            self._tasks, self._list, self._version, self._dirty = {}, None, None, True
+        if not self._dirty and time.monotonic() - self._checked_at < self.ttl:
+            self.hits += 1
+            return
+        # 先清除标记再读取版本，读取期间到来的通知不会丢失
+        self._dirty = False
+        self._checked_at = time.monotonic()
+
+        version = get_tasks_version()
+        if version == self._version:
+            self.hits += 1
+            return
+
+        oldest, changed = (None, []) if self._version is None else list_task_changes(self._version)
+        if self._version is None or oldest is None or oldest > self._version + 1:
+            # 首次加载或所需的变更日志已被清理
+            self._tasks = {task.id: task for task in list_tasks()}
+            self.reloads += 1
+        else:
+            fresh = {task.id: task for task in get_tasks_by_ids(changed)}
+            for task_id in changed:
+                if task_id in fresh:
+                    self._tasks[task_id] = fresh[task_id]
+                else:
+                    self._tasks.pop(task_id, None)
+            self.incremental += 1
+        self._version = version
+        self._list = None
+
+    def version(self) -> int:
+        """当前缓存对应的数据版本"""
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def list_tasks(self) -> list[Task]:
+        """按 id 排序的全部任务（与 db.list_tasks 一致）；返回的列表与任务对象为共享快照，不要修改"""
+        with self._lock:
+            self._refresh()
+            if self._list is None:
+                self._list = [self._tasks[task_id] for task_id in sorted(self._tasks)]
+            return self._list
+
+    def get(self, task_id: int) -> Task | None:
+        with self._lock:
+            self._refresh()
+            return self._tasks.get(task_id)
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "size": len(self._tasks),
+            "hits": self.hits,
+            "incremental_refreshes": self.incremental,
+            "full_reloads": self.reloads,
+        }
+
+
+task_cache = TaskCache()
+subscribe(TASKS_CHANGED, task_cache.invalidate)
@@ -1,21 +1,48 @@
 from datetime import datetime
+from functools import lru_cache
 from typing import List
-from croniter import croniter
+from common.cron import compile_cron
+from config import CRON_PREVIEW_CACHE_SIZE
+
+
+def align_start(cron_expr: str, start_time: datetime) -> datetime:
+    """
+    把起始时间向下对齐到表达式的粒度（分钟；带秒字段的表达式为秒）
+    触发时间都落在粒度边界上，对齐前后“之后的下一次触发”相同，同一分钟内的预览可以共享缓存
+    """
+    if len(cron_expr.split()) > 5:
+        return start_time.replace(microsecond=0)
+    return start_time.replace(second=0, microsecond=0)
+
+
+@lru_cache(maxsize=CRON_PREVIEW_CACHE_SIZE)
+def _cached_run_times(cron_expr: str, start_time: datetime, count: int) -> tuple[datetime, ...]:
+    # compile_cron raises ValueError("Invalid cron expression: ...") for bad input
+    compiled = compile_cron(cron_expr)
+    return tuple(compiled.iter_next(start_time, count))
 
 
 def next_run_times(cron_expr: str, count: int = 5, start_time: datetime | None = None) -> List[str]:
-    """Return next `count` run times in ISO format (UTC) for a given cron expression."""
+    """
+    Return next `count` run times in ISO format for a given cron expression.
+    A naive start is UTC; an aware start is expanded on its own wall clock and the results keep its timezone.
+    """
     if start_time is None:
         start_time = datetime.utcnow()
+    tz = start_time.tzinfo
+    # 缓存按本地时间展开（与时区无关，可跨时区共享），返回前再带上调用方的时区
+    times = _cached_run_times(cron_expr, align_start(cron_expr, start_time.replace(tzinfo=None)), count)
+    return [(t.replace(tzinfo=tz) if tz is not None else t).isoformat() for t in times]
 
-    try:
-        it = croniter(cron_expr, start_time)
-    except Exception as e:
-        raise ValueError(f"Invalid cron expression: {e}")
-
-    times = []
-    for _ in range(count):
-        nxt = it.get_next(datetime)
-        times.append(nxt.isoformat())
 
-    return times
+def preview_cache_stats() -> dict:
+    """cron 预览结果缓存命中统计"""
+    info = _cached_run_times.cache_info()
+    total = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": round(info.hits / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,215 @@
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import Future
+from common.compression import encode_output
+from common.db import update_tasks_fields, write_execution_batch
+from common.events import notify_tasks_changed
+from config import logger, TASK_WRITE_FLUSH_INTERVAL, EXECUTION_COMMIT_DELAY, EXECUTION_COMMIT_BATCH
+
+
+class TaskStateWriter:
+    """
+    任务状态的合并写入器（write-behind）
+    同一任务的多次字段更新在内存中合并，后台线程每隔 flush_interval 秒
+    把所有待写任务放在一个事务里提交，每个任务一条 UPDATE，减少写放大与锁竞争
+    """
+
+    def __init__(self, flush_interval: float = TASK_WRITE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: dict[int, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._has_pending = threading.Event()
+        self._thread = None
+
+    def update(self, task_id: int, **fields):
+        """登记字段更新（后写入的值覆盖先写入的值），由后台线程异步提交"""
+        if not fields:
+            return
+        with self._lock:
+            self._pending.setdefault(task_id, {}).update(fields)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-writer", daemon=True)
+                self._thread.start()
+        self._has_pending.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """立即提交所有待写更新（需要读到最新状态的调用方使用）"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            try:
+                update_tasks_fields(pending)
+                written = list(pending)
+            except Exception as e:
+                # 整批失败时逐个任务重试，个别坏数据不会阻塞其他任务的写入
+                logger.error(f"批量写入任务状态失败，逐条重试: {e}")
+                written = []
+                for task_id, fields in pending.items():
+                    try:
+                        update_tasks_fields({task_id: fields})
+                        written.append(task_id)
+                    except Exception as e:
+                        logger.error(f"写入任务 {task_id} 状态失败，已丢弃: {fields}, 错误: {e}")
+
+            logger.debug(f"任务状态已写入: {len(written)} 个任务")
+            notify_tasks_changed(written)
+
+    def _run(self):
+        while True:
+            self._has_pending.wait()
+            self._has_pending.clear()
+            # 稍等片刻，让同一批突发更新合并进一个事务
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"任务状态写入线程异常: {e}", exc_info=True)
+
+
+task_writer = TaskStateWriter()
+
+
+class ExecutionWriter:
+    """
+    执行记录的组提交写入器
+    执行开始/完成的写入进入队列，单个后台线程最多等待 delay 秒（或攒满 max_batch 条）后
+    在一个事务中提交整批，并发完成的大量短任务共享一次提交，不再逐个争抢写锁
+    每次写入返回 Future，提交后完成；需要确认已落库的调用方等待它，或调用 fence()
+    """
+
+    def __init__(self, delay: float = EXECUTION_COMMIT_DELAY, max_batch: int = EXECUTION_COMMIT_BATCH):
+        self.delay = delay
+        self.max_batch = max_batch
+        self._queue: list[tuple[str, tuple, Future]] = []
+        # 已取出、正在提交的一批
+        self._inflight: list[tuple[str, tuple, Future]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.writes = 0
+
+    def _submit(self, op: str, args: tuple) -> Future:
+        future = Future()
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                # 首次使用或 fork 后的子进程：父进程的队列与线程不属于本进程
+                self._queue = []
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="execution-writer", daemon=True)
+                self._thread.start()
+            self._queue.append((op, args, future))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def mark_running(self, execution_id: int, worker_id: str | None = None) -> Future:
+        """登记执行开始：QUEUED -> RUNNING（Future 结果为是否更新成功）"""
+        return self._submit("running", (execution_id, worker_id))
+
+    def complete(
+        self,
+        execution_id: int,
+        task_id: int,
+        success: bool,
+        finished_at: str,
+        stdout: str | None = None,
+        stderr: str | None = None,
+        error: str | None = None
+    ) -> Future:
+        """登记执行结果（语义同 db.complete_execution，Future 结果为任务新状态）"""
+        # 在调用方线程压缩输出，不占用写入线程
+        stdout, stderr = encode_output(stdout), encode_output(stderr)
+        return self._submit("complete", (execution_id, task_id, success, finished_at, stdout, stderr, error))
+
+    def has_pending_complete(self, execution_id: int) -> bool:
+        """该执行是否有已登记（排队或正在提交）但尚未落库的结果"""
+        with self._cond:
+            return any(
+                op == "complete" and args[0] == execution_id
+                for op, args, _ in self._queue + self._inflight
+            )
+
+    def fence(self, timeout: float | None = None):
+        """等待此前登记的全部写入提交完成"""
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+        self._submit("fence", ()).result(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = len(self._queue)
+        return {
+            "pending": pending,
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # 稍等片刻，让并发到来的写入进入同一批
+                deadline = time.monotonic() + self.delay
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                self._inflight = batch
+            try:
+                self._commit(batch)
+            except Exception as e:
+                logger.error(f"执行记录写入线程异常: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._inflight = []
+
+    def _commit(self, batch: list[tuple[str, tuple, Future]]):
+        ops = [(op, args) for op, args, _ in batch if op != "fence"]
+        try:
+            results = write_execution_batch(ops) if ops else []
+        except Exception as e:
+            # 整批失败时逐条重试，个别坏数据不会拖累同批的其他写入
+            logger.error(f"执行记录组提交失败，逐条重试: {e}")
+            results = []
+            for op in ops:
+                try:
+                    results.append(write_execution_batch([op])[0])
+                except Exception as e:
+                    logger.error(f"写入执行记录失败: {op[0]} {op[1][0]}, 错误: {e}")
+                    results.append(e)
+
+        self.batches += 1
+        self.writes += len(ops)
+        results = iter(results)
+        outcomes = [None if op == "fence" else next(results) for op, _, _ in batch]
+        # 先通知任务状态变更（调度器索引据此刷新），再让等待者返回
+        notify_tasks_changed([
+            args[1] for (op, args, _), result in zip(batch, outcomes)
+            if op == "complete" and not isinstance(result, Exception)
+        ])
+        for (_, _, future), result in zip(batch, outcomes):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+execution_writer = ExecutionWriter()
+# 进程退出前提交队列中剩余的写入
+atexit.register(execution_writer.fence, 5)
@@ -1,3 +1,4 @@
+import os
 import logging
 import logging.handlers
 from pathlib import Path
@@ -40,3 +41,46 @@ def setup_logger(name: str) -> logging.Logger:
 
 # 主日志记录器
 logger = setup_logger("scheduler")
+
+# 调度相关配置（可通过环境变量覆盖）
+CRON_CACHE_SIZE = int(os.getenv("CRON_CACHE_SIZE", "1024"))  # 预编译 cron 表达式缓存条目上限
+MAX_CONCURRENT_EXECUTIONS = int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "8"))  # 同时执行的任务数上限，超出排队
+INDEX_RECONCILE_INTERVAL = float(os.getenv("INDEX_RECONCILE_INTERVAL", "300"))  # 调度索引与数据库全量核对的间隔（秒），兜底漏掉的变更通知
+DISPATCH_BACKEND = os.getenv("DISPATCH_BACKEND", "local")  # local: 本进程执行池; sqlite: 独立 worker 进程从数据库领取; redis: 多节点 worker 通过 Redis 领取
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "mini-scheduler")
+REDIS_VISIBILITY_TIMEOUT = float(os.getenv("REDIS_VISIBILITY_TIMEOUT", "30"))  # 已领取但未确认/续期的消息超过该秒数后可被重新领取
+SCHEDULER_ID = os.getenv("SCHEDULER_ID", "")  # 调度器的固定租约持有者 ID，重启后据此接管排队中/远程执行的租约；默认 scheduler@主机名
+EXECUTION_LEASE_TTL = float(os.getenv("EXECUTION_LEASE_TTL", "15"))  # 执行租约有效期（秒），持有者每 1/3 有效期续期一次
+UNLEASED_EXECUTION_TIMEOUT = float(os.getenv("UNLEASED_EXECUTION_TIMEOUT", "600"))  # 没有租约的未结束执行（旧版本遗留等）超过该秒数后回收
+TASK_WRITE_FLUSH_INTERVAL = float(os.getenv("TASK_WRITE_FLUSH_INTERVAL", "0.005"))  # 任务状态合并写入的批量提交间隔（秒）
+OUTPUT_HEAD_BYTES = int(os.getenv("OUTPUT_HEAD_BYTES", str(64 * 1024)))  # 每个输出流保留的开头字节数
+OUTPUT_TAIL_BYTES = int(os.getenv("OUTPUT_TAIL_BYTES", str(64 * 1024)))  # 每个输出流保留的结尾字节数
+OUTPUT_SPOOL_DIR = os.getenv("OUTPUT_SPOOL_DIR", "")  # 非空时把完整输出按执行记录写入该目录
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # 连接池保留的空闲连接数上限
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # 每个连接的页缓存大小（KB）
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # 内存映射读取的字节数上限，0 表示关闭
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "10000"))  # 等待写锁的超时（毫秒）
+RETENTION_KEEP_LAST = int(os.getenv("RETENTION_KEEP_LAST", "0"))  # 每个任务默认保留的最近执行记录数，0 表示不限制（默认不清理，按需开启）
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))  # 每个任务默认保留的天数，0 表示不限制
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))  # 全部执行记录输出的总字节上限，0 表示不限制
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "300"))  # 保留策略执行间隔（秒）
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))  # 每个删除事务最多删除的执行记录数
+RETENTION_COMPACT_INTERVAL = float(os.getenv("RETENTION_COMPACT_INTERVAL", "3600"))  # 增量 VACUUM 与 PRAGMA optimize 的间隔（秒）
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "2000"))  # 每次增量 VACUUM 最多回收的页数
+OUTPUT_CODEC = os.getenv("OUTPUT_CODEC", "zlib")  # 执行输出的压缩编码：zlib、zstd（需安装 zstandard）或 none
+OUTPUT_COMPRESS_MIN_BYTES = int(os.getenv("OUTPUT_COMPRESS_MIN_BYTES", "256"))  # 小于该字节数的输出不压缩
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))  # 异步路由使用的 DB 线程数
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "1.0"))  # 未收到本进程变更通知时，任务缓存检查数据版本的间隔（秒），覆盖其他进程的写入
+TASK_CHANGES_KEEP = int(os.getenv("TASK_CHANGES_KEEP", "100000"))  # 任务变更日志保留条数
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "5000"))  # 批量创建任务时每个事务插入的行数
+BULK_CREATE_MAX_TASKS = int(os.getenv("BULK_CREATE_MAX_TASKS", "100000"))  # 单次批量创建请求的任务数上限
+BULK_CREATE_MAX_BYTES = int(os.getenv("BULK_CREATE_MAX_BYTES", str(64 * 1024 * 1024)))  # 单次批量创建请求体的字节上限
+EXECUTION_COMMIT_DELAY = float(os.getenv("EXECUTION_COMMIT_DELAY", "0.005"))  # 执行记录组提交前等待合并的最长时间（秒）
+EXECUTION_COMMIT_BATCH = int(os.getenv("EXECUTION_COMMIT_BATCH", "500"))  # 每次组提交最多包含的写入条数
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))  # 已验证 token 缓存条目上限（条目在 token 过期时失效）
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1000"))  # 用户记录缓存条目上限（用户数远少于 token 数）
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))  # 用户记录缓存有效期（秒），同时不超过 token 的过期时间
+LIVE_LOG_BACKLOG = int(os.getenv("LIVE_LOG_BACKLOG", "500"))  # 每个运行中的执行保留的最近实时事件数（中途打开的实时日志先回放这些）
+LIVE_STREAM_POLL_INTERVAL = float(os.getenv("LIVE_STREAM_POLL_INTERVAL", "2"))  # 实时日志无事件时检查执行状态的间隔（秒），也是心跳间隔
+CRON_PREVIEW_CACHE_SIZE = int(os.getenv("CRON_PREVIEW_CACHE_SIZE", "4096"))  # cron 预览结果缓存条目上限（按表达式、对齐后的起始时间与次数）
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import logger
+
+
+class ExecutionPool:
+    """
+    有界执行池：最多 max_workers 个任务同时执行
+    超出上限的任务进入等待队列（不会被丢弃），执行记录保持 QUEUED 状态直到真正开始
+    """
+
+    def __init__(self, max_workers: int):
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task-exec")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._peak_pending = 0
+
+    def submit(self, fn, *args):
+        """提交一次执行；线程池已满时排队"""
+        with self._lock:
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+        return self._executor.submit(self._run, fn, args)
+
+    def _run(self, fn, args):
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.error(f"执行池任务异常: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """队列深度与利用率，用于容量评估"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "completed": self._completed,
+                "utilization": round(self._running / self.max_workers, 4),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
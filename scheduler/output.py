@@ -0,0 +1,148 @@
+import codecs
+import subprocess
+import threading
+from pathlib import Path
+from config import OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, OUTPUT_SPOOL_DIR
+
+# 每次从管道读取的块大小
+CHUNK_SIZE = 64 * 1024
+# 实时输出中没有换行的超长行按该长度（字符）切分
+MAX_LINE_CHARS = 8 * 1024
+
+
+class OutputCapture:
+    """
+    有界输出捕获：只在内存中保留开头 head_bytes 与结尾 tail_bytes，中间部分只计数
+    无论任务输出多少，单个流占用的内存都不超过 head_bytes + tail_bytes + CHUNK_SIZE
+    指定 spool_path 时完整输出按块写入该文件
+    """
+
+    def __init__(self, head_bytes: int = OUTPUT_HEAD_BYTES, tail_bytes: int = OUTPUT_TAIL_BYTES,
+                 spool_path: Path | None = None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spool = None
+        if spool_path is not None:
+            spool_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spool = open(spool_path, "wb")
+
+    def write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        if self._spool is not None:
+            self._spool.write(chunk)
+
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_bytes > 0:
+            self._tail += chunk
+            if len(self._tail) > self.tail_bytes:
+                del self._tail[:len(self._tail) - self.tail_bytes]
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    @property
+    def truncated_bytes(self) -> int:
+        return self.total_bytes - len(self._head) - len(self._tail)
+
+    def getvalue(self) -> str:
+        """返回保留的输出文本；中间被丢弃的部分用一行标记代替"""
+        head = self._head.decode("utf-8", errors="replace")
+        tail = self._tail.decode("utf-8", errors="replace")
+        if self.truncated_bytes > 0:
+            text = f"{head}\n... [已截断 {self.truncated_bytes} 字节] ...\n{tail}"
+        else:
+            text = head + tail
+        return text.replace("\r\n", "\n")
+
+
+class LineSplitter:
+    """把输出块增量解码并切分成行（块边界可以落在行中间或多字节字符中间），每个完整行回调一次"""
+
+    def __init__(self, on_line):
+        self.on_line = on_line
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+
+    def feed(self, chunk: bytes):
+        lines = (self._partial + self._decoder.decode(chunk)).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.on_line(line.removesuffix("\r"))
+        while len(self._partial) > MAX_LINE_CHARS:
+            self.on_line(self._partial[:MAX_LINE_CHARS])
+            self._partial = self._partial[MAX_LINE_CHARS:]
+
+    def close(self):
+        rest = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if rest:
+            self.on_line(rest.removesuffix("\r"))
+
+
+def _pump(stream, capture: OutputCapture, lines: LineSplitter | None = None):
+    try:
+        for chunk in iter(lambda: stream.read1(CHUNK_SIZE), b""):
+            capture.write(chunk)
+            if lines is not None:
+                lines.feed(chunk)
+    finally:
+        stream.close()
+        capture.close()
+        if lines is not None:
+            lines.close()
+
+
+def spool_paths(spool_name: str) -> list[Path]:
+    """执行输出完整落盘的文件路径（stdout, stderr）；未配置 OUTPUT_SPOOL_DIR 时为空"""
+    if not OUTPUT_SPOOL_DIR:
+        return []
+    return [Path(OUTPUT_SPOOL_DIR) / f"{spool_name}.{stream}" for stream in ("stdout", "stderr")]
+
+
+def remove_spool_files(spool_names) -> int:
+    """删除执行记录对应的落盘输出，返回删除的文件数"""
+    removed = 0
+    for spool_name in spool_names:
+        for path in spool_paths(spool_name):
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def run_streaming(command: str, spool_name: str | None = None, on_output=None) -> tuple[int, str, str]:
+    """
+    以 shell 方式执行命令，分块读取 stdout/stderr，返回 (returncode, stdout, stderr)
+    配置了 OUTPUT_SPOOL_DIR 且提供 spool_name 时，完整输出写入 <dir>/<spool_name>.stdout/.stderr
+    提供 on_output 时每产生一行输出回调 on_output(流名, 行)（在读取线程中调用，不含换行符）
+    """
+    stdout_path, stderr_path = (spool_paths(spool_name) if spool_name else []) or (None, None)
+    stdout = OutputCapture(spool_path=stdout_path)
+    stderr = OutputCapture(spool_path=stderr_path)
+
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    readers = [
+        threading.Thread(
+            target=_pump,
+            args=(pipe, capture, LineSplitter(lambda line, name=name: on_output(name, line)) if on_output else None),
+            daemon=True
+        )
+        for name, pipe, capture in (("stdout", proc.stdout, stdout), ("stderr", proc.stderr, stderr))
+    ]
+    for reader in readers:
+        reader.start()
+    returncode = proc.wait()
+    for reader in readers:
+        reader.join()
+
+    return returncode, stdout.getvalue(), stderr.getvalue()
@@ -0,0 +1,254 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from config import (
+    logger,
+    RETENTION_KEEP_LAST,
+    RETENTION_MAX_AGE_DAYS,
+    RETENTION_MAX_BYTES,
+    RETENTION_INTERVAL,
+    RETENTION_CHUNK_SIZE,
+    RETENTION_COMPACT_INTERVAL,
+    RETENTION_VACUUM_PAGES,
+    TASK_CHANGES_KEEP,
+)
+from common.db import get_connection, list_retention_policies, compress_execution_outputs, prune_task_changes
+from scheduler.output import remove_spool_files
+
+# 执行记录保留策略：
+#   keep_last    每个任务保留最近 N 条
+#   max_age_days 每个任务保留最近 N 天
+#   max_bytes    全局为全部执行记录输出的总字节上限；单个任务设置时为该任务的上限
+# 全局默认值来自 config.py，单个任务可在 retention_policies 表中覆盖。
+# 只删除已结束的执行记录；每个删除事务最多 RETENTION_CHUNK_SIZE 条，事务之间让出写锁，不长时间阻塞调度器。
+# 删除执行记录时一并删除其落盘输出（OUTPUT_SPOOL_DIR）。
+
+FINISHED_STATUSES = ("SUCCESS", "FAILED")
+# 两个删除事务之间的停顿（秒），让调度器/worker 的写入插队
+CHUNK_PAUSE = 0.005
+
+_FINISHED = "status IN ('SUCCESS', 'FAILED')"
+_OUTPUT_BYTES = (
+    "COALESCE(length(CAST(stdout AS BLOB)), 0) + COALESCE(length(CAST(stderr AS BLOB)), 0)"
+    " + COALESCE(length(CAST(error AS BLOB)), 0)"
+)
+
+
+def delete_executions(where: str, params: list, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """按条件分批删除已结束的执行记录及其落盘输出，每批一个短事务，返回删除总数"""
+    deleted = 0
+    while True:
+        with get_connection() as conn:
+            ids = [
+                row["id"] for row in conn.execute(
+                    f"SELECT id FROM executions WHERE {_FINISHED} AND {where} LIMIT ?",
+                    list(params) + [chunk_size]
+                )
+            ]
+            if ids:
+                conn.execute(f"DELETE FROM executions WHERE id IN ({','.join(['?'] * len(ids))})", ids)
+        remove_spool_files(str(execution_id) for execution_id in ids)
+        count = len(ids)
+        deleted += count
+        if count < chunk_size:
+            return deleted
+        time.sleep(CHUNK_PAUSE)
+
+
+def trim_task(task_id: int, keep_last: int, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """只保留任务最近 keep_last 条执行记录（keep_last 为 0 时删除全部已结束记录）"""
+    if keep_last > 0:
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT id FROM executions WHERE task_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (task_id, keep_last - 1)
+            ).fetchone()
+        if row is None:
+            return 0
+        return delete_executions("task_id = ? AND id < ?", [task_id, row["id"]], chunk_size)
+    return delete_executions("task_id = ?", [task_id], chunk_size)
+
+
+def trim_by_age(task_id: int | None, max_age_days: float, skip_task_ids=(), now: datetime | None = None) -> int:
+    """删除开始时间早于 max_age_days 天前的执行记录；task_id 为 None 时作用于除 skip_task_ids 外的所有任务"""
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=max_age_days)).isoformat()
+    if task_id is not None:
+        return delete_executions("task_id = ? AND started_at < ?", [task_id, cutoff])
+    skip = list(skip_task_ids)
+    where = "started_at < ?"
+    if skip:
+        where += f" AND task_id NOT IN ({','.join(['?'] * len(skip))})"
+    return delete_executions(where, [cutoff] + skip)
+
+
+def output_bytes(task_id: int | None = None) -> int:
+    """执行记录输出的总字节数（由触发器维护）；task_id 为 None 时为全部任务"""
+    with get_connection() as conn:
+        if task_id is None:
+            row = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM execution_output_bytes").fetchone()
+        else:
+            row = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM execution_output_bytes WHERE task_id = ?",
+                               (task_id,)).fetchone()
+    return row[0]
+
+
+def trim_by_bytes(task_id: int | None, max_bytes: int, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """
+    输出总字节数超出 max_bytes 时，从最早的已结束执行记录开始删除，直到腾出超出的部分；
+    task_id 为 None 时统计全部任务。未超出时只读一行计数，超出时只扫描将被删除的记录
+    """
+    excess = output_bytes(task_id) - max_bytes
+    if excess <= 0:
+        return 0
+
+    task_clause = "AND task_id = ?" if task_id is not None else ""
+    task_params = [task_id] if task_id is not None else []
+    freed, last_id = 0, 0
+    while freed < excess:
+        with get_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, {_OUTPUT_BYTES} AS size FROM executions
+                WHERE {_FINISHED} {task_clause} AND id > ?
+                ORDER BY id LIMIT ?
+                """,
+                task_params + [last_id, chunk_size]
+            ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            freed += row["size"]
+            last_id = row["id"]
+            if freed >= excess:
+                break
+
+    if not last_id:
+        return 0
+    if task_id is not None:
+        return delete_executions("task_id = ? AND id <= ?", [task_id, last_id], chunk_size)
+    return delete_executions("id <= ?", [last_id], chunk_size)
+
+
+def compact():
+    """回收删除后留下的空闲页（仅 auto_vacuum=INCREMENTAL 的数据库）并更新查询规划统计"""
+    with get_connection() as conn:
+        freed = 0
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript 会把 incremental_vacuum 一次执行完，execute 每次只回收一页
+            conn.executescript(f"PRAGMA incremental_vacuum({int(RETENTION_VACUUM_PAGES)});")
+            freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA optimize")
+    return freed
+
+
+class RetentionService:
+    """
+    后台保留策略：每隔 interval 秒按策略清理一次执行记录，并压缩旧版本写入的未压缩输出；
+    每隔 compact_interval 秒做一次空间回收
+    """
+
+    def __init__(self, interval: float = RETENTION_INTERVAL, compact_interval: float = RETENTION_COMPACT_INTERVAL,
+                 keep_last: int = RETENTION_KEEP_LAST, max_age_days: float = RETENTION_MAX_AGE_DAYS,
+                 max_bytes: int = RETENTION_MAX_BYTES):
+        self.interval = interval
+        self.compact_interval = compact_interval
+        self.keep_last = keep_last
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._next_compact = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_run = None
+        self._compress_after_id = 0   # 后台压缩旧执行输出的进度
+
+    def run_once(self) -> dict:
+        """按当前策略清理一轮，返回各策略删除的记录数"""
+        started = time.monotonic()
+        policies = list_retention_policies()
+        deleted = {"keep_last": 0, "max_age": 0, "max_bytes": 0}
+
+        with get_connection() as conn:
+            task_ids = [row["task_id"] for row in conn.execute("SELECT DISTINCT task_id FROM executions")]
+        for task_id in task_ids:
+            keep_last = policies.get(task_id, {}).get("keep_last")
+            keep_last = self.keep_last if keep_last is None else keep_last
+            if keep_last > 0:
+                deleted["keep_last"] += trim_task(task_id, keep_last)
+
+        overridden = []
+        for task_id, policy in policies.items():
+            if policy["max_age_days"] is not None:
+                overridden.append(task_id)
+                if policy["max_age_days"] > 0:
+                    deleted["max_age"] += trim_by_age(task_id, policy["max_age_days"])
+            if policy["max_bytes"]:
+                deleted["max_bytes"] += trim_by_bytes(task_id, policy["max_bytes"])
+        if self.max_age_days > 0:
+            deleted["max_age"] += trim_by_age(None, self.max_age_days, skip_task_ids=overridden)
+        if self.max_bytes > 0:
+            deleted["max_bytes"] += trim_by_bytes(None, self.max_bytes)
+
+        result = {
+            "deleted": deleted,
+            "compressed": self.compress_outputs(),
+            "pruned_task_changes": prune_task_changes(TASK_CHANGES_KEEP),
+            "freed_pages": 0,
+        }
+        if time.monotonic() >= self._next_compact:
+            result["freed_pages"] = compact()
+            self._next_compact = time.monotonic() + self.compact_interval
+
+        result["seconds"] = round(time.monotonic() - started, 3)
+        result["finished_at"] = datetime.utcnow().isoformat()
+        self._last_run = result
+        if any(deleted.values()) or result["compressed"]:
+            logger.info(
+                f"执行记录保留策略: 删除 {deleted}, 压缩 {result['compressed']} 条, "
+                f"回收 {result['freed_pages']} 页, 耗时 {result['seconds']}s"
+            )
+        return result
+
+    def compress_outputs(self, batch: int = RETENTION_CHUNK_SIZE) -> int:
+        """分批压缩旧版本写入的执行输出，全部完成后不再扫描；返回本轮压缩条数"""
+        if self._compress_after_id is None:
+            return 0
+        compressed = 0
+        while True:
+            last_id, count = compress_execution_outputs(self._compress_after_id, batch)
+            compressed += count
+            if last_id is None:
+                self._compress_after_id = None
+                return compressed
+            self._compress_after_id = last_id
+            time.sleep(CHUNK_PAUSE)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"执行记录保留策略失败: {e}", exc_info=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        return {
+            "keep_last": self.keep_last,
+            "max_age_days": self.max_age_days,
+            "max_bytes": self.max_bytes,
+            "interval": self.interval,
+            "last_run": self._last_run,
+        }
+
+
+retention_service = RetentionService()
@@ -1,183 +1,435 @@
-import time
-from croniter import croniter
 from datetime import datetime
 from common.db import (
-    list_tasks, get_connection, create_execution, finish_execution,
-    try_mark_running, increment_retry_count, reset_retry_count,
-    get_task_retry_info
+    list_tasks, get_tasks_by_ids, get_execution_state,
+    renew_leases, expire_leases, claim_tasks
 )
+from common.cron import get_next_time
+from common.dispatch import get_dispatch_queue
+from common.heartbeat import Heartbeat, process_owner_id, scheduler_owner_id
+from common.events import subscribe, notify_tasks_changed, publish_execution_event, TASKS_CHANGED
 from common.models import Task
+from common.writer import task_writer, execution_writer
+from scheduler.task_index import TaskIndex
+from scheduler.executor import ExecutionPool
+from scheduler.output import run_streaming
+from scheduler.retention import retention_service
 from datetime import timedelta
-import subprocess
+from concurrent.futures import Future
+import os
 import threading
-from config import logger
+import time
+from config import (
+    logger, MAX_CONCURRENT_EXECUTIONS, DISPATCH_BACKEND, EXECUTION_LEASE_TTL, UNLEASED_EXECUTION_TIMEOUT,
+    INDEX_RECONCILE_INTERVAL
+)
 
 #uvicorn api.main:app --reload
 
-RUNNING_TIMEOUT = timedelta(minutes=1)
+# 检查过期租约的间隔（秒）：持有者失联后最多 EXECUTION_LEASE_TTL + 该间隔即被发现
+LEASE_CHECK_INTERVAL = EXECUTION_LEASE_TTL / 3
 
 SCHEDULABLE_STATUSES = {"PENDING", "ACTIVE", "FAILED"}
 
+# 索引为空时的最长休眠时间（秒），仅作兜底
+MAX_IDLE_WAIT = 60
+
+# sqlite 模式下任务在独立 worker 进程中完成，不会通知本进程，RUNNING 任务按此间隔（秒）回查状态
+RUNNING_RECHECK_INTERVAL = 5
+
+# 下次触发时间索引：启动时重建，任务变更时通过事件增量更新
+task_index = TaskIndex()
+
+# 读库与写索引在同一把锁内完成：多个线程并发刷新同一任务时，后读到的状态一定后写入索引
+_index_lock = threading.Lock()
+
+# 增量刷新失败时置位，调度循环尽快做一次全量核对
+_reconcile_needed = threading.Event()
+
+# 有界执行池：限制同时运行的任务数，突发的到期任务排队执行
+execution_pool = ExecutionPool(MAX_CONCURRENT_EXECUTIONS)
+
+# 唤醒调度循环：任务创建/修改/暂停/强制执行后立即重新计算休眠时间
+_wakeup = threading.Event()
+
 # 获取任务的基准时间    
 def get_base_time(task: Task) -> datetime:
     if task.last_run_at:
         return datetime.fromisoformat(task.last_run_at)
     return datetime.fromisoformat(task.created_at)
 
+
+def get_fire_time(task: Task) -> datetime | None:
+    """
+    计算调度器下一次需要检查该任务的时间
+    返回 None 表示任务不需要进入索引（如 PAUSED，或执行完成时会收到通知的 RUNNING 任务）
+    """
+    if task.status == "RUNNING":
+        # 失联的执行由租约回收处理，这里只需在 sqlite 模式下回查完成状态
+        if DISPATCH_BACKEND == "sqlite":
+            return datetime.utcnow() + timedelta(seconds=RUNNING_RECHECK_INTERVAL)
+        return None
+
+    if task.status not in SCHEDULABLE_STATUSES:
+        return None
+
+    try:
+        fire_time = get_next_time(task.cron, get_base_time(task))
+    except Exception:
+        # cron 无效：立即交给调度循环标记为 FAILED；已经 FAILED 的不再反复处理
+        return None if task.status == "FAILED" else datetime.utcnow()
+
+    if task.force_run_at:
+        fire_time = min(fire_time, datetime.fromisoformat(task.force_run_at))
+    return fire_time
+
+
+def index_tasks(tasks: list[Task]):
+    """按任务当前状态更新索引"""
+    for task in tasks:
+        fire_time = get_fire_time(task)
+        if fire_time is None:
+            task_index.remove(task.id)
+        else:
+            task_index.push(task.id, fire_time)
+
+
+def refresh_tasks(task_ids: list[int]):
+    """从数据库重新读取任务并更新索引；已删除的任务从索引移除"""
+    with _index_lock:
+        tasks = get_tasks_by_ids(task_ids)
+        found = {task.id for task in tasks}
+        for task_id in task_ids:
+            if task_id not in found:
+                task_index.remove(task_id)
+        index_tasks(tasks)
+
+
+def wake_scheduler():
+    """提前唤醒调度循环"""
+    _wakeup.set()
+
+
+def on_tasks_changed(task_ids: list[int]):
+    """任务变更事件回调：更新索引并唤醒调度循环；刷新失败时改由全量核对兜底"""
+    try:
+        refresh_tasks(task_ids)
+    except Exception as e:
+        logger.error(f"刷新调度索引失败，等待全量核对: {task_ids}, error={e}", exc_info=True)
+        _reconcile_needed.set()
+    wake_scheduler()
+
+
+def lease_deadline() -> str:
+    """从现在起一个租约有效期后的时间"""
+    return (datetime.utcnow() + timedelta(seconds=EXECUTION_LEASE_TTL)).isoformat()
+
+
+def dispatch_owner_id() -> str:
+    """
+    新建执行的租约持有者：local 模式下执行随本进程结束，用进程 ID，重启后旧执行按租约过期回收；
+    sqlite/redis 模式下执行在其他进程中排队或运行，用固定 ID，调度器重启后继续续期，不会误判失联
+    """
+    return process_owner_id() if DISPATCH_BACKEND == "local" else scheduler_owner_id()
+
+
+def adopt_leases(owner: str) -> int:
+    """启动时立即续期该持有者名下的全部未结束执行（包括上一次运行期间已过期的），返回接管条数"""
+    adopted = renew_leases(owner, lease_deadline())
+    if adopted:
+        logger.info(f"已接管 {adopted} 个未结束执行的租约 (持有者 {owner})")
+    return adopted
+
+
+def start_lease_keeper(owner: str) -> Heartbeat:
+    """启动常驻心跳：每 1/3 租约有效期用一条语句续期该持有者的全部执行"""
+    return Heartbeat(
+        EXECUTION_LEASE_TTL / 3,
+        lambda: renew_leases(owner, lease_deadline())
+    ).start()
+
+
+def recover_expired_leases():
+    """回收租约过期的执行及失联的 RUNNING 任务，恢复为 FAILED"""
+    now = datetime.utcnow()
+    orphan_before = (now - timedelta(seconds=EXECUTION_LEASE_TTL)).isoformat()
+    unleased_before = (now - timedelta(seconds=UNLEASED_EXECUTION_TIMEOUT)).isoformat()
+    recovered = expire_leases(now.isoformat(), orphan_before, unleased_before)
+    if recovered:
+        logger.warning(f"执行租约过期，任务恢复为 FAILED: {recovered}")
+        notify_tasks_changed(recovered)
+
+
+def seconds_until_next_fire() -> float:
+    """距离最早触发时间的秒数，最多 MAX_IDLE_WAIT"""
+    earliest = task_index.peek()
+    if earliest is None:
+        return MAX_IDLE_WAIT
+    delay = (earliest - datetime.utcnow()).total_seconds()
+    return min(max(delay, 0), MAX_IDLE_WAIT)
+
+
+def rebuild_index():
+    """按数据库全量重建索引：启动时执行，之后每 INDEX_RECONCILE_INTERVAL 秒核对一次"""
+    _reconcile_needed.clear()
+    with _index_lock:
+        tasks = list_tasks()
+        task_index.rebuild((task.id, get_fire_time(task)) for task in tasks)
+    logger.info(f"调度索引已重建: {len(task_index)}/{len(tasks)} 个任务待调度")
+
+
 # 任务调度器
 def run_scheduler():
     logger.info("任务调度器已启动")
+    rebuild_index()
+    subscribe(TASKS_CHANGED, on_tasks_changed)
+
+    if DISPATCH_BACKEND == "redis":
+        threading.Thread(target=consume_results, daemon=True).start()
+    # 所有分发方式下新建的执行都先由调度器持有租约（见 dispatch_tasks），先接管再开始回收过期租约
+    owner = dispatch_owner_id()
+    adopt_leases(owner)
+    start_lease_keeper(owner)
+    retention_service.start()
+
+    next_lease_check = 0.0
+    next_reconcile = time.monotonic() + INDEX_RECONCILE_INTERVAL
     while True:
+        _wakeup.clear()
         try:
-            now = datetime.utcnow()
-            tasks = list_tasks()
-            logger.debug(f"调度检查: 扫描 {len(tasks)} 个任务")
-
-            for task in tasks:
-
-                if task.status == "RUNNING" and task.last_run_at:
-                    last_run = datetime.fromisoformat(task.last_run_at)
-                    if now - last_run > RUNNING_TIMEOUT:
-                        logger.warning(f"任务 {task.id} ({task.name}) RUNNING 超时，恢复为 FAILED")
-                        update_task_status(
-                            task_id=task.id,
-                            status="FAILED"
-                        )
-                        continue
+            if time.monotonic() >= next_lease_check:
+                recover_expired_leases()
+                next_lease_check = time.monotonic() + LEASE_CHECK_INTERVAL
 
-                # 获取上一次执行时间
-                base_time = get_base_time(task)
+            if _reconcile_needed.is_set() or time.monotonic() >= next_reconcile:
+                rebuild_index()
+                next_reconcile = time.monotonic() + INDEX_RECONCILE_INTERVAL
 
+            now = datetime.utcnow()
+            due_ids = task_index.pop_due(now)
+            if due_ids:
+                logger.debug(f"调度检查: {len(due_ids)} 个任务到期, 索引共 {len(task_index)} 个任务")
                 try:
-                    next_run_time = croniter(task.cron, base_time).get_next(datetime)
-                except Exception as e:
-                    logger.error(f"任务 {task.id} ({task.name}) 的 cron 表达式无效: {task.cron}, 错误: {e}")
-
-                    update_task_status(
-                        task_id=task.id,
-                        status="FAILED",
-                        last_error=f"invalid cron: {e}"
-                    )
-                    continue
-                # 判断是否强制执行
-                should_run = (
-                        next_run_time <= now
-                        or (task.force_run_at and datetime.fromisoformat(task.force_run_at) <= now)
-                    )
-                # 判断任务状态为 PENDING 且当前时间大于或等于下一次执行时间
-                if task.status in SCHEDULABLE_STATUSES and should_run:
-                    logger.info(f"触发任务执行: ID={task.id}, name={task.name}, status={task.status}")
-                    start_time = datetime.utcnow().isoformat()
-
-                    if not try_mark_running(task.id, start_time):
-                        logger.debug(f"任务 {task.id} 已被其他进程占用，跳过")
-                        continue  # 没抢到，跳过
-
-                    execution_id = create_execution(
-                        task_id=task.id,
-                        started_at=datetime.utcnow().isoformat(),
-                        status="QUEUED"
-                    )
-
-                    threading.Thread(
-                        target=execute_task,
-                        args=(task,execution_id),
-                        daemon=True
-                    ).start()
+                    due_tasks = [task for task in get_tasks_by_ids(due_ids) if should_dispatch(task, now)]
+                    dispatch_tasks(due_tasks)
+                finally:
+                    # 先提交本轮登记的状态变更，再按最新状态放回索引
+                    task_writer.flush()
+                    refresh_tasks(due_ids)
+            timeout = min(seconds_until_next_fire(), max(next_lease_check - time.monotonic(), 0))
         except Exception as e:
             logger.error(f"调度器异常: {str(e)}", exc_info=True)
-        
-        time.sleep(5)  # 改为 5 秒轮询一次，提高调度精度
+            timeout = 5
 
-def execute_task(task: Task, execution_id: int):
-    start_time= datetime.utcnow().isoformat()
-    logger.info(f"开始执行任务 {task.id} ({task.name}): {task.command}")
+        # 休眠到最早触发时间，期间有任务变更会被提前唤醒
+        _wakeup.wait(timeout)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-    "UPDATE executions SET status='RUNNING' WHERE id=?",
-    (execution_id,)
-)
-    conn.commit()
-    conn.close()
 
-    print(f"任务 {task.id} 执行于 {start_time}")
-    print(f"Command: {task.command}")
+def should_dispatch(task: Task, now: datetime) -> bool:
+    """判断到期任务是否需要执行；cron 无效的任务标记为 FAILED"""
+    if task.status == "RUNNING":
+        return False
+
+    # 获取上一次执行时间
+    base_time = get_base_time(task)
 
     try:
-        result = subprocess.run(
-        task.command,
-        shell=True,
-        capture_output=True,
-        text=True)
-
-        finished_at = datetime.utcnow().isoformat()
-
-        print("stdout:")
-        print(result.stdout)
-
-        print("stderr:")
-        print(result.stderr)
-
-        if result.returncode == 0:
-            execution_status = "SUCCESS"
-            task_status = "ACTIVE"
-            logger.info(f"任务 {task.id} ({task.name}) 执行成功")
-            # 成功则重置重试计数
-            reset_retry_count(task.id)
-        else:
-            execution_status = "FAILED"
-            task_status = "FAILED"
-            logger.warning(f"任务 {task.id} ({task.name}) 执行失败，返回码: {result.returncode}")
-            
-            # 尝试重试
-            retry_info = get_task_retry_info(task.id)
-            if retry_info['retry_count'] < retry_info['max_retries']:
-                new_count = increment_retry_count(task.id)
-                logger.info(f"任务 {task.id} 重试 {new_count}/{retry_info['max_retries']}")
-                task_status = "PENDING"  # 标记为待处理，触发重试
-
-        finish_execution(
-            execution_id=execution_id,
-            status=execution_status,
-            finished_at=finished_at,
-            stdout=result.stdout,
-            stderr=result.stderr
-        )
+        next_run_time = get_next_time(task.cron, base_time)
+    except Exception as e:
+        logger.error(f"任务 {task.id} ({task.name}) 的 cron 表达式无效: {task.cron}, 错误: {e}")
 
         update_task_status(
             task_id=task.id,
-            status=task_status,
-            force_run_at=None
+            status="FAILED",
+            last_error=f"invalid cron: {e}"
+        )
+        return False
+    # 判断是否强制执行
+    should_run = (
+            next_run_time <= now
+            or (task.force_run_at and datetime.fromisoformat(task.force_run_at) <= now)
         )
+    # 判断任务状态为 PENDING 且当前时间大于或等于下一次执行时间
+    return task.status in SCHEDULABLE_STATUSES and bool(should_run)
+
+
+def dispatch_tasks(tasks: list[Task]):
+    """在一个事务中批量抢占到期任务并创建执行记录，再按分发方式启动执行"""
+    if not tasks:
+        return
+
+    for task in tasks:
+        logger.info(f"触发任务执行: ID={task.id}, name={task.name}, status={task.status}")
+
+    # 创建记录的同时由调度器取得租约，排队中的执行由调度器的心跳续期：
+    # sqlite 模式下 worker 领取时接管租约；redis 模式下远程 worker 不访问数据库，租约始终由调度器持有
+    # 调度器停止超过租约有效期时，租约过期即回收，任务不会永远停留在 RUNNING
+    executions = claim_tasks(
+        [task.id for task in tasks],
+        started_at=datetime.utcnow().isoformat(),
+        lease_owner=dispatch_owner_id(),
+        lease_expires_at=lease_deadline()
+    )
+
+    for task in tasks:
+        execution_id = executions.get(task.id)
+        if execution_id is None:
+            logger.debug(f"任务 {task.id} 已被其他进程占用，跳过")
+            continue  # 没抢到，跳过
+
+        if DISPATCH_BACKEND == "local":
+            execution_pool.submit(execute_task, task, execution_id)
+        elif DISPATCH_BACKEND == "redis":
+            try:
+                get_dispatch_queue().push_job(execution_id, task.id, task.name, task.command)
+            except Exception as e:
+                # 投递失败：结束这次执行并按重试策略恢复任务状态
+                logger.error(f"任务 {task.id} 投递到 Redis 失败: {e}", exc_info=True)
+                record_result(task.id, task.name, execution_id, {
+                    "returncode": None,
+                    "stdout": None,
+                    "stderr": None,
+                    "error": f"dispatch failed: {e}",
+                    "finished_at": datetime.utcnow().isoformat(),
+                })
+        # sqlite 模式下执行记录保持 QUEUED，由独立 worker 进程领取执行
+
+
+def consume_results():
+    """redis 模式：消费远程 worker 推送的开始/完成事件并写回数据库"""
+    queue = get_dispatch_queue()
+    consumer = f"scheduler-{os.getpid()}"
+    logger.info("执行结果消费线程已启动")
 
-    except Exception as e:
-        finished_at = datetime.utcnow().isoformat()
-        logger.error(f"任务 {task.id} ({task.name}) 执行异常: {str(e)}", exc_info=True)
+    while True:
+        try:
+            claimed = queue.results.claim(consumer)
+            if claimed is None:
+                continue
+            message_id, event = claimed
+            future = handle_result_event(event)
+            if future is None:
+                queue.results.ack(message_id)
+            else:
+                # 写入提交后再确认；写入失败的事件不确认，可见性超时后重新投递
+                future.add_done_callback(lambda f, m=message_id: f.exception() or queue.results.ack(m))
+        except Exception as e:
+            logger.error(f"处理执行结果异常: {str(e)}", exc_info=True)
+            time.sleep(1)
+
+
+def handle_result_event(event: dict) -> Future | None:
+    """
+    登记一条 worker 事件的写入，返回写入提交后完成的 Future
+    重复投递的完成事件会被忽略（返回 None）
+    """
+    execution_id = event["execution_id"]
+    if event["type"] == "started":
+        # 远程 worker 不续期数据库租约（其存活由 Redis 可见性超时保证），租约保持由调度器持有
+        logger.debug(f"执行记录 {execution_id} 已由 worker {event.get('worker_id')} 开始执行")
+        publish_execution_event(execution_id, {"type": "status", "status": "RUNNING"})
+        return execution_writer.mark_running(execution_id)
+
+    # 先查写入队列再查库：结果若在两次检查之间提交，库里一定已能看到
+    if execution_writer.has_pending_complete(execution_id):
+        return None
+    state = get_execution_state(execution_id)
+    if state is None or state["status"] in ("SUCCESS", "FAILED"):
+        return None
+    return record_result(event["task_id"], event["name"], execution_id, event["result"])
 
-        finish_execution(
-            execution_id=execution_id,
-            status="FAILED",
-            finished_at=finished_at,
-            error=str(e)
-        )
-        
-        # 异常也尝试重试
-        retry_info = get_task_retry_info(task.id)
-        task_status = "FAILED"
-        if retry_info['retry_count'] < retry_info['max_retries']:
-            new_count = increment_retry_count(task.id)
-            logger.info(f"任务 {task.id} 异常重试 {new_count}/{retry_info['max_retries']}")
-            task_status = "PENDING"
 
-        update_task_status(
-            task_id=task.id,
-            status=task_status,
-            force_run_at=None
+def execute_task(task: Task, execution_id: int):
+    execution_writer.mark_running(execution_id)
+    run_execution(task, execution_id)
+
+
+def run_execution(task: Task, execution_id: int):
+    """
+    执行已标记为 RUNNING 的执行记录，并写回结果与任务状态（本进程执行池与独立 worker 共用）
+    执行期间的状态与输出行发布为本进程的实时事件（见 common/events.py）
+    """
+    publish_execution_event(execution_id, {"type": "status", "status": "RUNNING"})
+    result = run_command(
+        task, execution_id,
+        on_output=lambda stream, line: publish_execution_event(
+            execution_id, {"type": "output", "stream": stream, "line": line}
         )
+    )
+    record_result(task.id, task.name, execution_id, result)
 
 
+def run_command(task: Task, execution_id: int | None = None, on_output=None) -> dict:
+    """
+    执行任务命令，不访问数据库（远程 worker 也使用）
+    输出分块流式读取，只保留有界的开头与结尾（见 scheduler/output.py）；on_output 逐行接收实时输出
+    返回 {"returncode", "stdout", "stderr", "error", "finished_at"}；启动失败时 returncode 为 None
+    """
+    start_time= datetime.utcnow().isoformat()
+    logger.info(f"开始执行任务 {task.id} ({task.name}): {task.command}")
+
+    print(f"任务 {task.id} 执行于 {start_time}")
+    print(f"Command: {task.command}")
+
+    try:
+        returncode, stdout, stderr = run_streaming(
+            task.command,
+            spool_name=str(execution_id) if execution_id is not None else None,
+            on_output=on_output
+        )
+
+        return {
+            "returncode": returncode,
+            "stdout": stdout,
+            "stderr": stderr,
+            "error": None,
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+    except Exception as e:
+        logger.error(f"任务 {task.id} ({task.name}) 执行异常: {str(e)}", exc_info=True)
+        return {
+            "returncode": None,
+            "stdout": None,
+            "stderr": None,
+            "error": str(e),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+
+
+def record_result(task_id: int, task_name: str, execution_id: int, result: dict) -> Future:
+    """
+    登记执行结果，并按重试策略更新任务状态
+    由 execution_writer 与同一时刻完成的其他执行合并提交；返回提交后完成的 Future
+    """
+    success = result["returncode"] == 0
+    future = execution_writer.complete(
+        execution_id=execution_id,
+        task_id=task_id,
+        success=success,
+        finished_at=result["finished_at"],
+        stdout=result.get("stdout"),
+        stderr=result.get("stderr"),
+        error=result.get("error")
+    )
+
+    if success:
+        logger.info(f"任务 {task_id} ({task_name}) 执行成功")
+    elif result["returncode"] is not None:
+        logger.warning(f"任务 {task_id} ({task_name}) 执行失败，返回码: {result['returncode']}")
+
+    future.add_done_callback(lambda f: log_result_written(task_id, execution_id, success, f))
+    return future
+
+
+def log_result_written(task_id: int, execution_id: int, success: bool, future: Future):
+    """执行结果提交后：通知实时日志订阅者执行结束，并记录写入失败或进入重试"""
+    # 结果已落库，订阅者此时读取数据库即可拿到完整输出
+    publish_execution_event(execution_id, {"type": "end", "status": "SUCCESS" if success else "FAILED"})
+    if future.exception() is not None:
+        logger.error(f"写回执行记录 {execution_id} (任务 {task_id}) 失败: {future.exception()}")
+        return
+    task_state = future.result()
+    if task_state and task_state["status"] == "PENDING":
+        logger.info(f"任务 {task_id} 重试 {task_state['retry_count']}/{task_state['max_retries']}")
 
 
 def update_task_status(
@@ -185,43 +437,21 @@ def update_task_status(
     status: str | None = None,
     last_run_at: str | None = None,
     last_error: str | None = None,
-    force_run_at: str | None = None
+    force_run_at: str | None = None,
+    clear_force_run: bool = False
 ):
-    conn = get_connection()
-    cursor = conn.cursor()
-
+    """
+    登记任务状态更新：只写入传入的字段（clear_force_run=True 时清空 force_run_at）
+    由 task_writer 合并后以一条 UPDATE 异步提交，需要立即生效时调用 task_writer.flush()
+    """
+    fields = {}
     if status is not None:
-        cursor.execute(
-            "UPDATE tasks SET status = ? WHERE id = ?",
-            (status, task_id)
-        )
-
+        fields["status"] = status
     if last_run_at is not None:
-        cursor.execute(
-            "UPDATE tasks SET last_run_at = ? WHERE id = ?",
-            (last_run_at, task_id)
-        )
-
+        fields["last_run_at"] = last_run_at
     if last_error is not None:
-        cursor.execute(
-            "UPDATE tasks SET last_error = ? WHERE id = ?",
-            (last_error, task_id)
-        )
-
-    if force_run_at is not None:
-        cursor.execute(
-            "UPDATE tasks SET force_run_at = ? WHERE id = ?",
-            (force_run_at, task_id)
-        )
-    else:
-        cursor.execute(
-            "UPDATE tasks SET force_run_at = NULL WHERE id = ?",
-            (task_id,)
-        )
-
-    conn.commit()
-    conn.close()
-
-    print(f"任务 {task_id} 更新完成")
-    
+        fields["last_error"] = last_error
+    if force_run_at is not None or clear_force_run:
+        fields["force_run_at"] = force_run_at
 
+    task_writer.update(task_id, **fields)
@@ -0,0 +1,86 @@
+import heapq
+import threading
+from datetime import datetime
+
+
+class TaskIndex:
+    """
+    按下次触发时间排序的任务索引（最小堆）
+    调度器每次只弹出已到期的任务，开销与到期任务数成正比，而不是任务总数
+    更新/删除采用惰性删除：旧堆条目在弹出时与 _entries 比对后丢弃
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, int]] = []
+        self._entries: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, task_id: int):
+        with self._lock:
+            return task_id in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+
+    def rebuild(self, items):
+        """用 (task_id, fire_time) 列表整体重建索引"""
+        with self._lock:
+            self._entries = {task_id: fire_time for task_id, fire_time in items if fire_time is not None}
+            self._heap = [(fire_time, task_id) for task_id, fire_time in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def push(self, task_id: int, fire_time: datetime):
+        """插入或更新任务的触发时间"""
+        with self._lock:
+            if self._entries.get(task_id) == fire_time:
+                return
+            self._entries[task_id] = fire_time
+            heapq.heappush(self._heap, (fire_time, task_id))
+            self._maybe_compact()
+
+    def remove(self, task_id: int):
+        """从索引中移除任务"""
+        with self._lock:
+            self._entries.pop(task_id, None)
+            self._maybe_compact()
+
+    def get(self, task_id: int) -> datetime | None:
+        with self._lock:
+            return self._entries.get(task_id)
+
+    def peek(self) -> datetime | None:
+        """返回最早的触发时间；索引为空时返回 None"""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """弹出所有触发时间 <= now 的任务 ID"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_time, task_id = heapq.heappop(self._heap)
+                if self._entries.get(task_id) != fire_time:
+                    continue  # 过期条目
+                del self._entries[task_id]
+                due.append(task_id)
+        return due
+
+    def _drop_stale(self):
+        while self._heap:
+            fire_time, task_id = self._heap[0]
+            if self._entries.get(task_id) == fire_time:
+                break
+            heapq.heappop(self._heap)
+
+    def _maybe_compact(self):
+        # 过期条目过多时重建堆，避免频繁更新导致堆无限增长
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(fire_time, task_id) for task_id, fire_time in self._entries.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,22 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from common import db
+
+
+class TempDBTestCase(unittest.TestCase):
+    """
+    每个测试使用临时目录中新建的数据库；结束时关闭连接池、恢复 DB_PATH 并删除临时目录
+    子类覆盖 setUp 时先调用 super().setUp()；清理登记为 cleanup，在子类 tearDown 之后执行
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = Path(tmp.name)
+
+        self.addCleanup(setattr, db, "DB_PATH", db.DB_PATH)
+        db.DB_PATH = self.tmp_dir / "scheduler.db"
+        self.addCleanup(db.close_connections)
+        db.init_db()
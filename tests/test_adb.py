@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import unittest
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from common import adb, db
+from common.auth import create_access_token
+from db_case import TempDBTestCase
+
+
+class AsyncDbTest(TempDBTestCase):
+    def test_calls_run_on_db_executor(self):
+        async def scenario():
+            task = await adb.create_task("t", "* * * * *", "echo")
+            thread = await adb.run_db(lambda: threading.current_thread().name)
+            return task, thread, await adb.get_task_by_id(task.id)
+
+        task, thread, fetched = asyncio.run(scenario())
+        self.assertTrue(thread.startswith("db"))
+        self.assertEqual(fetched.name, "t")
+
+    def test_concurrent_reads_do_not_serialize_on_event_loop(self):
+        for i in range(5):
+            db.create_task(f"t{i}", "* * * * *", "echo")
+
+        async def scenario():
+            return await asyncio.gather(*(adb.list_tasks_page(limit=2) for _ in range(20)))
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all([t.id for t in tasks] == [5, 4] for tasks, _ in results))
+
+    def test_bulk_operations_and_async_tasks_route(self):
+        ids = [db.create_task(f"t{i}", "* * * * *", "echo").id for i in range(3)]
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+        self.assertEqual(db.pause_tasks([str(ids[0])]), 1)
+        self.assertEqual(db.get_task_by_id(ids[0]).status, "PAUSED")
+        self.assertEqual(db.force_run_tasks(ids[1:], "2024-01-01T00:00:00"), 2)
+
+        found, deleted_tasks, _ = db.delete_tasks(ids[:2])
+        self.assertEqual((sorted(found), deleted_tasks), (ids[:2], 2))
+
+        r = client.get("/tasks", headers=headers)
+        self.assertEqual([t["id"] for t in r.json()], [ids[2]])
+        self.assertEqual(r.json()[0]["force_run_at"], "2024-01-01T00:00:00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from common import auth, db
+from common.events import notify_users_changed
+from db_case import TempDBTestCase
+
+
+class AuthCacheTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        auth._token_cache.clear()
+        auth._user_cache.clear()
+
+    def tearDown(self):
+        auth._token_cache.clear()
+        auth._user_cache.clear()
+
+    def test_verified_tokens_are_decoded_once(self):
+        token = auth.create_access_token({"sub": "admin"})
+        with mock.patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+            self.assertEqual(auth.verify_token(token), "admin")
+            self.assertEqual(auth.verify_token(token), "admin")
+            self.assertIsNone(auth.verify_token("garbage"))
+            self.assertIsNone(auth.verify_token("garbage"))
+        self.assertEqual(decode.call_count, 3)
+
+    def test_expired_tokens_are_rejected_and_not_cached(self):
+        token = auth.create_access_token({"sub": "admin"}, expires_delta=timedelta(seconds=-10))
+        self.assertIsNone(auth.verify_token(token))
+        self.assertEqual(auth._token_cache.stats()["size"], 0)
+
+        cache = auth.ExpiringCache(maxsize=2)
+        cache.set("a", 1, time.time() + 60)
+        cache.set("b", 2, time.time() - 1)
+        cache.set("c", 3, time.time() + 60)
+        cache.set("d", 4, time.time() + 60)
+        self.assertEqual([cache.get(k) for k in "abcd"], [None, None, 3, 4])
+
+    def test_user_records_cached_until_user_changes(self):
+        token = auth.create_access_token({"sub": "admin"})
+        with mock.patch.object(auth, "get_user_by_username", wraps=db.get_user_by_username) as lookup:
+            self.assertEqual(auth.get_current_user(token).username, "admin")
+            self.assertEqual(auth.get_current_user(token).username, "admin")
+            self.assertEqual(lookup.call_count, 1)
+
+            notify_users_changed(["admin"])
+            auth.get_current_user(token)
+            self.assertEqual(lookup.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from common import db
+from common.auth import create_access_token
+from common.events import subscribe, unsubscribe, TASKS_CHANGED
+from db_case import TempDBTestCase
+
+
+class BulkCreateTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TestClient(app)
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+    def test_create_tasks_in_chunks_returns_ids_in_input_order(self):
+        db.create_task("existing", "* * * * *", "echo")
+        rows = [(f"t{i}", "*/5 * * * *", f"echo {i}") for i in range(25)]
+        ids = db.create_tasks(rows, chunk_size=10)
+
+        self.assertEqual(ids, list(range(2, 27)))
+        tasks = {task.id: task for task in db.get_tasks_by_ids(ids)}
+        self.assertEqual([tasks[i].command for i in ids], [f"echo {i}" for i in range(25)])
+        self.assertEqual(db.count_tasks("PENDING"), 26)
+
+    def test_failed_chunk_reports_committed_ids(self):
+        notified = []
+        subscribe(TASKS_CHANGED, notified.append)
+        self.addCleanup(unsubscribe, TASKS_CHANGED, notified.append)
+        real_connection = db.get_connection
+        calls = []
+
+        def connection():
+            calls.append(1)
+            if len(calls) == 3:
+                raise db.sqlite3.OperationalError("disk I/O error")
+            return real_connection()
+
+        rows = [(f"t{i}", "* * * * *", "echo") for i in range(25)]
+        with mock.patch.object(db, "get_connection", side_effect=connection):
+            with self.assertRaises(db.BulkCreateError) as ctx:
+                db.create_tasks(rows, chunk_size=10)
+
+        self.assertEqual(ctx.exception.ids, list(range(1, 21)))
+        self.assertEqual(notified, [list(range(1, 11)), list(range(11, 21))])
+        self.assertEqual(db.count_tasks(""), 20)
+
+    def test_json_and_ndjson_bodies(self):
+        items = [{"name": f"t{i}", "cron": "0 * * * *", "command": "echo"} for i in range(3)]
+        r = self.client.post("/tasks/bulk", json=items, headers=self.headers)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"created": 3, "ids": [1, 2, 3]})
+
+        body = "\n".join(json.dumps(item) for item in items) + "\n"
+        r = self.client.post("/tasks/bulk", content=body,
+                             headers={**self.headers, "Content-Type": "application/x-ndjson"})
+        self.assertEqual(r.json()["ids"], [4, 5, 6])
+
+    def test_oversized_bodies_rejected_before_buffering(self):
+        ndjson = {**self.headers, "Content-Type": "application/x-ndjson"}
+        line = json.dumps({"name": "t", "cron": "* * * * *", "command": "echo"}) + "\n"
+
+        with mock.patch("api.main.BULK_CREATE_MAX_TASKS", 3):
+            r = self.client.post("/tasks/bulk", content=line * 10, headers=ndjson)
+        self.assertEqual(r.status_code, 413)
+
+        with mock.patch("api.main.BULK_CREATE_MAX_BYTES", 100):
+            r = self.client.post("/tasks/bulk", content=line * 10, headers=ndjson)
+            self.assertEqual(r.status_code, 413)
+
+            def chunks():   # 没有 Content-Length 的分块上传
+                for _ in range(10):
+                    yield line.encode()
+            r = self.client.post("/tasks/bulk", content=chunks(), headers=ndjson)
+            self.assertEqual(r.status_code, 413)
+
+            r = self.client.post("/tasks/bulk", json=[{"name": "t" * 200, "cron": "* * * * *", "command": "echo"}],
+                                 headers=self.headers)
+            self.assertEqual(r.status_code, 413)
+        self.assertEqual(db.count_tasks(""), 0)
+
+    def test_invalid_items_reject_whole_batch(self):
+        items = [
+            {"name": "ok", "cron": "* * * * *", "command": "echo"},
+            {"name": "bad", "cron": "not a cron", "command": "echo"},
+            {"name": "missing command", "cron": "* * * * *"},
+        ]
+        r = self.client.post("/tasks/bulk", json=items, headers=self.headers)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual([e["index"] for e in r.json()["errors"]], [1, 2])
+        self.assertEqual(db.count_tasks(""), 0)
+
+        r = self.client.post("/tasks/bulk", json={"name": "x"}, headers=self.headers)
+        self.assertEqual(r.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from fastapi.testclient import TestClient
+
+from api.main import app, make_etag
+from common import db
+from common.auth import create_access_token
+from db_case import TempDBTestCase
+
+
+class ConditionalGetTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TestClient(app)
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+        self.task = db.create_task("t", "* * * * *", "echo")
+
+    def get(self, url, etag=None):
+        headers = dict(self.headers, **({"If-None-Match": etag} if etag else {}))
+        return self.client.get(url, headers=headers)
+
+    def test_task_list_revalidates_against_data_version(self):
+        for url in ("/tasks", "/tasks?limit=10"):
+            first = self.get(url)
+            etag = first.headers["ETag"]
+            self.assertEqual(first.headers["Cache-Control"], "private, no-cache")
+
+            again = self.get(url, etag)
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b"")
+
+        self.assertNotEqual(self.get("/tasks").headers["ETag"], self.get("/tasks?limit=10").headers["ETag"])
+
+        before = self.get("/tasks").headers["ETag"]
+        db.update_task(self.task.id, name="renamed")
+        changed = self.get("/tasks", before)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()[0]["name"], "renamed")
+
+    def test_finished_execution_is_immutable(self):
+        execution_id = db.claim_tasks([self.task.id], "2024-01-01T00:00:00")[self.task.id]
+        url = f"/api/executions/{execution_id}"
+
+        running = self.get(url)
+        self.assertEqual(running.headers["Cache-Control"], "private, no-cache")
+        self.assertEqual(self.get(url, running.headers["ETag"]).status_code, 304)
+
+        db.complete_execution(execution_id, self.task.id, True, "2024-01-01T00:00:01", stdout="ok\n")
+        finished = self.get(url, running.headers["ETag"])
+        self.assertEqual(finished.status_code, 200)
+        self.assertEqual(finished.json()["stdout"], "ok\n")
+        self.assertIn("immutable", finished.headers["Cache-Control"])
+
+        cached = self.get(url, f'W/{finished.headers["ETag"]}, "other"')
+        self.assertEqual(cached.status_code, 304)
+        self.assertIn("immutable", cached.headers["Cache-Control"])
+        self.assertEqual(self.get("/api/executions/999").status_code, 404)
+
+    def test_ui_task_list_answers_304_before_querying(self):
+        etag = make_etag("ui-tasks", db.get_tasks_version(), "admin", "status=PENDING")
+        r = self.get("/ui/tasks?status=PENDING", etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.headers["ETag"], etag)
+
+
+if __name__ == '__main__':
+    unittest.main()
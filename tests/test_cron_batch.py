@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from common.auth import create_access_token
+from common.utils import _cached_run_times, align_start, next_run_times
+
+
+class CronBatchPreviewTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+        _cached_run_times.cache_clear()
+
+    def test_starts_within_a_minute_share_one_cached_result(self):
+        first = next_run_times("*/5 * * * *", 3, datetime(2024, 1, 1, 12, 0, 1))
+        second = next_run_times("*/5 * * * *", 3, datetime(2024, 1, 1, 12, 0, 59, 999))
+        self.assertEqual(first, ["2024-01-01T12:05:00", "2024-01-01T12:10:00", "2024-01-01T12:15:00"])
+        self.assertEqual(second, first)
+        self.assertEqual(_cached_run_times.cache_info().hits, 1)
+
+        # 带秒字段的表达式只对齐到秒
+        self.assertEqual(align_start("* * * * * */10", datetime(2024, 1, 1, 12, 0, 31, 5)),
+                         datetime(2024, 1, 1, 12, 0, 31))
+
+    def test_aware_start_keeps_its_timezone(self):
+        plus2 = timezone(timedelta(hours=2))
+        self.assertEqual(next_run_times("0 9 * * *", 2, datetime(2024, 6, 1, 10, 30, tzinfo=plus2)),
+                         ["2024-06-02T09:00:00+02:00", "2024-06-03T09:00:00+02:00"])
+        self.assertEqual(next_run_times("0 9 * * *", 1, datetime(2024, 6, 1, 10, 30, tzinfo=timezone.utc)),
+                         ["2024-06-02T09:00:00+00:00"])
+        self.assertEqual(next_run_times("0 9 * * *", 1, datetime(2024, 6, 1, 10, 30)), ["2024-06-02T09:00:00"])
+
+    def test_batch_endpoint_expands_and_validates_in_order(self):
+        body = {
+            "count": 2,
+            "start": "2024-01-01T00:00:00",
+            "expressions": [
+                "0 * * * *",
+                {"cron": "0 * * * *", "start": "2024-06-01T10:30:00+02:00"},
+                "not a cron",
+                "0 * * * *",
+            ],
+        }
+        r = self.client.post("/api/cron/next/batch", json=body, headers=self.headers)
+        self.assertEqual(r.status_code, 200)
+        results = r.json()["results"]
+
+        self.assertEqual(results[0]["next_runs"], ["2024-01-01T01:00:00", "2024-01-01T02:00:00"])
+        self.assertEqual(results[1]["next_runs"], ["2024-06-01T11:00:00+02:00", "2024-06-01T12:00:00+02:00"])
+        self.assertFalse(results[2]["valid"])
+        self.assertIn("Invalid cron expression", results[2]["error"])
+        self.assertEqual(results[3], results[0])
+        self.assertEqual(r.json()["invalid"], 1)
+        self.assertEqual(_cached_run_times.cache_info().hits, 1)
+
+        r = self.client.post("/api/cron/next/batch", json={"expressions": [], "count": 0}, headers=self.headers)
+        self.assertEqual(r.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime, timedelta
+from croniter import croniter
+
+from common.cron import compile_cron, get_next_time, cron_cache_stats
+
+
+EXPRESSIONS = [
+    "* * * * *",
+    "*/5 * * * *",
+    "0 9 * * 1-5",
+    "15 2 1,15 * *",
+    "0 0 29 2 *",
+    "0 0 13 * 5",
+    "30 4 1-7 jan,jul sun",
+    "@hourly",
+    "0 0 L * *",
+    "0 0 * * 1#2",
+]
+
+
+class CompiledCronTest(unittest.TestCase):
+    def test_matches_croniter(self):
+        bases = [datetime(2023, 12, 31, 23, 59, 30) + timedelta(hours=37 * i, seconds=11 * i) for i in range(40)]
+        for expr in EXPRESSIONS:
+            for base in bases:
+                with self.subTest(expr=expr, base=base):
+                    expected = croniter(expr, base).get_next(datetime)
+                    self.assertEqual(get_next_time(expr, base), expected)
+
+    def test_invalid_expression_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            compile_cron("invalidcron")
+        with self.assertRaises(ValueError):
+            compile_cron("61 * * * *")
+
+    def test_cache_counts_hits(self):
+        before = cron_cache_stats()
+        expr = "7 7 * * *"
+        compile_cron(expr)
+        compile_cron(expr)
+        after = cron_cache_stats()
+        self.assertGreaterEqual(after["hits"] - before["hits"], 1)
+        self.assertIs(compile_cron(expr), compile_cron(expr))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sqlite3
+import unittest
+
+from common import db
+from db_case import TempDBTestCase
+
+
+class ConnectionPoolTest(TempDBTestCase):
+    def test_connection_is_reused_with_pragmas(self):
+        conn = db.get_connection()
+        raw = conn._conn
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        conn.close()
+        conn.close()  # 重复归还无副作用
+
+        again = db.get_connection()
+        self.assertIs(again._conn, raw)
+        again.close()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            again.execute("SELECT 1")
+
+    def test_with_block_rolls_back_on_error_and_releases(self):
+        with self.assertRaises(RuntimeError):
+            with db.get_connection() as conn:
+                conn.execute("UPDATE tasks SET status = 'X'")
+                conn.execute(
+                    "INSERT INTO tasks (name, cron, command, status, created_at) VALUES ('t', '* * * * *', 'echo', 'PENDING', 'now')"
+                )
+                raise RuntimeError("boom")
+
+        self.assertEqual(db.list_tasks(), [])
+        self.assertEqual(len(db._get_pool()._idle), 1)
+
+    def test_uncommitted_write_is_not_leaked_to_next_user(self):
+        conn = db.get_connection()
+        conn.execute(
+            "INSERT INTO tasks (name, cron, command, status, created_at) VALUES ('t', '* * * * *', 'echo', 'PENDING', 'now')"
+        )
+        conn.close()
+        self.assertEqual(db.list_tasks(), [])
+
+    def test_idle_connections_are_bounded(self):
+        pool = db._get_pool()
+        conns = [db.get_connection() for _ in range(pool.size + 3)]
+        for conn in conns:
+            conn.close()
+        self.assertEqual(len(pool._idle), pool.size)
+
+    def test_pool_follows_db_path(self):
+        pool = db._get_pool()
+        db.DB_PATH = self.tmp_dir / "other.db"
+        self.assertIsNot(db._get_pool(), pool)
+        self.assertTrue(pool.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
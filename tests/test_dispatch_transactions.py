@@ -0,0 +1,61 @@
+import unittest
+
+from common import db
+from db_case import TempDBTestCase
+
+
+class DispatchTransactionTest(TempDBTestCase):
+    def test_claim_tasks_skips_running_and_creates_executions(self):
+        ids = [db.create_task(f"t{i}", "* * * * *", "echo").id for i in range(3)]
+        db.try_mark_running(ids[1], "2024-01-01T00:00:00")
+
+        executions = db.claim_tasks(ids, "2024-01-01T00:01:00", "owner", "2024-01-01T00:01:15")
+
+        self.assertEqual(sorted(executions), [ids[0], ids[2]])
+        for task_id, execution_id in executions.items():
+            execution = db.get_execution(execution_id)
+            self.assertEqual(execution["task_id"], task_id)
+            self.assertEqual(execution["status"], "QUEUED")
+            self.assertEqual(execution["worker_id"], "owner")
+            task = db.get_task_by_id(task_id)
+            self.assertEqual((task.status, task.last_run_at), ("RUNNING", "2024-01-01T00:01:00"))
+
+        self.assertEqual(db.claim_tasks(ids, "2024-01-01T00:02:00"), {})
+
+    def test_claim_more_tasks_than_sqlite_variable_limit(self):
+        ids = db.create_tasks([(f"t{i}", "* * * * *", "echo") for i in range(33000)])
+        executions = db.claim_tasks(ids, "2024-01-01T00:00:00", "owner", "2024-01-01T00:00:15")
+        self.assertEqual(len(executions), 33000)
+        self.assertEqual(db.count_tasks("RUNNING"), 33000)
+
+    def run_once(self, task_id, success, **kwargs):
+        execution_id = db.claim_tasks([task_id], "2024-01-01T00:00:00")[task_id]
+        return execution_id, db.complete_execution(execution_id, task_id, success, "2024-01-01T00:00:01", **kwargs)
+
+    def test_complete_execution_applies_retry_policy(self):
+        task = db.create_task("t", "* * * * *", "false")
+
+        states = [self.run_once(task.id, False)[1]["status"] for _ in range(4)]
+        self.assertEqual(states, ["PENDING", "PENDING", "PENDING", "FAILED"])
+        self.assertEqual(db.get_task_by_id(task.id).retry_count, 3)
+
+        execution_id, state = self.run_once(task.id, True, stdout="ok")
+        self.assertEqual(state, {"status": "ACTIVE", "retry_count": 0, "max_retries": 3})
+        execution = db.get_execution(execution_id)
+        self.assertEqual((execution["status"], execution["stdout"]), ("SUCCESS", "ok"))
+
+    def test_completion_after_lease_expiry_is_ignored(self):
+        task = db.create_task("t", "* * * * *", "sleep 100")
+        stale = db.claim_tasks([task.id], "2024-01-01T00:00:00", "w1", "2024-01-01T00:00:15")[task.id]
+        self.assertEqual(db.expire_leases("2024-01-01T00:01:00", "2024-01-01T00:00:45"), [task.id])
+        current = db.claim_tasks([task.id], "2024-01-01T00:02:00", "w2", "2024-01-01T00:02:15")[task.id]
+
+        self.assertIsNone(db.complete_execution(stale, task.id, True, "2024-01-01T00:02:05", stdout="late"))
+
+        execution = db.get_execution(stale)
+        self.assertEqual((execution["status"], execution["stdout"]), ("FAILED", None))
+        self.assertEqual(db.get_execution(current)["status"], "QUEUED")
+        self.assertEqual(db.get_task_by_id(task.id).status, "RUNNING")   # 新的执行仍在进行，不会被再次分发
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import threading
+import time
+import unittest
+
+from scheduler.executor import ExecutionPool
+
+
+class ExecutionPoolTest(unittest.TestCase):
+    def test_limits_in_flight_and_queues_the_rest(self):
+        pool = ExecutionPool(max_workers=2)
+        release = threading.Event()
+        done = []
+
+        def job(i):
+            release.wait(5)
+            done.append(i)
+
+        for i in range(5):
+            pool.submit(job, i)
+
+        deadline = time.time() + 2
+        while pool.stats()["running"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        stats = pool.stats()
+        self.assertEqual(stats["running"], 2)
+        self.assertEqual(stats["pending"], 3)
+        self.assertEqual(stats["utilization"], 1.0)
+
+        release.set()
+        pool.shutdown(wait=True)
+        self.assertEqual(sorted(done), [0, 1, 2, 3, 4])
+        stats = pool.stats()
+        self.assertEqual(stats["completed"], 5)
+        self.assertEqual(stats["pending"], 0)
+        self.assertGreaterEqual(stats["peak_pending"], 3)
+
+    def test_job_exception_does_not_break_pool(self):
+        pool = ExecutionPool(max_workers=1)
+
+        def boom():
+            raise RuntimeError("boom")
+
+        pool.submit(boom)
+        future = pool.submit(lambda: 42)
+        self.assertEqual(future.result(timeout=2), 42)
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
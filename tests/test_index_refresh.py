@@ -0,0 +1,55 @@
+import threading
+import time
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+from common import db
+from scheduler import scheduler
+from db_case import TempDBTestCase
+
+
+class IndexRefreshTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        scheduler.task_index.clear()
+        self.task = db.create_task("t", "* * * * *", "echo")
+
+    def tearDown(self):
+        scheduler.task_index.clear()
+
+    def test_stale_read_cannot_overwrite_newer_refresh(self):
+        stale = replace(self.task, status="RUNNING")
+        read_stale = threading.Event()
+        real_read = db.get_tasks_by_ids
+
+        def read(task_ids):
+            if not read_stale.is_set():
+                read_stale.set()
+                time.sleep(0.1)  # 旧状态读出后、写入索引前被抢占
+                return [stale]
+            return real_read(task_ids)
+
+        with mock.patch.object(scheduler, "DISPATCH_BACKEND", "redis"), \
+                mock.patch.object(scheduler, "get_tasks_by_ids", side_effect=read):
+            slow = threading.Thread(target=scheduler.refresh_tasks, args=([self.task.id],))
+            slow.start()
+            read_stale.wait()
+            scheduler.refresh_tasks([self.task.id])
+            slow.join()
+
+        self.assertIn(self.task.id, scheduler.task_index)
+
+    def test_failed_refresh_is_repaired_by_reconcile(self):
+        with mock.patch.object(scheduler, "get_tasks_by_ids", side_effect=RuntimeError("db locked")):
+            scheduler.on_tasks_changed([self.task.id])
+        self.assertNotIn(self.task.id, scheduler.task_index)
+        self.assertTrue(scheduler._reconcile_needed.is_set())
+
+        scheduler.rebuild_index()
+        self.assertIn(self.task.id, scheduler.task_index)
+        self.assertFalse(scheduler._reconcile_needed.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from unittest import mock
+
+from common import db
+from common.writer import execution_writer
+from scheduler import scheduler
+from db_case import TempDBTestCase
+
+
+class ExecutionLeaseTest(TempDBTestCase):
+    def start(self, name, owner, expires_at):
+        task = db.create_task(name, "* * * * *", "sleep 100")
+        db.try_mark_running(task.id, "2024-01-01T00:00:00")
+        execution_id = db.create_execution(task.id, "2024-01-01T00:00:00", "RUNNING", owner, expires_at)
+        return task.id, execution_id
+
+    def test_only_expired_leases_are_recovered(self):
+        dead_task, dead_exec = self.start("dead", "w-dead", "2024-01-01T00:00:10")
+        live_task, live_exec = self.start("live", "w-live", "2024-01-01T00:00:10")
+
+        self.assertEqual(db.renew_leases("w-live", "2024-01-01T00:01:00"), 1)
+        recovered = db.expire_leases("2024-01-01T00:00:30", "2024-01-01T00:00:00")
+
+        self.assertEqual(recovered, [dead_task])
+        self.assertEqual(db.get_execution(dead_exec)["status"], "FAILED")
+        self.assertIn("w-dead", db.get_execution(dead_exec)["error"])
+        self.assertEqual(db.get_task_by_id(dead_task).status, "FAILED")
+        self.assertEqual(db.get_execution(live_exec)["status"], "RUNNING")
+        self.assertEqual(db.get_task_by_id(live_task).status, "RUNNING")
+
+    def test_running_task_without_execution_is_recovered_after_grace(self):
+        task = db.create_task("zombie", "* * * * *", "echo")
+        db.try_mark_running(task.id, "2024-01-01T00:00:00")
+
+        self.assertEqual(db.expire_leases("2024-01-01T00:00:05", "2023-12-31T23:59:50"), [])
+        self.assertEqual(db.expire_leases("2024-01-01T00:01:00", "2024-01-01T00:00:45"), [task.id])
+        self.assertEqual(db.get_task_by_id(task.id).status, "FAILED")
+
+    def test_claim_takes_lease(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        db.create_execution(task.id, None, "QUEUED")
+        execution, _ = db.claim_execution("w1", "2024-01-01T00:00:15")
+        self.assertEqual(execution["lease_expires_at"], "2024-01-01T00:00:15")
+        self.assertEqual(db.renew_leases("w1", "2024-01-01T00:00:30"), 1)
+
+    def test_unleased_executions_expire_after_time_limit(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        execution_id = db.claim_tasks([task.id], "2024-01-01T00:00:00")[task.id]
+
+        self.assertEqual(db.expire_leases("2030-01-01T00:00:00", "2029-12-31T00:00:00"), [])
+        self.assertEqual(db.expire_leases("2024-01-01T00:05:00", "2024-01-01T00:04:45", "2023-12-31T23:55:00"), [])
+        recovered = db.expire_leases("2024-01-01T00:15:00", "2024-01-01T00:14:45", "2024-01-01T00:05:00")
+
+        self.assertEqual(recovered, [task.id])
+        self.assertEqual(db.get_execution(execution_id)["error"], "no lease, not finished in time")
+        self.assertEqual(db.get_task_by_id(task.id).status, "FAILED")
+
+    def test_dispatch_leases_executions_and_fails_claim_when_push_fails(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        broken = mock.Mock()
+        broken.push_job.side_effect = ConnectionError("redis down")
+
+        with mock.patch.object(scheduler, "DISPATCH_BACKEND", "redis"), \
+                mock.patch.object(scheduler, "get_dispatch_queue", return_value=broken):
+            scheduler.dispatch_tasks([task])
+        execution_writer.fence()
+
+        execution = db.get_execution(1)
+        self.assertEqual(execution["worker_id"], scheduler.scheduler_owner_id())
+        self.assertIsNotNone(execution["lease_expires_at"])
+        self.assertEqual(execution["status"], "FAILED")
+        self.assertIn("redis down", execution["error"])
+        self.assertEqual(db.get_task_by_id(task.id).status, "PENDING")
+
+    def test_scheduler_restart_keeps_running_redis_execution(self):
+        task = db.create_task("t", "* * * * *", "sleep 100")
+        queue = mock.Mock()
+        with mock.patch.object(scheduler, "DISPATCH_BACKEND", "redis"), \
+                mock.patch.object(scheduler, "get_dispatch_queue", return_value=queue):
+            scheduler.dispatch_tasks([task])
+            execution_id = queue.push_job.call_args[0][0]
+            scheduler.handle_result_event({"type": "started", "execution_id": execution_id, "worker_id": "remote-1"})
+            execution_writer.fence()
+
+            # 调度器停止了超过一个租约有效期，重启后是另一个进程
+            with db.get_connection() as conn:
+                conn.execute("UPDATE executions SET lease_expires_at = '2000-01-01T00:00:00'")
+            with mock.patch.object(scheduler, "process_owner_id", return_value="host-99999"):
+                self.assertEqual(scheduler.adopt_leases(scheduler.dispatch_owner_id()), 1)
+                scheduler.recover_expired_leases()
+
+            self.assertEqual(db.get_execution(execution_id)["status"], "RUNNING")
+            self.assertEqual(db.get_task_by_id(task.id).status, "RUNNING")
+
+            result = {"returncode": 0, "stdout": "done\n", "stderr": "", "finished_at": "2030-01-01T00:00:00"}
+            future = scheduler.handle_result_event({
+                "type": "finished", "execution_id": execution_id, "task_id": task.id, "name": "t", "result": result,
+            })
+            self.assertEqual(future.result(5)["status"], "ACTIVE")
+        self.assertEqual(db.get_execution(execution_id)["stdout"], "done\n")
+
+    def test_local_executions_are_not_adopted_after_restart(self):
+        with mock.patch.object(scheduler, "DISPATCH_BACKEND", "local"):
+            self.assertEqual(scheduler.dispatch_owner_id(), scheduler.process_owner_id())
+        with mock.patch.object(scheduler, "DISPATCH_BACKEND", "sqlite"):
+            self.assertEqual(scheduler.dispatch_owner_id(), scheduler.scheduler_owner_id())
+
+
+if __name__ == '__main__':
+    unittest.main()
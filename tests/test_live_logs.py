@@ -0,0 +1,82 @@
+import json
+import sys
+import threading
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from common import db
+from common.auth import create_access_token
+from common.events import publish_execution_event, subscribe_execution, unsubscribe_execution
+from scheduler.scheduler import run_execution
+from db_case import TempDBTestCase
+
+
+def read_events(response) -> list[tuple[str, dict]]:
+    events, name = [], None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            name = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+
+class LiveLogTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TestClient(app)
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+    def claim(self, command):
+        task = db.create_task("t", "* * * * *", command)
+        return task, db.claim_tasks([task.id], "2024-01-01T00:00:00")[task.id]
+
+    def test_backlog_is_replayed_and_released_on_end(self):
+        publish_execution_event(901, {"type": "output", "stream": "stdout", "line": "early"})
+        received = []
+        backlog = subscribe_execution(901, received.append)
+        publish_execution_event(901, {"type": "end", "status": "SUCCESS"})
+        unsubscribe_execution(901, received.append)
+
+        self.assertEqual([e["line"] for e in backlog], ["early"])
+        self.assertEqual(received, [{"type": "end", "status": "SUCCESS"}])
+        self.assertEqual(subscribe_execution(901, received.append), [])
+        unsubscribe_execution(901, received.append)
+
+    def test_running_execution_streams_lines_as_produced(self):
+        command = f'"{sys.executable}" -u -c "import time; print(\'one\'); time.sleep(0.3); print(\'two\')"'
+        task, execution_id = self.claim(command)
+        runner = threading.Timer(0.2, run_execution, args=(task, execution_id))
+        runner.start()
+
+        started = time.monotonic()
+        with self.client.stream("GET", f"/api/executions/{execution_id}/stream", headers=self.headers) as r:
+            self.assertEqual(r.headers["content-type"].split(";")[0], "text/event-stream")
+            events = read_events(r)
+        runner.join()
+
+        self.assertLess(time.monotonic() - started, 2)   # 由事件推送结束，而不是等待状态轮询
+        self.assertEqual(events[0], ("status", {"type": "status", "status": "QUEUED"}))
+        self.assertIn(("status", {"type": "status", "status": "RUNNING"}), events)
+        self.assertEqual([e["line"] for name, e in events if name == "output"], ["one", "two"])
+        self.assertEqual(events[-1], ("end", {"type": "end", "status": "SUCCESS"}))
+
+    def test_finished_execution_replays_stored_output(self):
+        task, execution_id = self.claim("echo")
+        db.complete_execution(execution_id, task.id, False, "2024-01-01T00:00:01", stdout="a\nb\n", stderr="oops")
+
+        with self.client.stream("GET", f"/api/executions/{execution_id}/stream", headers=self.headers) as r:
+            events = read_events(r)
+        self.assertEqual(
+            [(e.get("stream"), e.get("line")) for name, e in events if name == "output"],
+            [("stdout", "a"), ("stdout", "b"), ("stderr", "oops")]
+        )
+        self.assertEqual(events[-1][1]["status"], "FAILED")
+        self.assertEqual(self.client.get("/api/executions/999/stream", headers=self.headers).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
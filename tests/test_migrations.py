@@ -0,0 +1,72 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from common import db
+from common.migrations import LATEST_VERSION, get_schema_version, migrate
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "scheduler.db"
+
+    def tearDown(self):
+        db.close_connections()
+        self._tmp.cleanup()
+
+    def test_fresh_database_reaches_latest_version(self):
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(migrate(conn), LATEST_VERSION)
+        self.assertEqual(get_schema_version(conn), LATEST_VERSION)
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        self.assertTrue({"force_run_at", "retry_count", "max_retries", "last_error"} <= columns)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({"idx_executions_task_id", "idx_executions_status_started",
+                         "idx_tasks_status", "idx_tasks_force_run_at"} <= indexes)
+        conn.close()
+
+    def test_upgrades_legacy_database_with_partial_columns(self):
+        # 旧版 init_db 已补齐部分字段，但从未记录版本号
+        conn = sqlite3.connect(self.path)
+        conn.execute("""CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+            cron TEXT NOT NULL, command TEXT NOT NULL, status TEXT NOT NULL, last_run_at TEXT,
+            created_at TEXT NOT NULL, force_run_at TEXT, retry_count INTEGER DEFAULT 0)""")
+        conn.execute("INSERT INTO tasks (name, cron, command, status, created_at) VALUES ('t', '* * * * *', 'echo', 'PENDING', 'now')")
+        conn.commit()
+
+        self.assertEqual(migrate(conn), LATEST_VERSION)
+        row = conn.execute("SELECT name, retry_count, max_retries, last_error FROM tasks").fetchone()
+        self.assertEqual(row, ("t", 0, 3, None))
+        conn.close()
+
+    def test_current_schema_is_not_touched(self):
+        conn = sqlite3.connect(self.path)
+        migrate(conn)
+        conn.execute("DROP INDEX idx_tasks_status")
+        conn.commit()
+        migrate(conn)  # 版本已是最新，不再执行任何迁移
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn("idx_tasks_status", indexes)
+        conn.close()
+
+    def test_execution_history_uses_index(self):
+        old_path = db.DB_PATH
+        db.DB_PATH = self.path
+        try:
+            db.init_db()
+            conn = db.get_connection()
+            plan = " ".join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM executions WHERE task_id = ? ORDER BY id DESC LIMIT 20", (1,)
+            ))
+            conn.close()
+        finally:
+            db.DB_PATH = old_path
+        self.assertIn("idx_executions_task_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
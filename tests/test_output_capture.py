@@ -0,0 +1,67 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from scheduler import output
+from scheduler.output import LineSplitter, OutputCapture, run_streaming
+
+
+class OutputCaptureTest(unittest.TestCase):
+    def test_small_output_kept_verbatim(self):
+        capture = OutputCapture(head_bytes=16, tail_bytes=16)
+        capture.write(b"hello ")
+        capture.write(b"world\r\n")
+        self.assertEqual(capture.getvalue(), "hello world\n")
+        self.assertEqual(capture.truncated_bytes, 0)
+
+    def test_keeps_head_and_tail_within_bound(self):
+        capture = OutputCapture(head_bytes=4, tail_bytes=4)
+        for i in range(1000):
+            capture.write(f"{i:04d}".encode())
+        self.assertEqual(capture.total_bytes, 4000)
+        self.assertEqual(len(capture._head) + len(capture._tail), 8)
+        self.assertEqual(capture.getvalue(), "0000\n... [已截断 3992 字节] ...\n0999")
+
+    def test_spool_file_receives_full_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spool = Path(tmp) / "sub" / "1.stdout"
+            capture = OutputCapture(head_bytes=2, tail_bytes=2, spool_path=spool)
+            capture.write(b"abcdef")
+            capture.close()
+            self.assertEqual(spool.read_bytes(), b"abcdef")
+            self.assertEqual(capture.getvalue(), "ab\n... [已截断 2 字节] ...\nef")
+
+
+class RunStreamingTest(unittest.TestCase):
+    def test_large_output_is_truncated(self):
+        command = f'"{sys.executable}" -c "import sys; sys.stdout.write(\'x\' * 500000); sys.stderr.write(\'err\'); sys.exit(3)"'
+        with tempfile.TemporaryDirectory() as tmp, patch.object(output, "OUTPUT_SPOOL_DIR", tmp):
+            returncode, stdout, stderr = run_streaming(command, spool_name="42")
+            self.assertEqual(returncode, 3)
+            self.assertEqual(stderr, "err")
+            self.assertIn("[已截断", stdout)
+            self.assertLess(len(stdout), 200000)
+            self.assertEqual((Path(tmp) / "42.stdout").stat().st_size, 500000)
+
+    def test_line_splitter_handles_chunk_boundaries(self):
+        lines = []
+        splitter = LineSplitter(lines.append)
+        data = "第一行\r\nsecond\n未结束".encode()
+        for i in range(len(data)):
+            splitter.feed(data[i:i + 1])
+        self.assertEqual(lines, ["第一行", "second"])
+        splitter.close()
+        self.assertEqual(lines, ["第一行", "second", "未结束"])
+
+    def test_run_streaming_reports_lines_per_stream(self):
+        seen = []
+        command = f'"{sys.executable}" -c "import sys; print(1); print(2); sys.stderr.write(\'e\')"'
+        run_streaming(command, on_output=lambda stream, line: seen.append((stream, line)))
+        self.assertEqual([l for s, l in seen if s == "stdout"], ["1", "2"])
+        self.assertEqual([l for s, l in seen if s == "stderr"], ["e"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from common import db
+from common.compression import decode_output, encode_output
+from scheduler.retention import RetentionService
+from db_case import TempDBTestCase
+
+
+class OutputCompressionTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = db.create_task("t", "* * * * *", "echo")
+
+    def raw_row(self, execution_id):
+        with db.get_connection() as conn:
+            return dict(conn.execute("SELECT stdout, stderr, output_codec FROM executions WHERE id = ?", (execution_id,)).fetchone())
+
+    def test_round_trip_and_small_outputs_stay_text(self):
+        text = "第 1 行 progress 50%\n" * 1000
+        blob = encode_output(text, "zlib")
+        self.assertIsInstance(blob, bytes)
+        self.assertLess(len(blob) * 10, len(text.encode()))
+        self.assertEqual(decode_output(blob, "zlib"), text)
+        self.assertEqual(encode_output("hi\n", "zlib"), "hi\n")
+        self.assertEqual(decode_output("hi\n", "zlib"), "hi\n")
+
+    def test_completed_execution_is_stored_compressed_and_read_back(self):
+        ids = db.claim_tasks([self.task.id], "2024-01-01T00:00:00")
+        execution_id = ids[self.task.id]
+        stdout = "line\n" * 5000
+        db.complete_execution(execution_id, self.task.id, True, "2024-01-01T00:00:01", stdout, "warn\n", None)
+
+        row = self.raw_row(execution_id)
+        self.assertEqual(row["output_codec"], "zlib")
+        self.assertIsInstance(row["stdout"], bytes)
+        self.assertEqual(row["stderr"], "warn\n")
+
+        execution = db.get_execution(execution_id)
+        self.assertEqual((execution["stdout"], execution["stderr"]), (stdout, "warn\n"))
+        self.assertNotIn("output_codec", execution)
+        self.assertEqual(db.list_executions_by_task(self.task.id)[0]["stdout"], stdout)
+
+    def test_legacy_rows_are_compressed_in_background(self):
+        with db.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO executions (task_id, status, started_at, stdout) VALUES (?, ?, ?, ?)",
+                [(self.task.id, "SUCCESS", "2024-01-01", "old output\n" * 500)] * 3
+                + [(self.task.id, "RUNNING", "2024-01-01", None)]
+            )
+
+        service = RetentionService(keep_last=0)
+        self.assertEqual(service.compress_outputs(batch=2), 3)
+        self.assertEqual(service.compress_outputs(batch=2), 0)
+
+        self.assertIsInstance(self.raw_row(1)["stdout"], bytes)
+        self.assertIsNone(self.raw_row(4)["output_codec"])
+        self.assertEqual(db.get_execution(1)["stdout"], "old output\n" * 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import itertools
+import os
+import time
+import unittest
+import uuid
+
+from common.dispatch import RedisStream, RedisDispatchQueue
+
+
+class StreamStandIn:
+    """进程内 Redis Stream 替身，只实现分发队列用到的命令；设置 REDIS_TEST_URL 时改用真实 redis-server"""
+
+    def __init__(self):
+        self.streams = {}   # key -> {id: fields}
+        self.groups = {}    # (key, group) -> {"last": int, "pending": {id: [consumer, delivered_at]}}
+        self._ids = itertools.count(1)
+
+    def xgroup_create(self, key, group, id="0", mkstream=False):
+        if (key, group) in self.groups:
+            raise Exception("BUSYGROUP Consumer Group name already exists")
+        self.streams.setdefault(key, {})
+        self.groups[(key, group)] = {"last": 0, "pending": {}}
+
+    def xadd(self, key, fields):
+        message_id = f"{next(self._ids)}-0"
+        self.streams.setdefault(key, {})[message_id] = dict(fields)
+        return message_id
+
+    def xreadgroup(self, group, consumer, streams, count=1, block=None):
+        result = []
+        for key in streams:
+            state = self.groups[(key, group)]
+            messages = []
+            for message_id, fields in self.streams[key].items():
+                seq = int(message_id.split("-")[0])
+                if seq > state["last"] and len(messages) < count:
+                    state["last"] = seq
+                    state["pending"][message_id] = [consumer, time.monotonic()]
+                    messages.append((message_id, fields))
+            if messages:
+                result.append([key, messages])
+        return result
+
+    def xautoclaim(self, key, group, consumer, min_idle_time, start_id="0-0", count=1):
+        state = self.groups[(key, group)]
+        now = time.monotonic()
+        claimed = []
+        for message_id, entry in state["pending"].items():
+            if (now - entry[1]) * 1000 >= min_idle_time and len(claimed) < count:
+                entry[0], entry[1] = consumer, now
+                claimed.append((message_id, self.streams[key].get(message_id)))
+        return ["0-0", claimed, []]
+
+    def xclaim(self, key, group, consumer, min_idle_time, message_ids, justid=False):
+        state = self.groups[(key, group)]
+        for message_id in message_ids:
+            if message_id in state["pending"]:
+                state["pending"][message_id] = [consumer, time.monotonic()]
+        return message_ids
+
+    def xack(self, key, group, *message_ids):
+        pending = self.groups[(key, group)]["pending"]
+        return sum(1 for m in message_ids if pending.pop(m, None) is not None)
+
+    def xdel(self, key, *message_ids):
+        return sum(1 for m in message_ids if self.streams[key].pop(m, None) is not None)
+
+    def xpending(self, key, group):
+        return {"pending": len(self.groups[(key, group)]["pending"])}
+
+
+def make_client():
+    url = os.getenv("REDIS_TEST_URL")
+    if url:
+        import redis
+        return redis.Redis.from_url(url, decode_responses=True)
+    return StreamStandIn()
+
+
+class RedisStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.client = make_client()
+        self.key = f"test:{uuid.uuid4().hex}"
+
+    def test_push_claim_ack(self):
+        stream = RedisStream(self.client, self.key, "workers", visibility_timeout=30)
+        stream.push({"execution_id": 1})
+        stream.push({"execution_id": 2})
+
+        message_id, payload = stream.claim("w1", block_ms=10)
+        self.assertEqual(payload, {"execution_id": 1})
+        self.assertEqual(stream.claim("w2", block_ms=10)[1], {"execution_id": 2})
+        self.assertIsNone(stream.claim("w3", block_ms=10))
+        self.assertEqual(stream.pending_count(), 2)
+
+        stream.ack(message_id)
+        self.assertEqual(stream.pending_count(), 1)
+
+    def test_unacked_message_is_reclaimed_after_visibility_timeout(self):
+        stream = RedisStream(self.client, self.key, "workers", visibility_timeout=0.05)
+        stream.push({"execution_id": 7})
+        message_id, _ = stream.claim("dead-worker", block_ms=10)
+
+        self.assertIsNone(stream.claim("w2", block_ms=10))
+        time.sleep(0.1)
+        reclaimed = stream.claim("w2", block_ms=10)
+        self.assertEqual(reclaimed, (message_id, {"execution_id": 7}))
+
+    def test_renew_keeps_message_invisible(self):
+        stream = RedisStream(self.client, self.key, "workers", visibility_timeout=0.2)
+        stream.push({"execution_id": 9})
+        message_id, _ = stream.claim("w1", block_ms=10)
+
+        for _ in range(3):
+            time.sleep(0.1)
+            stream.renew(message_id, "w1")
+            self.assertIsNone(stream.claim("w2", block_ms=10))
+
+    def test_dispatch_queue_round_trip(self):
+        queue = RedisDispatchQueue(self.client, prefix=self.key, visibility_timeout=30)
+        queue.push_job(3, 1, "t", "echo hi")
+        message_id, job = queue.jobs.claim("w1", block_ms=10)
+        self.assertEqual(job["command"], "echo hi")
+
+        queue.push_started(3, "w1")
+        queue.push_finished(3, 1, "t", "w1", {"returncode": 0})
+        queue.jobs.ack(message_id)
+
+        events = [queue.results.claim("scheduler", block_ms=10)[1] for _ in range(2)]
+        self.assertEqual([e["type"] for e in events], ["started", "finished"])
+        self.assertEqual(events[1]["result"], {"returncode": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
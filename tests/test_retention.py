@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from common import db
+from scheduler import output, retention
+from scheduler.retention import RetentionService, trim_task
+from db_case import TempDBTestCase
+
+
+class RetentionTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2024, 6, 1)
+
+    def add_executions(self, task_id, count, status="SUCCESS", days_ago=0, stdout="x"):
+        started = (self.now - timedelta(days=days_ago)).isoformat()
+        with db.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO executions (task_id, status, started_at, stdout) VALUES (?, ?, ?, ?)",
+                [(task_id, status, started, stdout)] * count
+            )
+
+    def remaining(self, task_id):
+        with db.get_connection() as conn:
+            return [r[0] for r in conn.execute("SELECT id FROM executions WHERE task_id = ? ORDER BY id", (task_id,))]
+
+    def test_trim_task_deletes_in_chunks_and_keeps_unfinished(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        self.add_executions(task.id, 1, status="RUNNING")
+        self.add_executions(task.id, 25)
+
+        self.assertEqual(trim_task(task.id, keep_last=5, chunk_size=4), 20)
+        self.assertEqual(self.remaining(task.id), [1, 22, 23, 24, 25, 26])
+
+    def test_service_applies_global_and_per_task_policies(self):
+        a = db.create_task("a", "* * * * *", "echo")
+        b = db.create_task("b", "* * * * *", "echo")
+        self.add_executions(a.id, 3, days_ago=10)
+        self.add_executions(a.id, 3)
+        self.add_executions(b.id, 3, days_ago=10)
+        self.add_executions(b.id, 3)
+        db.set_retention_policy(b.id, keep_last=2, max_age_days=30)
+
+        service = RetentionService(keep_last=5, max_age_days=7, compact_interval=3600)
+        retention_now = self.now
+        original = retention.datetime
+
+        class FixedDatetime(datetime):
+            @classmethod
+            def utcnow(cls):
+                return retention_now
+        retention.datetime = FixedDatetime
+        try:
+            result = service.run_once()
+        finally:
+            retention.datetime = original
+
+        self.assertEqual(self.remaining(a.id), [4, 5, 6])   # 全局：7 天内
+        self.assertEqual(self.remaining(b.id), [11, 12])    # 单独：最近 2 条，30 天内
+        self.assertEqual(result["deleted"], {"keep_last": 5, "max_age": 2, "max_bytes": 0})
+
+    def test_max_bytes_budget_keeps_newest(self):
+        a = db.create_task("a", "* * * * *", "echo")
+        b = db.create_task("b", "* * * * *", "echo")
+        self.add_executions(a.id, 4, stdout="x" * 100)
+        self.add_executions(b.id, 4, stdout="x" * 100)
+
+        RetentionService(keep_last=0, max_bytes=350).run_once()
+        self.assertEqual(self.remaining(a.id), [])
+        self.assertEqual(self.remaining(b.id), [6, 7, 8])
+
+        db.set_retention_policy(b.id, max_bytes=150)
+        RetentionService(keep_last=0).run_once()
+        self.assertEqual(self.remaining(b.id), [8])
+
+    def test_output_bytes_tracked_by_triggers(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        self.add_executions(task.id, 3, stdout="x" * 100)
+        self.assertEqual(retention.output_bytes(task.id), 300)
+
+        with db.get_connection() as conn:
+            conn.execute("UPDATE executions SET stdout = 'y', error = 'boom' WHERE id = 1")
+            conn.execute("DELETE FROM executions WHERE id = 2")
+        self.assertEqual(retention.output_bytes(task.id), 105)
+        self.assertEqual(retention.output_bytes(), 105)
+
+        with mock.patch.object(retention, "get_connection", wraps=db.get_connection) as connections:
+            self.assertEqual(retention.trim_by_bytes(None, 200), 0)
+        self.assertEqual(connections.call_count, 1)   # 未超出预算：只读一次计数
+
+    def test_deleted_executions_remove_spool_files(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        self.add_executions(task.id, 3)
+        spool_dir = self.tmp_dir / "spool"
+        with mock.patch.object(output, "OUTPUT_SPOOL_DIR", str(spool_dir)):
+            spool_dir.mkdir()
+            for execution_id in (1, 2, 3):
+                for path in output.spool_paths(str(execution_id)):
+                    path.write_text("full output")
+
+            self.assertEqual(trim_task(task.id, keep_last=1), 2)
+
+        self.assertEqual(sorted(p.name for p in spool_dir.iterdir()), ["3.stderr", "3.stdout"])
+
+    def test_policy_removed_with_task(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        db.set_retention_policy(task.id, keep_last=3)
+        self.assertEqual(db.get_retention_policy(task.id), {"keep_last": 3, "max_age_days": None, "max_bytes": None})
+        with db.get_connection() as conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+        self.assertEqual(db.list_retention_policies(), {})
+
+    def test_compact_reclaims_free_pages(self):
+        task = db.create_task("t", "* * * * *", "echo")
+        self.add_executions(task.id, 2000, stdout="x" * 2000)
+        trim_task(task.id, keep_last=0)
+        self.assertGreater(retention.compact(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from common import db
+from common.task_cache import TaskCache
+from db_case import TempDBTestCase
+
+
+class TaskCacheTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = TaskCache(ttl=3600)
+
+    def external_write(self, sql, params=()):
+        """模拟其他进程的写入：不发布本进程的变更通知"""
+        with db.get_connection() as conn:
+            conn.execute(sql, params)
+
+    def test_unchanged_reads_are_served_from_snapshot(self):
+        db.create_task("a", "* * * * *", "echo")
+        first = self.cache.list_tasks()
+        version = self.cache.version()
+        self.assertIs(self.cache.list_tasks(), first)
+        self.assertEqual(self.cache.version(), version)
+        self.assertEqual(self.cache.stats()["full_reloads"], 1)
+
+    def test_notification_triggers_incremental_refresh(self):
+        a = db.create_task("a", "* * * * *", "echo")
+        b = db.create_task("b", "* * * * *", "echo")
+        self.cache.list_tasks()
+
+        db.update_task(a.id, name="a2")
+        self.cache.invalidate([a.id])
+        self.external_write("DELETE FROM tasks WHERE id = ?", (b.id,))
+        self.cache.invalidate([b.id])
+
+        self.assertEqual([t.name for t in self.cache.list_tasks()], ["a2"])
+        self.assertEqual(self.cache.stats()["full_reloads"], 1)
+        self.assertEqual(self.cache.stats()["incremental_refreshes"], 1)
+
+    def test_other_process_writes_visible_after_ttl(self):
+        task = db.create_task("a", "* * * * *", "echo")
+        self.cache.list_tasks()
+        self.external_write("UPDATE tasks SET status = 'PAUSED' WHERE id = ?", (task.id,))
+
+        self.assertEqual(self.cache.get(task.id).status, "PENDING")   # 未通知、未到 ttl
+        self.cache.ttl = 0
+        self.assertEqual(self.cache.get(task.id).status, "PAUSED")
+
+    def test_pruned_change_log_falls_back_to_full_reload(self):
+        db.create_task("a", "* * * * *", "echo")
+        self.cache.list_tasks()
+        for i in range(5):
+            db.create_task(f"n{i}", "* * * * *", "echo")
+        db.prune_task_changes(keep=2)
+        self.cache.invalidate()
+
+        self.assertEqual(len(self.cache.list_tasks()), 6)
+        self.assertEqual(self.cache.stats()["full_reloads"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
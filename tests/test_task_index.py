@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+
+from common.models import Task
+from scheduler.task_index import TaskIndex
+from scheduler.scheduler import get_fire_time
+
+
+def make_task(**kwargs):
+    fields = dict(
+        id=1, name="t", cron="*/5 * * * *", command="echo hi", status="PENDING",
+        last_run_at=None, created_at="2024-01-01T00:00:00"
+    )
+    fields.update(kwargs)
+    return Task(**fields)
+
+
+class TaskIndexTest(unittest.TestCase):
+    def test_pop_due_only_returns_due_tasks(self):
+        base = datetime(2024, 1, 1)
+        index = TaskIndex()
+        index.rebuild([(1, base + timedelta(minutes=1)), (2, base + timedelta(minutes=5)), (3, base)])
+
+        self.assertEqual(index.peek(), base)
+        self.assertEqual(index.pop_due(base + timedelta(minutes=1)), [3, 1])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.peek(), base + timedelta(minutes=5))
+
+    def test_push_replaces_and_remove_drops_entry(self):
+        base = datetime(2024, 1, 1)
+        index = TaskIndex()
+        index.push(1, base)
+        index.push(1, base + timedelta(hours=1))
+        index.push(2, base)
+        index.remove(2)
+
+        self.assertEqual(index.pop_due(base + timedelta(minutes=30)), [])
+        self.assertEqual(index.pop_due(base + timedelta(hours=1)), [1])
+        self.assertIsNone(index.peek())
+
+    def test_compacts_stale_entries(self):
+        base = datetime(2024, 1, 1)
+        index = TaskIndex()
+        for i in range(1000):
+            index.push(1, base + timedelta(seconds=i))
+        self.assertLess(len(index._heap), 100)
+        self.assertEqual(index.pop_due(base + timedelta(days=1)), [1])
+
+
+class FireTimeTest(unittest.TestCase):
+    def test_cron_fire_time_from_base(self):
+        task = make_task(last_run_at="2024-01-01T00:02:00")
+        self.assertEqual(get_fire_time(task), datetime(2024, 1, 1, 0, 5))
+
+    def test_force_run_takes_precedence(self):
+        task = make_task(cron="0 0 1 1 *", force_run_at="2024-01-01T00:00:30")
+        self.assertEqual(get_fire_time(task), datetime(2024, 1, 1, 0, 0, 30))
+
+    def test_running_task_not_indexed_in_local_mode(self):
+        # 执行完成会通知索引，失联由租约回收处理
+        task = make_task(status="RUNNING", last_run_at="2024-01-01T00:00:00")
+        self.assertIsNone(get_fire_time(task))
+
+    def test_paused_and_failed_invalid_cron_not_indexed(self):
+        self.assertIsNone(get_fire_time(make_task(status="PAUSED")))
+        self.assertIsNone(get_fire_time(make_task(status="FAILED", cron="bad cron")))
+        self.assertIsNotNone(get_fire_time(make_task(status="PENDING", cron="bad cron")))
+
+
+if __name__ == '__main__':
+    unittest.main()
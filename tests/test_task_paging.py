@@ -0,0 +1,102 @@
+import json
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import api.main
+from api.main import app, templates
+from common import db
+from common.auth import create_access_token
+from db_case import TempDBTestCase
+
+
+class TaskPagingTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            db.create_task(f"t{i}", "* * * * *", "echo")
+
+    def ids(self, tasks):
+        return [t.id for t in tasks]
+
+    def test_keyset_pages_walk_forward_and_back(self):
+        page1, more = db.list_tasks_page(limit=3)
+        self.assertEqual((self.ids(page1), more), ([7, 6, 5], True))
+        page2, more = db.list_tasks_page(after=5, limit=3)
+        self.assertEqual((self.ids(page2), more), ([4, 3, 2], True))
+        page3, more = db.list_tasks_page(after=2, limit=3)
+        self.assertEqual((self.ids(page3), more), ([1], False))
+
+        back, more = db.list_tasks_page(before=4, limit=3)
+        self.assertEqual((self.ids(back), more), ([7, 6, 5], False))
+
+    def test_ascending_pages_with_status_filter(self):
+        db.update_tasks_fields({2: {"status": "PAUSED"}, 5: {"status": "PAUSED"}, 6: {"status": "PAUSED"}})
+        page, more = db.list_tasks_page(status="PAUSED", limit=2, descending=False)
+        self.assertEqual((self.ids(page), more), ([2, 5], True))
+        page, more = db.list_tasks_page(status="PAUSED", after=5, limit=2, descending=False)
+        self.assertEqual((self.ids(page), more), ([6], False))
+
+    def test_counters_follow_inserts_updates_and_deletes(self):
+        self.assertEqual(db.count_tasks(), 7)
+        db.update_tasks_fields({1: {"status": "PAUSED"}, 2: {"status": "PAUSED"}})
+        db.update_tasks_fields({1: {"status": "PAUSED", "last_error": "x"}})
+        self.assertEqual((db.count_tasks("PAUSED"), db.count_tasks("PENDING")), (2, 5))
+
+        conn = db.get_connection()
+        conn.execute("DELETE FROM tasks WHERE id IN (1, 3)")
+        conn.commit()
+        conn.close()
+        self.assertEqual((db.count_tasks(), db.count_tasks("PAUSED"), db.count_tasks("RUNNING")), (5, 1, 0))
+
+    def test_json_tasks_pagination_headers(self):
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+        r = client.get("/tasks", params={"limit": 4}, headers=headers)
+        self.assertEqual([t["id"] for t in r.json()], [1, 2, 3, 4])
+        self.assertEqual(r.headers["X-Next-Cursor"], "4")
+        self.assertEqual(r.headers["X-Total-Count"], "7")
+
+        r = client.get("/tasks", params={"limit": 4, "cursor": 4}, headers=headers)
+        self.assertEqual([t["id"] for t in r.json()], [5, 6, 7])
+        self.assertNotIn("X-Next-Cursor", r.headers)
+
+        r = client.get("/tasks", headers=headers)
+        self.assertEqual(len(r.json()), 7)
+
+    def test_ndjson_export_streams_batches_with_projection(self):
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+        db.update_task(3, name="第三个")
+
+        with mock.patch.object(api.main, "EXPORT_BATCH_SIZE", 2):
+            r = client.get("/tasks", params={"format": "ndjson", "fields": "id,name"}, headers=headers)
+            self.assertEqual(r.headers["content-type"], "application/x-ndjson")
+            rows = [json.loads(line) for line in r.text.splitlines()]
+            self.assertEqual([row["id"] for row in rows], list(range(1, 8)))
+            self.assertEqual(rows[2], {"id": 3, "name": "第三个"})
+
+            r = client.get("/tasks", params={"cursor": 2, "limit": 3},
+                           headers={**headers, "Accept": "application/x-ndjson"})
+            rows = [json.loads(line) for line in r.text.splitlines()]
+            self.assertEqual([row["id"] for row in rows], [3, 4, 5])
+            self.assertEqual(set(rows[0]), set(db.TASK_FIELDS))
+
+        r = client.get("/tasks", params={"format": "ndjson", "fields": "id,password"}, headers=headers)
+        self.assertEqual(r.status_code, 400)
+
+    def test_tasks_template_renders_cursor_links(self):
+        tasks, _ = db.list_tasks_page(limit=2)
+        html = templates.get_template("tasks.html").render(
+            request=None, tasks=tasks, query="", status_filter="", page=1, total_pages=None,
+            total=db.count_tasks(), prev_cursor=None, next_cursor=tasks[-1].id, paged=False
+        )
+        self.assertIn("after=6", html)
+        self.assertNotIn("before=", html)
+        self.assertIn("共 <strong>7</strong> 个任务", html)
+
+
+if __name__ == '__main__':
+    unittest.main()
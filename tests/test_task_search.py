@@ -0,0 +1,68 @@
+import unittest
+
+from common import db
+from db_case import TempDBTestCase
+
+
+class TaskSearchTest(TempDBTestCase):
+    def names(self, query, **kwargs):
+        tasks, total = db.search_tasks(query=query, **kwargs)
+        self.assertEqual(total, len(tasks))
+        return [t.name for t in tasks]
+
+    def test_prefix_and_token_queries(self):
+        db.create_task("backup database", "* * * * *", "pg_dump prod > /tmp/prod.sql")
+        db.create_task("cleanup logs", "* * * * *", "find /var/log -mtime +7 -delete")
+        db.create_task("report", "* * * * *", "python backup_report.py")
+
+        self.assertEqual(self.names("clean"), ["cleanup logs"])
+        self.assertEqual(self.names("var log"), ["cleanup logs"])
+        self.assertEqual(self.names("nothing"), [])
+
+    def test_name_hits_rank_above_command_hits(self):
+        db.create_task("report", "* * * * *", "python backup_report.py")
+        db.create_task("backup database", "* * * * *", "pg_dump prod")
+        self.assertEqual(self.names("backup"), ["backup database", "report"])
+
+    def test_index_follows_updates_and_deletes(self):
+        task = db.create_task("alpha", "* * * * *", "echo one")
+        db.update_task(task.id, name="beta")
+        self.assertEqual(self.names("alpha"), [])
+        self.assertEqual(self.names("beta"), ["beta"])
+
+        conn = db.get_connection()
+        conn.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.names("beta"), [])
+
+    def test_status_filter_and_paging(self):
+        for i in range(5):
+            db.create_task(f"job {i}", "* * * * *", "echo")
+        db.update_tasks_fields({1: {"status": "PAUSED"}})
+
+        self.assertEqual(self.names("job", status="PAUSED"), ["job 0"])
+        tasks, total = db.search_tasks(query="job", limit=2, offset=2)
+        self.assertEqual((len(tasks), total), (2, 5))
+
+    def test_punctuation_only_query_falls_back_to_like(self):
+        db.create_task("pipe", "* * * * *", "ls | wc -l")
+        db.create_task("plain", "* * * * *", "echo")
+        self.assertIsNone(db.fts_query(" | "))
+        self.assertEqual(self.names("|"), ["pipe"])
+
+    def test_cjk_substring_queries(self):
+        db.create_task("每日备份", "* * * * *", "echo 数据库备份完成")
+        db.create_task("清理日志", "* * * * *", "echo")
+
+        self.assertEqual(self.names("备份"), ["每日备份"])        # 两个字符：LIKE
+        self.assertEqual(self.names("数据库"), ["每日备份"])      # 三个字符以上：trigram 子串
+        self.assertEqual(self.names("日备份"), ["每日备份"])
+        self.assertEqual(self.names("日志 清理"), ["清理日志"])
+        self.assertEqual(self.names("备份 日志"), [])
+        self.assertEqual(db.fts_query("数据库 备份", trigram=True), None)
+        self.assertEqual(db.fts_query("数据库", trigram=True), '"数据库"')
+
+
+if __name__ == '__main__':
+    unittest.main()
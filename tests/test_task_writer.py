@@ -0,0 +1,113 @@
+import time
+import unittest
+from unittest import mock
+
+from common import db
+from common import writer
+from scheduler import scheduler
+from db_case import TempDBTestCase
+
+
+class TaskStateWriterTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = writer.TaskStateWriter(flush_interval=0.01)
+
+    def test_updates_are_merged_per_task_and_flushed_in_one_batch(self):
+        t1 = db.create_task("a", "* * * * *", "echo")
+        t2 = db.create_task("b", "* * * * *", "echo")
+
+        calls = []
+        real = writer.update_tasks_fields
+
+        def spy(updates):
+            calls.append({k: dict(v) for k, v in updates.items()})
+            real(updates)
+
+        with mock.patch.object(writer, "update_tasks_fields", spy):
+            self.writer.update(t1.id, status="FAILED")
+            self.writer.update(t1.id, last_error="boom", status="PAUSED")
+            self.writer.update(t2.id, force_run_at=None)
+            self.writer.flush()
+
+        self.assertEqual(calls, [{t1.id: {"status": "PAUSED", "last_error": "boom"}, t2.id: {"force_run_at": None}}])
+        task = db.get_task_by_id(t1.id)
+        self.assertEqual((task.status, task.last_error), ("PAUSED", "boom"))
+
+    def test_background_thread_flushes(self):
+        task = db.create_task("a", "* * * * *", "echo")
+        self.writer.update(task.id, status="FAILED")
+        deadline = time.time() + 2
+        while db.get_task_by_id(task.id).status != "FAILED" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(db.get_task_by_id(task.id).status, "FAILED")
+        self.assertEqual(self.writer.pending_count(), 0)
+
+    def test_bad_update_does_not_block_others(self):
+        task = db.create_task("a", "* * * * *", "echo")
+        self.writer.update(task.id, status="FAILED")
+        self.writer.update(999, name="not allowed")
+        self.writer.flush()
+        self.assertEqual(db.get_task_by_id(task.id).status, "FAILED")
+        self.assertEqual(self.writer.pending_count(), 0)
+
+
+class ExecutionWriterTest(TempDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = writer.ExecutionWriter(delay=0.05)
+        ids = db.create_tasks([(f"t{i}", "* * * * *", "echo") for i in range(3)])
+        self.executions = db.claim_tasks(ids, "2024-01-01T00:00:00")
+
+    def tearDown(self):
+        self.writer.fence()
+
+    def test_concurrent_writes_share_one_transaction(self):
+        batches = []
+        real = writer.write_execution_batch
+
+        def spy(ops):
+            batches.append([op for op, _ in ops])
+            return real(ops)
+
+        with mock.patch.object(writer, "write_execution_batch", spy):
+            futures = [self.writer.mark_running(e) for e in self.executions.values()]
+            futures += [
+                self.writer.complete(e, task_id, task_id != 2, "2024-01-01T00:00:01", stdout="ok\n")
+                for task_id, e in self.executions.items()
+            ]
+            self.writer.fence()
+
+        self.assertEqual(batches, [["running"] * 3 + ["complete"] * 3])
+        self.assertEqual([f.result()["status"] for f in futures[3:]], ["ACTIVE", "PENDING", "ACTIVE"])
+        execution = db.get_execution(self.executions[1])
+        self.assertEqual((execution["status"], execution["stdout"]), ("SUCCESS", "ok\n"))
+
+    def test_failed_write_only_fails_its_own_future(self):
+        good = self.writer.complete(self.executions[1], 1, True, "2024-01-01T00:00:01")
+        bad = self.writer.mark_running([self.executions[2]])   # 参数类型错误
+        self.writer.fence()
+
+        self.assertEqual(good.result()["status"], "ACTIVE")
+        self.assertIsNotNone(bad.exception())
+        self.assertEqual(self.writer.stats()["pending"], 0)
+
+    def test_redelivered_finished_event_counts_one_retry(self):
+        execution_id = self.executions[2]
+        event = {
+            "type": "finished", "execution_id": execution_id, "task_id": 2, "name": "t1",
+            "result": {"returncode": 1, "stdout": "", "stderr": "boom", "finished_at": "2024-01-01T00:00:01"},
+        }
+        with mock.patch.object(scheduler, "execution_writer", self.writer):
+            first = scheduler.handle_result_event(event)
+            self.assertTrue(self.writer.has_pending_complete(execution_id))
+            self.assertIsNone(scheduler.handle_result_event(dict(event)))   # 第一次的结果仍在队列中
+            self.writer.fence()
+            self.assertIsNone(scheduler.handle_result_event(dict(event)))   # 已落库
+
+        self.assertEqual(first.result()["retry_count"], 1)
+        self.assertEqual(db.get_task_by_id(2).retry_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from common import db
+from common.writer import execution_writer
+from worker import worker
+from db_case import TempDBTestCase
+
+
+class ClaimExecutionTest(TempDBTestCase):
+    def test_claims_oldest_queued_execution_once(self):
+        task = db.create_task("t", "* * * * *", "echo hi")
+        first = db.create_execution(task.id, "2024-01-01T00:00:00", "QUEUED")
+        second = db.create_execution(task.id, "2024-01-01T00:01:00", "QUEUED")
+
+        execution, claimed_task = db.claim_execution("w1")
+        self.assertEqual(execution["id"], first)
+        self.assertEqual(execution["status"], "RUNNING")
+        self.assertEqual(execution["worker_id"], "w1")
+        self.assertEqual(claimed_task.id, task.id)
+
+        execution, _ = db.claim_execution("w2")
+        self.assertEqual(execution["id"], second)
+        self.assertIsNone(db.claim_execution("w3"))
+
+    def test_execution_of_deleted_task_is_failed(self):
+        task = db.create_task("t", "* * * * *", "echo hi")
+        execution_id = db.create_execution(task.id, None, "QUEUED")
+        conn = db.get_connection()
+        conn.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+        conn.commit()
+        conn.close()
+
+        self.assertIsNone(db.claim_execution("w1"))
+        self.assertEqual(db.get_execution(execution_id)["status"], "FAILED")
+
+    def test_unexpected_error_fails_execution_and_worker_continues(self):
+        task = db.create_task("t", "* * * * *", "echo hi")
+        db.create_execution(task.id, "2024-01-01T00:00:00", "QUEUED")
+        execution, claimed_task = db.claim_execution("w1")
+
+        with mock.patch.object(worker, "run_execution", side_effect=RuntimeError("database is locked")):
+            worker.run_claimed("w1", claimed_task, execution["id"])
+        execution_writer.fence()
+
+        failed = db.get_execution(execution["id"])
+        self.assertEqual(failed["status"], "FAILED")
+        self.assertIn("database is locked", failed["error"])
+        self.assertEqual(db.get_task_by_id(task.id).retry_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
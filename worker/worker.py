@@ -0,0 +1,135 @@
+"""
+独立 worker：以多个操作系统进程运行，领取 QUEUED 执行并执行
+- sqlite 模式：从本机数据库原子领取执行记录，直接写回结果
+- redis 模式：从 Redis 流领取任务，可部署在多台机器上，不访问 SQLite，结果通过 Redis 回传调度器
+调度器需以相同的 DISPATCH_BACKEND 启动，只负责生成执行记录
+
+用法：python -m worker.worker --processes 4 [--backend redis]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime
+
+from common.db import init_db, claim_execution
+from common.dispatch import get_dispatch_queue
+from common.heartbeat import Heartbeat, process_owner_id
+from common.models import Task
+from scheduler.scheduler import run_execution, run_command, record_result, lease_deadline, start_lease_keeper
+from config import logger, DISPATCH_BACKEND, REDIS_VISIBILITY_TIMEOUT
+
+# 没有待执行记录时的轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+
+def worker_loop(poll_interval: float = POLL_INTERVAL):
+    """单个 worker 进程的主循环：领取（取得租约）-> 执行（心跳续期）-> 写回结果"""
+    worker_id = process_owner_id()
+    start_lease_keeper(worker_id)
+    logger.info(f"worker {worker_id} 已启动")
+
+    while True:
+        try:
+            claimed = claim_execution(worker_id, lease_deadline())
+        except Exception as e:
+            logger.error(f"worker {worker_id} 领取执行记录失败: {e}", exc_info=True)
+            claimed = None
+
+        if claimed is None:
+            time.sleep(poll_interval)
+            continue
+
+        execution, task = claimed
+        logger.info(f"worker {worker_id} 领取执行记录 {execution['id']} (任务 {task.id})")
+        run_claimed(worker_id, task, execution["id"])
+
+
+def run_claimed(worker_id: str, task: Task, execution_id: int):
+    """执行一条已领取的记录；意外异常时把执行记为失败，worker 继续轮询"""
+    try:
+        run_execution(task, execution_id)
+    except Exception as e:
+        logger.error(f"worker {worker_id} 处理执行记录 {execution_id} 失败: {e}", exc_info=True)
+        try:
+            record_result(task.id, task.name, execution_id, {
+                "returncode": None,
+                "stdout": None,
+                "stderr": None,
+                "error": f"worker error: {e}",
+                "finished_at": datetime.utcnow().isoformat(),
+            })
+        except Exception as e:
+            # 结果写不进去时保持 RUNNING，由租约过期回收
+            logger.error(f"worker {worker_id} 记录执行记录 {execution_id} 失败结果失败: {e}", exc_info=True)
+
+
+def redis_worker_loop(poll_interval: float = POLL_INTERVAL):
+    """redis 模式的 worker 主循环：领取 -> 执行（期间续期可见性超时）-> 回传结果 -> ack"""
+    worker_id = process_owner_id()
+    queue = get_dispatch_queue()
+    logger.info(f"worker {worker_id} 已启动 (redis)")
+
+    while True:
+        try:
+            claimed = queue.jobs.claim(worker_id, block_ms=int(poll_interval * 1000))
+        except Exception as e:
+            logger.error(f"worker {worker_id} 领取任务失败: {e}", exc_info=True)
+            time.sleep(poll_interval)
+            continue
+
+        if claimed is None:
+            continue
+
+        message_id, job = claimed
+        logger.info(f"worker {worker_id} 领取执行记录 {job['execution_id']} (任务 {job['task_id']})")
+        try:
+            queue.push_started(job["execution_id"], worker_id)
+
+            task = Task(
+                id=job["task_id"], name=job["name"], cron="", command=job["command"],
+                status="RUNNING", last_run_at=None, created_at=""
+            )
+            with Heartbeat(REDIS_VISIBILITY_TIMEOUT / 3, lambda: queue.jobs.renew(message_id, worker_id)):
+                result = run_command(task, job["execution_id"])
+
+            queue.push_finished(job["execution_id"], job["task_id"], job["name"], worker_id, result)
+            queue.jobs.ack(message_id)
+        except Exception as e:
+            # 未 ack 的消息在可见性超时后会被重新领取
+            logger.error(f"worker {worker_id} 处理执行记录 {job['execution_id']} 失败: {e}", exc_info=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="mini-scheduler worker")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker 进程数")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="空闲轮询间隔（秒）")
+    parser.add_argument("--backend", choices=["sqlite", "redis"],
+                        default="redis" if DISPATCH_BACKEND == "redis" else "sqlite", help="领取方式")
+    args = parser.parse_args(argv)
+
+    if args.backend == "redis":
+        target = redis_worker_loop
+    else:
+        init_db()
+        target = worker_loop
+
+    processes = [
+        multiprocessing.Process(target=target, args=(args.poll_interval,), daemon=True)
+        for _ in range(max(args.processes, 1))
+    ]
+    for p in processes:
+        p.start()
+    logger.info(f"已启动 {len(processes)} 个 worker 进程")
+
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        logger.info("正在停止 worker 进程...")
+        for p in processes:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()